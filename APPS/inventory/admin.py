@@ -1,19 +1,27 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.shortcuts import render
 from django.utils.html import format_html
 from django.utils.timezone import now
-from .models import Category, Item, Sale, StockAlert
+from APPS.report.ledger import remove_sales
+from STORE_MANAGER.watermarks import touch
+from .models import Category, GoodsReceipt, GoodsReceiptLine, Item, PriceHistory, Sale, SaleSummary, StockAlert, StockForecast
+from .forms import RepriceForm
+from .repricing import reprice
+from .sku_cache import sku_cache
 
 @admin.register(Category)
 
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ("name",)
+    list_display = ("name", "store")
+    list_filter = ("store",)
     search_fields = ("name",)
 
 @admin.register(Item)
 class ItemAdmin(admin.ModelAdmin):
-    list_display = ("name", "category", "buying_price", "selling_price", "quantity", "low_stock_warning")
-    list_filter = ("category",)
-    search_fields = ("name", "category__name")
+    list_display = ("name", "sku", "category", "store", "buying_price", "selling_price", "quantity", "low_stock_warning")
+    list_filter = ("store", "category")
+    list_select_related = ("category", "forecast")
+    search_fields = ("name", "=sku", "category__name")
 
     def low_stock_warning(self, obj):
         """Show low stock warning in red"""
@@ -21,25 +29,67 @@ class ItemAdmin(admin.ModelAdmin):
             '<span style="color: red;">Low Stock!</span>' if obj.is_low_stock() else "OK"
         )
     
-    actions = ["reset_inventory"]
+    actions = ["reset_inventory", "reprice"]
 
     def reset_inventory(self, request, queryset):
         """Custom action to reset selected inventory items"""
         queryset.update(quantity=0)
+        sku_cache.clear()
+        touch("items")
         self.message_user(request, "Selected inventory has been reset.")
 
     reset_inventory.short_description = "Reset selected inventory (set quantity to 0)"
 
+    def reprice(self, request, queryset):
+        """Change the prices of the selected items in one go, after asking how"""
+        if "apply" in request.POST:
+            form = RepriceForm(request.POST)
+            if form.is_valid():
+                repriced, skipped = reprice(queryset, **form.reprice_kwargs())
+                self.message_user(request, f"Repriced {repriced} item(s).")
+                if skipped:
+                    self.message_user(
+                        request, f"Skipped {skipped} item(s) whose selling price would fall below the buying price.",
+                        messages.WARNING,
+                    )
+                return None
+        else:
+            form = RepriceForm()
+
+        return render(request, "admin/inventory/item/reprice.html", {
+            **self.admin_site.each_context(request),
+            "title": "Reprice items",
+            "opts": self.model._meta,
+            "form": form,
+            "items": queryset,
+            "action_checkbox_name": admin.helpers.ACTION_CHECKBOX_NAME,
+        })
+
+    reprice.short_description = "Reprice selected items"
+
 @admin.register(Sale)
 class SaleAdmin(admin.ModelAdmin):
-    list_display = ("item", "quantity_sold", "selling_price", "profit", "sold_at")
-    list_filter = ("sold_at",)
+    list_display = ("item", "store", "quantity_sold", "selling_price", "profit", "sold_at")
+    list_filter = ("store", "sold_at")
     search_fields = ("item__name",)
 
     def profit(self, obj):
         """Calculate profit per sale"""
         return (obj.selling_price - obj.item.buying_price) * obj.quantity_sold
 
+    # Sales have no delete signal receivers (see inventory/signals.py)
+    def delete_model(self, request, obj):
+        remove_sales([obj.pk])
+        super().delete_model(request, obj)
+        touch("sales", obj.store_id)
+
+    def delete_queryset(self, request, queryset):
+        store_ids = set(queryset.values_list("store_id", flat=True))
+        remove_sales(list(queryset.values_list("pk", flat=True)))
+        super().delete_queryset(request, queryset)
+        for store_id in store_ids:
+            touch("sales", store_id)
+
 @admin.register(StockAlert)
 class StockAlertAdmin(admin.ModelAdmin):
     list_display = ("item", "is_alert_active")
@@ -52,12 +102,56 @@ class StockAlertAdmin(admin.ModelAdmin):
 
     reset_alerts.short_description = "Reset selected stock alerts"
 
+@admin.register(StockForecast)
+class StockForecastAdmin(admin.ModelAdmin):
+    list_display = ("item", "daily_velocity", "days_until_stockout", "reorder_point", "suggested_reorder_quantity", "computed_at")
+    list_select_related = ("item",)
+    ordering = ("days_until_stockout",)
+    search_fields = ("item__name",)
+
+@admin.register(SaleSummary)
+class SaleSummaryAdmin(admin.ModelAdmin):
+    list_display = ("month", "store", "item_name", "category_name", "sales_count", "units", "revenue", "profit")
+    list_filter = ("store", "month")
+    ordering = ("-month", "-revenue")
+    search_fields = ("item_name",)
+
+class GoodsReceiptLineInline(admin.TabularInline):
+    model = GoodsReceiptLine
+    fields = ("item", "quantity", "buying_price")
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+@admin.register(GoodsReceipt)
+class GoodsReceiptAdmin(admin.ModelAdmin):
+    """Receipts are a record of stock already booked in; they're read-only here"""
+    list_display = ("received_at", "store", "supplier", "reference", "received_by")
+    list_filter = ("store", "received_at")
+    search_fields = ("supplier", "reference")
+    readonly_fields = ("store", "supplier", "reference", "received_by", "received_at")
+    inlines = [GoodsReceiptLineInline]
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(PriceHistory)
+class PriceHistoryAdmin(admin.ModelAdmin):
+    list_display = ("item", "buying_price", "selling_price", "changed_at", "reason")
+    list_select_related = ("item",)
+    list_filter = ("changed_at",)
+    search_fields = ("item__name", "reason")
+
 # Global reset action
 def reset_all_inventory(modeladmin, request, queryset):
     """Reset all inventory data including items, sales, and alerts"""
     Item.objects.all().update(quantity=0)
+    sku_cache.clear()
+    remove_sales(Sale.objects.values("pk"))
     Sale.objects.all().delete()
     StockAlert.objects.all().update(is_alert_active=False)
+    touch("items")
+    touch("sales")
     modeladmin.message_user(request, "All inventory data has been reset.")
 
 reset_all_inventory.short_description = "RESET ALL INVENTORY DATA (Caution!)"
@@ -0,0 +1,149 @@
+"""
+Top sellers, ABC (Pareto) classes and dead stock for a date range.
+
+All sales figures come from one grouped aggregate over Sale, so the cost
+depends on the number of items sold in the range, not on page size. Category
+totals and ABC classes are folded from those rows in Python. Results are cached
+per range for ANALYTICS_CACHE_TIMEOUT seconds. Sales already moved out by
+archive_history are added from their monthly summaries.
+"""
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import DecimalField, Exists, ExpressionWrapper, F, OuterRef, Sum
+from django.utils.timezone import make_aware
+
+from .archive import archived_sales_by_item
+from .models import Item, Sale
+
+DEAD_STOCK_LIMIT = 100
+
+money = DecimalField(max_digits=14, decimal_places=2)
+cents = Decimal('0.01')
+
+
+def sales_in_range(start_date, end_date, store):
+    start = make_aware(datetime.combine(start_date, time.min))
+    end = make_aware(datetime.combine(end_date, time.max))
+    return Sale.objects.filter(store=store, sold_at__range=[start, end])
+
+
+def abc_class(cumulative_before, a_share, b_share):
+    """The item that crosses a boundary still belongs to the higher class"""
+    if cumulative_before < a_share:
+        return 'A'
+    if cumulative_before < b_share:
+        return 'B'
+    return 'C'
+
+
+def compute_analytics(start_date, end_date, store):
+    a_share = getattr(settings, 'ABC_A_SHARE', 0.8)
+    b_share = getattr(settings, 'ABC_B_SHARE', 0.95)
+    sales = sales_in_range(start_date, end_date, store)
+
+    rows = list(
+        sales.values('item_id', 'item__name', 'item__category__name')
+        .annotate(
+            units=Sum('quantity_sold'),
+            revenue=Sum(F('selling_price') * F('quantity_sold'), output_field=money),
+            profit=Sum((F('selling_price') - F('item__buying_price')) * F('quantity_sold'), output_field=money),
+        )
+        .order_by()
+    )
+
+    for row in rows:
+        # SQLite doesn't round aggregates to the field's decimal places
+        row['revenue'] = row['revenue'].quantize(cents)
+        row['profit'] = row['profit'].quantize(cents)
+
+    # Live rows first, so current item names win over archived ones
+    merged = {}
+    archived = archived_sales_by_item(start_date, end_date, store)
+    for row in rows + list(archived.values()):
+        if row['item_id'] in merged:
+            total = merged[row['item_id']]
+            total['units'] += row['units']
+            total['revenue'] += row['revenue']
+            total['profit'] += row['profit']
+        else:
+            merged[row['item_id']] = row
+    rows = sorted(merged.values(), key=lambda row: row['revenue'], reverse=True)
+
+    items = []
+    categories = {}
+    total_revenue = sum((row['revenue'] for row in rows), Decimal('0.00'))
+    cumulative = 0
+    abc = {label: {'items': 0, 'revenue': Decimal('0.00')} for label in 'ABC'}
+    for row in rows:
+        share_before = float(cumulative / total_revenue) if total_revenue else 0
+        cumulative += row['revenue']
+        label = abc_class(share_before, a_share, b_share)
+        abc[label]['items'] += 1
+        abc[label]['revenue'] += row['revenue']
+        items.append({
+            'id': row['item_id'],
+            'name': row['item__name'],
+            'category': row['item__category__name'],
+            'units': row['units'],
+            'revenue': row['revenue'],
+            'profit': row['profit'],
+            'abc_class': label,
+        })
+
+        category = categories.setdefault(row['item__category__name'], {
+            'name': row['item__category__name'],
+            'units': 0,
+            'revenue': Decimal('0.00'),
+            'profit': Decimal('0.00'),
+        })
+        category['units'] += row['units']
+        category['revenue'] += row['revenue']
+        category['profit'] += row['profit']
+
+    for summary in abc.values():
+        summary['share'] = float(summary['revenue'] / total_revenue) if total_revenue else 0
+
+    # Dead stock: items on the shelf with no sale in the range
+    sold = sales.filter(item_id=OuterRef('pk'))
+    dead = Item.objects.filter(store=store, quantity__gt=0).exclude(Exists(sold)).exclude(pk__in=list(archived))
+    dead_stock = list(
+        dead.annotate(stock_value=ExpressionWrapper(F('buying_price') * F('quantity'), output_field=money))
+        .order_by('-stock_value')
+        .values('id', 'name', 'quantity', 'stock_value')[:DEAD_STOCK_LIMIT]
+    )
+    for row in dead_stock:
+        row['stock_value'] = row['stock_value'].quantize(cents)
+
+    return {
+        'start': start_date,
+        'end': end_date,
+        'totals': {
+            'units': sum(item['units'] for item in items),
+            'revenue': total_revenue,
+            'profit': sum((item['profit'] for item in items), Decimal('0.00')),
+        },
+        'items': items,
+        'categories': list(categories.values()),
+        'abc': abc,
+        'dead_stock': dead_stock,
+        'dead_stock_count': dead.count(),
+    }
+
+
+def get_analytics(start_date, end_date, store):
+    """A store's analytics for a date range, from the cache when possible"""
+    key = f'inventory:analytics:{store.pk}:{start_date.isoformat()}:{end_date.isoformat()}'
+    result = cache.get(key)
+    if result is None:
+        result = compute_analytics(start_date, end_date, store)
+        cache.set(key, result, getattr(settings, 'ANALYTICS_CACHE_TIMEOUT', 300))
+    return result
+
+
+def ranked(rows, by, limit=None):
+    """Rows sorted by revenue, profit or units, best first"""
+    rows = sorted(rows, key=lambda row: row[by], reverse=True)
+    return rows[:limit] if limit else rows
@@ -0,0 +1,214 @@
+"""
+Moving old sales out of the hot Sale table.
+
+Each month before the horizon is written to a compressed archive partition,
+folded into SaleSummary rows and only then deleted, all per month. Historical
+reports read whole months from the summaries and only open an archive file for
+a month the requested range cuts through.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Min
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import localdate, make_aware
+
+from STORE_MANAGER.archive import (
+    ArchiveError, archived_rows, months_between, next_month, read_partition, remove_partition, write_partition,
+)
+from APPS.report.ledger import record_sales
+from STORE_MANAGER.watermarks import touch
+
+from .models import Item, Sale, SaleSummary
+
+KIND = 'sales'
+CHUNK_SIZE = 2000
+
+cents = Decimal('0.01')
+
+
+def partition(store):
+    return f'{KIND}/{store.code}'
+
+
+def month_range(month, before=None):
+    start = make_aware(datetime.combine(month, time.min))
+    end = make_aware(datetime.combine(next_month(month), time.min))
+    return start, min(end, before) if before else end
+
+
+def fold(totals, row):
+    """Add one archived sale row to per-item totals"""
+    quantity = row['quantity_sold']
+    selling_price = Decimal(row['selling_price'])
+    total = totals.setdefault(row['item_id'], {
+        'item_id': row['item_id'],
+        'item__name': row['item_name'],
+        'item__category__name': row['category_name'],
+        'sales_count': 0,
+        'units': 0,
+        'revenue': Decimal('0.00'),
+        'profit': Decimal('0.00'),
+    })
+    total['sales_count'] += 1
+    total['units'] += quantity
+    total['revenue'] += selling_price * quantity
+    total['profit'] += (selling_price - Decimal(row['buying_price'])) * quantity
+
+
+def add_to_summaries(store, month, totals):
+    summaries = SaleSummary.objects.select_for_update().filter(store=store, month=month, item_id__in=list(totals))
+    existing = {summary.item_id: summary for summary in summaries}
+    new = []
+    for item_id, total in totals.items():
+        summary = existing.get(item_id) or SaleSummary(
+            store=store, month=month, item_id=item_id, item_name=total['item__name'], category_name=total['item__category__name'],
+        )
+        summary.sales_count += total['sales_count']
+        summary.units += total['units']
+        summary.revenue = (summary.revenue + total['revenue']).quantize(cents)
+        summary.profit = (summary.profit + total['profit']).quantize(cents)
+        if summary.pk is None:
+            new.append(summary)
+    SaleSummary.objects.bulk_update(existing.values(), ['sales_count', 'units', 'revenue', 'profit'])
+    SaleSummary.objects.bulk_create(new)
+
+
+def archive_month(store, month, before):
+    """Archive one month of a store's sales sold before ``before``; returns the number moved"""
+    start, end = month_range(month, before)
+    ids = []
+    totals = {}
+
+    def rows():
+        sales = (
+            Sale.objects.filter(store=store, sold_at__gte=start, sold_at__lt=end)
+            .order_by('pk')
+            .values_list('pk', 'item_id', 'item__name', 'item__category__name', 'item__buying_price',
+                         'quantity_sold', 'selling_price', 'sold_at', 'idempotency_key')
+        )
+        for pk, item_id, item_name, category_name, buying_price, quantity, price, sold_at, key in sales.iterator(chunk_size=CHUNK_SIZE):
+            row = {
+                'id': pk,
+                'item_id': item_id,
+                'item_name': item_name,
+                'category_name': category_name,
+                # The cost price at archive time, so profit survives later price changes
+                'buying_price': str(buying_price),
+                'quantity_sold': quantity,
+                'selling_price': str(price),
+                'sold_at': sold_at,
+                'idempotency_key': key,
+            }
+            ids.append(pk)
+            fold(totals, row)
+            yield row
+
+    # The file is safely on disk before anything is deleted. Only the rows that were
+    # written are deleted, so a sale recorded meanwhile stays in the hot table.
+    count = write_partition(partition(store), month, rows())
+    with transaction.atomic():
+        add_to_summaries(store, month, totals)
+        for i in range(0, len(ids), CHUNK_SIZE):
+            Sale.objects.filter(pk__in=ids[i:i + CHUNK_SIZE]).delete()
+        touch('sales', store.pk)
+    return count
+
+
+def archive_sales(store, before, dry_run=False):
+    """Archive all of a store's sales before ``before``; returns {month: sales moved}"""
+    first = Sale.objects.filter(store=store, sold_at__lt=before).aggregate(first=Min('sold_at'))['first']
+    if first is None:
+        return {}
+    moved = {}
+    for month in months_between(localdate(first), localdate(before - timedelta(microseconds=1))):
+        if dry_run:
+            start, end = month_range(month, before)
+            count = Sale.objects.filter(store=store, sold_at__gte=start, sold_at__lt=end).count()
+        else:
+            count = archive_month(store, month, before)
+        if count:
+            moved[month] = count
+    return moved
+
+
+def restore_sales(store, month):
+    """Put an archived month of a store's sales back into the Sale table; returns the number restored"""
+    item_ids = {row['item_id'] for row in read_partition(partition(store), month)}
+    missing = item_ids - set(Item.objects.filter(store=store, pk__in=item_ids).values_list('pk', flat=True))
+    if missing:
+        raise ArchiveError(
+            f"Cannot restore sales for {month:%Y-%m}: {len(missing)} item(s) no longer exist "
+            f"(ids {', '.join(str(pk) for pk in sorted(missing)[:10])})."
+        )
+
+    def insert(batch):
+        # Sales already back (an earlier restore, or never deleted) are skipped and not counted
+        existing = set(Sale.objects.filter(pk__in=[sale.pk for sale, _ in batch]).values_list('pk', flat=True))
+        batch = [(sale, buying_price) for sale, buying_price in batch if sale.pk not in existing]
+        Sale.objects.bulk_create([sale for sale, _ in batch], ignore_conflicts=True)
+        # The ledger kept archived sales; this only adds those archived before it existed
+        record_sales(batch)
+        return len(batch)
+
+    count = 0
+    with transaction.atomic():
+        batch = []
+        for row in read_partition(partition(store), month):
+            batch.append((Sale(
+                pk=row['id'],
+                store=store,
+                item_id=row['item_id'],
+                quantity_sold=row['quantity_sold'],
+                selling_price=Decimal(row['selling_price']),
+                sold_at=parse_datetime(row['sold_at']),
+                idempotency_key=row['idempotency_key'],
+            ), Decimal(row['buying_price'])))
+            if len(batch) == CHUNK_SIZE:
+                count += insert(batch)
+                batch = []
+        count += insert(batch)
+        SaleSummary.objects.filter(store=store, month=month).delete()
+        touch('sales', store.pk)
+        transaction.on_commit(lambda: remove_partition(partition(store), month))
+    return count
+
+
+def archived_sales_by_item(start_date, end_date, store):
+    """
+    Per-item totals of a store's archived sales between two dates (inclusive).
+
+    Months the range covers completely come from SaleSummary; a month it only
+    partly covers is read from its archive file.
+    """
+    totals = {}
+    partial_months = set()
+    summaries = SaleSummary.objects.filter(store=store, month__gte=start_date.replace(day=1), month__lte=end_date)
+    for summary in summaries:
+        if summary.month < start_date or next_month(summary.month) - timedelta(days=1) > end_date:
+            partial_months.add(summary.month)
+            continue
+        total = totals.setdefault(summary.item_id, {
+            'item_id': summary.item_id,
+            'item__name': summary.item_name,
+            'item__category__name': summary.category_name,
+            'sales_count': 0,
+            'units': 0,
+            'revenue': Decimal('0.00'),
+            'profit': Decimal('0.00'),
+        })
+        total['sales_count'] += summary.sales_count
+        total['units'] += summary.units
+        total['revenue'] += summary.revenue
+        total['profit'] += summary.profit
+
+    for month in sorted(partial_months):
+        for row in archived_rows(partition(store), month, Sale):
+            if start_date <= localdate(parse_datetime(row['sold_at'])) <= end_date:
+                fold(totals, row)
+
+    for total in totals.values():
+        total['revenue'] = total['revenue'].quantize(cents)
+        total['profit'] = total['profit'].quantize(cents)
+    return totals
@@ -0,0 +1,23 @@
+"""
+Each store's categories, cached in every worker (see STORE_MANAGER/refdata.py).
+
+The category dropdowns on the item form and the item list read from here, so
+rendering them runs no queries. Saving or deleting a category invalidates its
+store's list (signals.py); code that writes categories with bulk queries must
+call ``categories.invalidate(store_id)`` itself.
+"""
+from STORE_MANAGER.refdata import ReferenceTable
+
+from .models import Category
+
+
+def load_categories(store_id):
+    return list(Category.objects.filter(store_id=store_id).order_by('name'))
+
+
+categories = ReferenceTable('inventory:categories', load_categories)
+
+
+def store_categories(store_id):
+    """A store's categories by name, from the cache"""
+    return categories.get(store_id)
@@ -0,0 +1,139 @@
+"""
+Sales velocity and stockout forecasting for every item at once.
+
+The sales history is read with one grouped query (units per item per day) and
+turned into NumPy arrays. Velocity is an exponentially weighted moving average
+of daily sales, so recent weeks count most but slow movers still get a rate
+from their older sales. Everything after the query is vectorized: there is no
+per-item Python loop, which keeps 50k items x two years of sales in seconds.
+
+NumPy is only imported here, so it never loads in the web workers.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, Sum
+from django.db.models.functions import Cast, Substr
+from django.utils import timezone
+
+from STORE_MANAGER.watermarks import touch
+
+from .models import Item, Sale, StockAlert, StockForecast
+from .sku_cache import sku_cache
+
+
+def compute_forecast(item_ids, quantities, sale_item_ids, sale_ages, sale_units,
+                     half_life_days=14, history_days=730, lead_time_days=7,
+                     safety_days=3, cover_days=14):
+    """
+    Forecast stock for all items from per-day sales.
+
+    ``item_ids`` must be sorted. ``sale_item_ids``, ``sale_ages`` (days before
+    today, 0 = today) and ``sale_units`` hold one entry per item per day.
+    Returns a dict of arrays aligned with ``item_ids``.
+    """
+    item_ids = np.asarray(item_ids, dtype=np.int64)
+    quantities = np.asarray(quantities, dtype=np.float64)
+    sale_ages = np.asarray(sale_ages, dtype=np.float64)
+    sale_units = np.asarray(sale_units, dtype=np.float64)
+    n = len(item_ids)
+
+    index = np.searchsorted(item_ids, np.asarray(sale_item_ids, dtype=np.int64))
+    decay = 0.5 ** (1.0 / half_life_days)
+    weighted_units = np.bincount(index, weights=sale_units * decay ** sale_ages, minlength=n)
+
+    # Only average over the days an item has actually been on sale, so new items aren't underestimated
+    first_sale_age = np.full(n, -1.0)
+    np.maximum.at(first_sale_age, index, sale_ages)
+    has_history = first_sale_age >= 0
+    observed_days = np.minimum(first_sale_age + 1, history_days)
+    weight_total = (1 - decay ** observed_days) / (1 - decay)  # sum of decay**age over the observed days
+
+    velocity = np.divide(weighted_units, weight_total, out=np.zeros(n), where=has_history)
+    days_until_stockout = np.divide(quantities, velocity, out=np.full(n, np.nan), where=velocity > 0)
+    reorder_point = np.ceil(velocity * (lead_time_days + safety_days))
+    target_stock = np.ceil(velocity * (lead_time_days + safety_days + cover_days))
+    reorder_quantity = np.maximum(target_stock - quantities, 0)
+
+    return {
+        'has_history': has_history,
+        'velocity': velocity,
+        'days_until_stockout': days_until_stockout,
+        'reorder_point': reorder_point.astype(np.int64),
+        'reorder_quantity': reorder_quantity.astype(np.int64),
+    }
+
+
+def load_sales(store, since):
+    """Units sold per item of a store per (UTC) day since ``since``, as NumPy arrays (one query)"""
+    # The date part of the timestamp as text; TruncDate would call a Python function per row on SQLite
+    day = Substr(Cast('sold_at', output_field=CharField()), 1, 10)
+    rows = (
+        Sale.objects.filter(store=store, sold_at__gte=since)
+        .annotate(day=day)
+        .values('item_id', 'day')
+        .annotate(units=Sum('quantity_sold'))
+        .values_list('item_id', 'day', 'units')
+    )
+    rows = list(rows)
+    if not rows:
+        return np.empty(0, np.int64), np.empty(0, 'datetime64[D]'), np.empty(0, np.float64)
+    item_ids, days, units = zip(*rows)
+    return (
+        np.array(item_ids, dtype=np.int64),
+        np.array(days, dtype='datetime64[D]'),
+        np.array(units, dtype=np.float64),
+    )
+
+
+def refresh_forecasts(store):
+    """Recompute and store forecasts for every item of a store, then refresh its stock alerts"""
+    history_days = getattr(settings, 'FORECAST_HISTORY_DAYS', 730)
+    now = timezone.now()
+    today = np.datetime64(now.astimezone(dt_timezone.utc).date(), 'D')
+
+    items = list(Item.objects.filter(store=store).order_by('pk').values_list('pk', 'quantity'))
+    item_ids, quantities = np.array(items, dtype=np.int64).reshape(-1, 2).T
+    sale_item_ids, sale_days, sale_units = load_sales(store, now - timedelta(days=history_days))
+
+    result = compute_forecast(
+        item_ids, quantities, sale_item_ids, (today - sale_days).astype(np.int64), sale_units,
+        half_life_days=getattr(settings, 'FORECAST_HALF_LIFE_DAYS', 14),
+        history_days=history_days,
+        lead_time_days=getattr(settings, 'FORECAST_LEAD_TIME_DAYS', 7),
+        safety_days=getattr(settings, 'FORECAST_SAFETY_DAYS', 3),
+        cover_days=getattr(settings, 'FORECAST_COVER_DAYS', 14),
+    )
+
+    selling = np.flatnonzero(result['has_history'])
+    forecasts = [
+        StockForecast(
+            item_id=item_id,
+            daily_velocity=velocity,
+            days_until_stockout=None if np.isnan(days) else days,
+            reorder_point=reorder_point,
+            suggested_reorder_quantity=reorder_quantity,
+            computed_at=now,
+        )
+        for item_id, velocity, days, reorder_point, reorder_quantity in zip(
+            item_ids[selling].tolist(),
+            result['velocity'][selling].tolist(),
+            result['days_until_stockout'][selling].tolist(),
+            result['reorder_point'][selling].tolist(),
+            result['reorder_quantity'][selling].tolist(),
+        )
+    ]
+
+    with transaction.atomic():
+        # Replace the whole set; items without sales fall back to their manual threshold
+        StockForecast.objects.filter(item__store=store).delete()
+        StockForecast.objects.bulk_create(forecasts, batch_size=2000)
+        StockAlert.reconcile(item_ids.tolist())
+        # Reorder points feed the dashboard's low stock list
+        touch('items', store.pk)
+        # Cached scans carry the old reorder levels
+        transaction.on_commit(lambda: sku_cache.invalidate_items(store.pk, item_ids.tolist()))
+
+    return len(forecasts)
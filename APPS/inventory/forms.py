@@ -1,20 +1,68 @@
 from django import forms
+from django.db import transaction
+from django.db.models import F
+from STORE_MANAGER.forms import DateRangeForm
+from STORE_MANAGER.refdata import ReferenceChoiceField
+from STORE_MANAGER.watermarks import touch
+
+from .categories import store_categories
 from .models import Item, Category, Sale
+from .receiving import ReceiptLineError, parse_lines, resolve_lines
+from .repricing import ROUNDING_CHOICES
+from .sku_cache import sku_cache
 
 class CategoryForm(forms.ModelForm):
     class Meta:
         model = Category
         fields = ['name']
 
+    def __init__(self, *args, store=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if store is not None:
+            self.instance.store = store
+
+    def clean_name(self):
+        # Names are unique per store; the form doesn't include the store, so check it here
+        name = self.cleaned_data.get('name')
+        others = Category.objects.filter(store_id=self.instance.store_id, name=name).exclude(pk=self.instance.pk)
+        if others.exists():
+            raise forms.ValidationError("A category with this name already exists.")
+        return name
+
+class EditConflict(Exception):
+    """The item was changed by someone else after the form was loaded"""
+
+    def __init__(self, fields):
+        super().__init__(f"Item changed since it was loaded: {', '.join(fields)}")
+        self.fields = fields
+
 class ItemForm(forms.ModelForm):
+    # The item as the user saw it: its version, and its stock (which sales change without bumping the version)
+    version = forms.IntegerField(widget=forms.HiddenInput, required=False)
+    original_quantity = forms.IntegerField(widget=forms.HiddenInput, required=False)
+    category = ReferenceChoiceField(empty_label="Select a category")
+
     class Meta:
         model = Item
-        fields = ['name', 'category', 'buying_price', 'selling_price', 'quantity', 'low_stock_threshold']
+        fields = ['name', 'sku', 'category', 'buying_price', 'selling_price', 'quantity', 'low_stock_threshold']
         
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, store=None, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['category'].queryset = Category.objects.all()
-        self.fields['category'].empty_label = "Select a category"
+        if store is not None:
+            self.instance.store = store
+        if self.instance.pk:
+            for name, value in (('version', self.instance.version), ('original_quantity', self.instance.quantity)):
+                self.fields[name].initial = value
+                self.fields[name].required = True
+        self.fields['category'].objects = store_categories(self.instance.store_id)
+        self.fields['sku'].widget.attrs['placeholder'] = "Scan or type the barcode"
+    
+    def clean_sku(self):
+        # Store blanks as NULL so items without a barcode don't clash on the unique index
+        sku = (self.cleaned_data.get('sku') or '').strip()
+        if sku and Item.objects.filter(store_id=self.instance.store_id, sku=sku).exclude(pk=self.instance.pk).exists():
+            raise forms.ValidationError("Another item in this store already has this SKU.")
+        return sku or None
     
     def clean(self):
         cleaned_data = super().clean()
@@ -27,6 +75,41 @@ class ItemForm(forms.ModelForm):
         
         return cleaned_data
 
+    def edited_fields(self):
+        """Item fields the user changed"""
+        # Other fields are compared with the database, which matches what the user saw while the version does
+        fields = [name for name in self.changed_data if name in self._meta.fields and name != 'quantity']
+        if self.cleaned_data['quantity'] != self.cleaned_data['original_quantity']:
+            fields.append('quantity')
+        return fields
+
+    def save(self, commit=True):
+        """Create the item, or write only the edited fields if nobody changed them in the meantime"""
+        if self.instance._state.adding or not commit:
+            return super().save(commit)
+
+        fields = self.edited_fields()
+        if not fields:
+            return self.instance
+        expected = {'version': self.cleaned_data['version']}
+        if 'quantity' in fields:
+            expected['quantity'] = self.cleaned_data['original_quantity']
+        with transaction.atomic():
+            # A single conditional UPDATE: no row lock is held while the user edits, and tills selling the
+            # item meanwhile only conflict with an edit of the quantity itself
+            updated = Item.objects.filter(pk=self.instance.pk, **expected).update(
+                version=F('version') + 1,
+                **{name: getattr(self.instance, name) for name in fields},
+            )
+            if not updated:
+                raise EditConflict(fields)
+            store_id, pk = self.instance.store_id, self.instance.pk
+            # The update sends no save signals
+            transaction.on_commit(lambda: sku_cache.invalidate_items(store_id, [pk]))
+            touch('items', store_id)
+        self.instance.refresh_from_db()
+        return self.instance
+
 class SaleForm(forms.ModelForm):
     class Meta:
         model = Sale
@@ -38,6 +121,8 @@ class SaleForm(forms.ModelForm):
         
         if item_id:
             item = Item.objects.get(id=item_id)
+            self.instance.store_id = item.store_id
+            self.fields['item'].queryset = Item.objects.filter(store_id=item.store_id)
             self.fields['item'].initial = item
             self.fields['item'].widget = forms.HiddenInput()
             self.fields['selling_price'].initial = item.selling_price
@@ -61,8 +146,68 @@ class SaleForm(forms.ModelForm):
 class SearchForm(forms.Form):
     search_query = forms.CharField(max_length=100, required=False, label='',
                                   widget=forms.TextInput(attrs={'placeholder': 'Search items by name or category...'}))
-    category = forms.ModelChoiceField(
-        queryset=Category.objects.all(),
-        required=False,
-        empty_label="All Categories"
-    )
\ No newline at end of file
+    category = ReferenceChoiceField(required=False, empty_label="All Categories")
+
+    def __init__(self, *args, store=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if store is not None:
+            self.fields['category'].objects = store_categories(store.pk)
+
+class AnalyticsForm(DateRangeForm):
+    RANK_CHOICES = [('revenue', 'Revenue'), ('profit', 'Profit'), ('units', 'Units sold')]
+
+    rank_by = forms.ChoiceField(choices=RANK_CHOICES, required=False)
+    limit = forms.IntegerField(min_value=1, required=False)  # rows per list in the JSON API
+
+    def clean(self):
+        cleaned_data = super().clean()
+        cleaned_data['rank_by'] = cleaned_data.get('rank_by') or 'revenue'
+        cleaned_data['limit'] = cleaned_data.get('limit') or 50
+        return cleaned_data
+
+class GoodsReceiptForm(forms.Form):
+    supplier = forms.CharField(max_length=255, required=False)
+    reference = forms.CharField(max_length=100, required=False, label='Delivery note / invoice no.')
+    lines = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 15, 'placeholder': "One line per item: SKU, quantity[, new buying price]\n"
+                                                                "6001234567890, 24\n#42, 10, 350.00"}),
+        help_text="Scan or type each item's SKU (or #id for items without one), its quantity and optionally a new buying price.",
+    )
+
+    def __init__(self, *args, store=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.store = store
+
+    def clean_lines(self):
+        """The delivery as (item, quantity, buying price) tuples; every bad line is reported at once"""
+        try:
+            return resolve_lines(self.store, parse_lines(self.cleaned_data['lines']))
+        except ReceiptLineError as e:
+            raise forms.ValidationError(e.errors)
+
+class RepriceForm(forms.Form):
+    TARGET_CHOICES = [('selling', 'Selling price'), ('buying', 'Buying price'), ('both', 'Both prices')]
+    CHANGE_CHOICES = [('percent', 'Percentage'), ('amount', 'Amount (Ksh)')]
+
+    target = forms.ChoiceField(choices=TARGET_CHOICES, initial='selling')
+    change = forms.ChoiceField(choices=CHANGE_CHOICES, initial='percent')
+    value = forms.DecimalField(max_digits=10, decimal_places=2, help_text="Negative to lower prices, e.g. 5 for +5% or -20 for Ksh 20 less")
+    rounding = forms.ChoiceField(choices=ROUNDING_CHOICES, initial='0.01')
+    reason = forms.CharField(max_length=255, required=False, help_text="Kept with the old prices, e.g. 'Supplier price rise March'")
+
+    def clean_value(self):
+        value = self.cleaned_data['value']
+        if value == 0:
+            raise forms.ValidationError("A change of zero does nothing.")
+        return value
+
+    def reprice_kwargs(self):
+        """Keyword arguments for repricing.reprice()"""
+        data = self.cleaned_data
+        return {
+            'target': data['target'],
+            'percent': data['value'] if data['change'] == 'percent' else None,
+            'amount': data['value'] if data['change'] == 'amount' else None,
+            'step': data['rounding'],
+            'reason': data['reason'],
+        }
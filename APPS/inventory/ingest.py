@@ -0,0 +1,194 @@
+"""
+Batch ingestion of sales queued by tills while they were offline.
+
+Every sale carries a client-generated idempotency key, unique within its store,
+so a till can replay the same batch as often as it likes: sales already
+recorded come back as 'duplicate' instead of being sold twice. A whole batch
+is applied in one transaction on the store's database, with a single
+conditional UPDATE per item.
+"""
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from APPS.report.ledger import record_sales
+from STORE_MANAGER.routers import using_store
+from STORE_MANAGER.watermarks import touch
+
+from .models import Item, Sale, StockAlert
+from .sku_cache import sku_cache
+
+# Largest values the columns take: BigAutoField ids, PositiveIntegerField quantities, DecimalField(10, 2) prices
+MAX_ITEM_ID = 2 ** 63 - 1
+MAX_QUANTITY = 2 ** 31 - 1
+MAX_PRICE = Decimal('99999999.99')
+
+ACCEPTED = 'accepted'
+DUPLICATE = 'duplicate'
+REJECTED = 'rejected'
+
+
+class SaleEntryError(ValueError):
+    pass
+
+
+def parse_entry(entry):
+    """Validate one sale from the batch and return it in normalized form"""
+    if not isinstance(entry, dict):
+        raise SaleEntryError('Each sale must be an object.')
+
+    key = entry.get('idempotency_key')
+    if not isinstance(key, str) or not 0 < len(key) <= 64:
+        raise SaleEntryError('idempotency_key must be a string of 1 to 64 characters.')
+
+    try:
+        item_id = int(entry.get('item_id'))
+        quantity_sold = int(entry.get('quantity_sold'))
+    except (TypeError, ValueError):
+        raise SaleEntryError('item_id and quantity_sold must be integers.')
+    if not 0 < item_id <= MAX_ITEM_ID:
+        raise SaleEntryError('Item not found.')
+    if quantity_sold <= 0:
+        raise SaleEntryError('Quantity sold must be greater than zero.')
+    if quantity_sold > MAX_QUANTITY:
+        raise SaleEntryError(f'Quantity sold cannot be more than {MAX_QUANTITY}.')
+
+    selling_price = entry.get('selling_price')
+    if selling_price is not None:
+        try:
+            selling_price = Decimal(str(selling_price))
+        except InvalidOperation:
+            raise SaleEntryError('selling_price must be a number.')
+        # NaN and Infinity parse as Decimals too
+        if not selling_price.is_finite():
+            raise SaleEntryError('selling_price must be a number.')
+        if selling_price < 0:
+            raise SaleEntryError('selling_price cannot be negative.')
+        if selling_price > MAX_PRICE or selling_price != selling_price.quantize(Decimal('0.01')):
+            raise SaleEntryError(f'selling_price must be at most {MAX_PRICE} with at most 2 decimals.')
+
+    sold_at = entry.get('sold_at')
+    if sold_at is not None:
+        try:
+            # None when the text isn't a datetime, ValueError when it names one that doesn't exist
+            sold_at = parse_datetime(str(sold_at))
+        except ValueError:
+            sold_at = None
+        if sold_at is None:
+            raise SaleEntryError('sold_at must be an ISO 8601 datetime.')
+        if timezone.is_naive(sold_at):
+            sold_at = timezone.make_aware(sold_at)
+
+    return {
+        'idempotency_key': key,
+        'item_id': item_id,
+        'quantity_sold': quantity_sold,
+        'selling_price': selling_price,
+        'sold_at': sold_at or timezone.now(),
+    }
+
+
+def ingest_sales(entries, store):
+    """
+    Record a batch of sales made in ``store`` and return one status dict per entry, in order.
+
+    Retries once if another request recorded one of the keys concurrently; the
+    second pass then reports those sales as duplicates.
+    """
+    # Every query of the batch, and its transaction, on the store's database
+    with using_store(store):
+        try:
+            return _ingest_sales(entries, store)
+        except IntegrityError:
+            return _ingest_sales(entries, store)
+
+
+def _ingest_sales(entries, store):
+    results = [None] * len(entries)
+    pending = []  # (position, parsed entry)
+    seen_keys = set()
+
+    for position, entry in enumerate(entries):
+        try:
+            parsed = parse_entry(entry)
+        except SaleEntryError as e:
+            results[position] = {'idempotency_key': _raw_key(entry), 'status': REJECTED, 'error': str(e)}
+            continue
+        if parsed['idempotency_key'] in seen_keys:
+            results[position] = {'idempotency_key': parsed['idempotency_key'], 'status': DUPLICATE}
+            continue
+        seen_keys.add(parsed['idempotency_key'])
+        pending.append((position, parsed))
+
+    using = router.db_for_write(Item)
+    with transaction.atomic(using=using):
+        # Keys are per store: another store's till may have used the same one
+        existing = dict(
+            Sale.objects.filter(store=store, idempotency_key__in=seen_keys).values_list('idempotency_key', 'id')
+        )
+        # Items of other stores are reported as not found
+        items = Item.objects.filter(store=store).select_for_update().in_bulk({parsed['item_id'] for _, parsed in pending})
+
+        # Allocate stock in the order the till recorded the sales
+        available = {pk: item.quantity for pk, item in items.items()}
+        by_item = defaultdict(list)
+        for position, parsed in pending:
+            key = parsed['idempotency_key']
+            if key in existing:
+                results[position] = {'idempotency_key': key, 'status': DUPLICATE, 'sale_id': existing[key]}
+            elif parsed['item_id'] not in items:
+                results[position] = {'idempotency_key': key, 'status': REJECTED, 'error': 'Item not found.'}
+            elif parsed['quantity_sold'] > available[parsed['item_id']]:
+                results[position] = {'idempotency_key': key, 'status': REJECTED, 'error': 'Not enough stock.'}
+            else:
+                available[parsed['item_id']] -= parsed['quantity_sold']
+                by_item[parsed['item_id']].append((position, parsed))
+
+        new_sales = []
+        for item_id, sales in by_item.items():
+            total = sum(parsed['quantity_sold'] for _, parsed in sales)
+            # Guard against stock that changed since it was read (no row locks on SQLite)
+            updated = Item.objects.filter(pk=item_id, quantity__gte=total).update(
+                quantity=F('quantity') - total
+            )
+            if not updated:
+                for position, parsed in sales:
+                    results[position] = {
+                        'idempotency_key': parsed['idempotency_key'],
+                        'status': REJECTED,
+                        'error': 'Not enough stock.',
+                    }
+                continue
+            item = items[item_id]
+            for position, parsed in sales:
+                new_sales.append((position, Sale(
+                    store_id=item.store_id,
+                    item=item,
+                    quantity_sold=parsed['quantity_sold'],
+                    selling_price=parsed['selling_price'] if parsed['selling_price'] is not None else item.selling_price,
+                    sold_at=parsed['sold_at'],
+                    idempotency_key=parsed['idempotency_key'],
+                )))
+
+        Sale.objects.bulk_create([sale for _, sale in new_sales])
+        record_sales(((sale, sale.item.buying_price) for _, sale in new_sales), using=using)
+        for position, sale in new_sales:
+            results[position] = {'idempotency_key': sale.idempotency_key, 'status': ACCEPTED, 'sale_id': sale.pk}
+
+        if new_sales:
+            sold_item_ids = {sale.item_id for _, sale in new_sales}
+            StockAlert.reconcile(sold_item_ids)
+            # Stock changed through update(), which sends no save signals
+            transaction.on_commit(lambda: sku_cache.invalidate_items(store.pk, sold_item_ids), using=using)
+            touch('items', store.pk, using=using)
+            touch('sales', store.pk, using=using)
+
+    return results
+
+
+def _raw_key(entry):
+    return entry.get('idempotency_key') if isinstance(entry, dict) else None
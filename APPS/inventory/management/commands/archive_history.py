@@ -0,0 +1,48 @@
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.timezone import localdate, make_aware
+
+from APPS.inventory.archive import archive_sales
+from APPS.repair_tracker.archive import archive_repairs
+from APPS.stores.models import Store
+from STORE_MANAGER.archive import archive_root, month_start
+from STORE_MANAGER.routers import using_store
+
+
+class Command(BaseCommand):
+    help = (
+        "Move sales and collected repairs older than the horizon into compressed monthly archive "
+        "files, keeping monthly summaries in the database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horizon-days', type=int, default=getattr(settings, 'ARCHIVE_HORIZON_DAYS', 365),
+            help="Keep at least this many days of history in the live tables (whole months are archived)",
+        )
+        parser.add_argument('--store', help="Only archive the store with this code")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be archived")
+
+    def handle(self, *args, **options):
+        cutoff = month_start(localdate() - timedelta(days=options['horizon_days']))
+        before = make_aware(datetime.combine(cutoff, datetime.min.time()))
+        verb = "Would archive" if options['dry_run'] else "Archived"
+        self.stdout.write(f"Archiving history before {cutoff} to {archive_root()}")
+
+        stores = Store.objects.order_by('code')
+        if options['store']:
+            stores = stores.filter(code=options['store'])
+
+        start = time.perf_counter()
+        for store in stores:
+            with using_store(store):
+                for label, archive in (('sales', archive_sales), ('repairs', archive_repairs)):
+                    moved = archive(store, before, dry_run=options['dry_run'])
+                    for month, count in moved.items():
+                        self.stdout.write(f"  {store.code} {label} {month:%Y-%m}: {count}")
+                    self.stdout.write(f"{store.name}: {verb.lower()} {sum(moved.values())} {label} from {len(moved)} month(s).")
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"Done in {elapsed:.2f}s."))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from APPS.inventory.forecast import refresh_forecasts
+from APPS.stores.models import Store
+from STORE_MANAGER.routers import using_store
+
+
+class Command(BaseCommand):
+    help = "Recompute sales velocity, days until stockout and reorder quantities for all items"
+
+    def handle(self, *args, **options):
+        for store in Store.objects.order_by('code'):
+            start = time.perf_counter()
+            with using_store(store):
+                count = refresh_forecasts(store)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(self.style.SUCCESS(f"{store.name}: forecast {count} selling items in {elapsed:.2f}s."))
@@ -0,0 +1,61 @@
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from APPS.inventory.models import Category, Item
+from APPS.inventory.repricing import PRICE_FIELDS, ROUNDING_CHOICES, reprice
+from APPS.stores.models import Store
+from STORE_MANAGER.routers import using_store
+
+
+def parse_decimal(value):
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise CommandError(f"Invalid number '{value}'.")
+
+
+class Command(BaseCommand):
+    help = "Raise or lower the prices of whole categories at once, keeping the old prices in the price history"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', default=getattr(settings, 'DEFAULT_STORE_CODE', 'main'),
+                            help="Code of the store to reprice (default: the default store)")
+        parser.add_argument('--category', action='append', default=[],
+                            help="Name of a category to reprice; repeat for several (default: every category)")
+        parser.add_argument('--target', choices=list(PRICE_FIELDS), default='selling', help="Which prices to change")
+        change = parser.add_mutually_exclusive_group(required=True)
+        change.add_argument('--percent', type=parse_decimal, help="Change by this percentage, e.g. 5 or -10")
+        change.add_argument('--amount', type=parse_decimal, help="Change by this amount, e.g. 20 or -50")
+        parser.add_argument('--round', dest='step', choices=[step for step, _ in ROUNDING_CHOICES], default='0.01',
+                            help="Round new prices to the nearest multiple of this")
+        parser.add_argument('--reason', default='', help="Kept with the old prices in the price history")
+        parser.add_argument('--dry-run', action='store_true', help="Only report how many items would change")
+
+    def handle(self, *args, **options):
+        try:
+            store = Store.objects.get(code=options['store'])
+        except Store.DoesNotExist:
+            raise CommandError(f"No store with code '{options['store']}'.")
+
+        with using_store(store):
+            items = Item.objects.filter(store=store)
+            if options['category']:
+                categories = Category.objects.filter(store=store, name__in=options['category'])
+                missing = set(options['category']) - {category.name for category in categories}
+                if missing:
+                    raise CommandError(f"No categories named {', '.join(sorted(missing))} in {store.name}.")
+                items = items.filter(category__in=categories)
+
+            repriced, skipped = reprice(
+                items, target=options['target'], percent=options['percent'], amount=options['amount'],
+                step=options['step'], reason=options['reason'], dry_run=options['dry_run'],
+            )
+
+        verb = "Would reprice" if options['dry_run'] else "Repriced"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {repriced} item(s) in {store.name}."))
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                f"Skipped {skipped} item(s) whose selling price would fall below the buying price."
+            ))
@@ -0,0 +1,65 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from APPS.inventory.archive import partition as sales_partition, restore_sales
+from APPS.repair_tracker.archive import partition as repairs_partition, restore_repairs
+from APPS.stores.models import Store
+from STORE_MANAGER.archive import ArchiveError, archived_months
+from STORE_MANAGER.routers import using_store
+
+
+def parse_month(value):
+    try:
+        year, month = value.split('-')
+        return date(int(year), int(month), 1)
+    except ValueError:
+        raise CommandError(f"Invalid month '{value}', expected YYYY-MM.")
+
+
+class Command(BaseCommand):
+    help = "Move archived sales and repairs for the given months back into the live tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('months', nargs='*', help="Months to restore as YYYY-MM")
+        parser.add_argument('--store', default=getattr(settings, 'DEFAULT_STORE_CODE', 'main'),
+                            help="Code of the store to restore (default: the default store)")
+        parser.add_argument('--only', choices=['sales', 'repairs'], help="Restore only one kind of history")
+        parser.add_argument('--list', action='store_true', help="List the archived months and exit")
+
+    def handle(self, *args, **options):
+        try:
+            store = Store.objects.get(code=options['store'])
+        except Store.DoesNotExist:
+            raise CommandError(f"No store with code '{options['store']}'.")
+
+        kinds = [
+            (label, partition(store), restore)
+            for label, partition, restore in (
+                ('sales', sales_partition, restore_sales),
+                ('repairs', repairs_partition, restore_repairs),
+            )
+            if options['only'] in (None, label)
+        ]
+
+        if options['list']:
+            for label, kind, _ in kinds:
+                months = ', '.join(f"{month:%Y-%m}" for month in archived_months(kind)) or 'none'
+                self.stdout.write(f"{label}: {months}")
+            return
+
+        if not options['months']:
+            raise CommandError("Give at least one month (YYYY-MM) to restore, or --list.")
+
+        with using_store(store):
+            for month in map(parse_month, options['months']):
+                for label, kind, restore in kinds:
+                    if month not in archived_months(kind):
+                        self.stdout.write(f"No archived {label} for {month:%Y-%m}.")
+                        continue
+                    try:
+                        count = restore(store, month)
+                    except ArchiveError as e:
+                        raise CommandError(str(e))
+                    self.stdout.write(self.style.SUCCESS(f"Restored {count} {label} for {month:%Y-%m}."))
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_item_sku'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('daily_velocity', models.FloatField()),
+                ('days_until_stockout', models.FloatField(blank=True, null=True)),
+                ('reorder_point', models.PositiveIntegerField()),
+                ('suggested_reorder_quantity', models.PositiveIntegerField()),
+                ('computed_at', models.DateTimeField()),
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='forecast', to='inventory.item')),
+            ],
+        ),
+    ]
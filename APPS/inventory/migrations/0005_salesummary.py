@@ -0,0 +1,30 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_stockforecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaleSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('item_id', models.BigIntegerField()),
+                ('item_name', models.CharField(max_length=255)),
+                ('category_name', models.CharField(max_length=255)),
+                ('sales_count', models.PositiveIntegerField(default=0)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('profit', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('month', 'item_id'), name='unique_sale_summary_month_item')],
+            },
+        ),
+    ]
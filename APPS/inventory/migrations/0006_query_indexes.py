@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_salesummary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='item',
+            name='name',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='sale',
+            name='sold_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['category', 'name'], name='inventory_item_cat_name_idx'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:17
+
+import APPS.stores.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_query_indexes'),
+        ('stores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='store',
+            field=models.ForeignKey(default=APPS.stores.models.default_store_id, on_delete=django.db.models.deletion.PROTECT, to='stores.store'),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='store',
+            field=models.ForeignKey(default=APPS.stores.models.default_store_id, on_delete=django.db.models.deletion.PROTECT, to='stores.store'),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='store',
+            field=models.ForeignKey(default=APPS.stores.models.default_store_id, on_delete=django.db.models.deletion.PROTECT, to='stores.store'),
+        ),
+        migrations.AddField(
+            model_name='salesummary',
+            name='store',
+            field=models.ForeignKey(default=APPS.stores.models.default_store_id, on_delete=django.db.models.deletion.PROTECT, to='stores.store'),
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='name',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='item',
+            name='name',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='item',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['store', 'name'], name='inventory_item_store_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['store', 'sold_at'], name='inventory_sale_store_sold_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='category',
+            constraint=models.UniqueConstraint(fields=('store', 'name'), name='unique_category_name_per_store'),
+        ),
+        migrations.AddConstraint(
+            model_name='item',
+            constraint=models.UniqueConstraint(fields=('store', 'sku'), name='unique_item_sku_per_store'),
+        ),
+    ]
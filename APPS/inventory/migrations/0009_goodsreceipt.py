@@ -0,0 +1,42 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:26
+
+import APPS.stores.models
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_item_version'),
+        ('stores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoodsReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('supplier', models.CharField(blank=True, max_length=255)),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('received_by', models.CharField(blank=True, max_length=150)),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('store', models.ForeignKey(default=APPS.stores.models.default_store_id, on_delete=django.db.models.deletion.PROTECT, to='stores.store')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GoodsReceiptLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('buying_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='inventory.item')),
+                ('receipt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='inventory.goodsreceipt')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='goodsreceipt',
+            index=models.Index(fields=['store', 'received_at'], name='inventory_grn_store_recv_idx'),
+        ),
+    ]
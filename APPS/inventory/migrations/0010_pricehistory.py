@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:31
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_goodsreceipt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('buying_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('selling_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('reason', models.CharField(blank=True, max_length=255)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='inventory.item')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['item', 'changed_at'], name='inventory_price_item_chg_idx')],
+            },
+        ),
+    ]
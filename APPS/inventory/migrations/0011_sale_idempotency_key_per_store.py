@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-19 16:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_pricehistory'),
+        ('stores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sale',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='sale',
+            constraint=models.UniqueConstraint(fields=('store', 'idempotency_key'), name='unique_sale_store_idempotency_key'),
+        ),
+    ]
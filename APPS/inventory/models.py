@@ -1,48 +1,116 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Exists, F, OuterRef
+from django.db.models.functions import Coalesce
 from django.utils.timezone import now
 
+from APPS.stores.models import Store, default_store_id
+
 class Category(models.Model):
     """Stores product categories"""
-    name = models.CharField(max_length=255, unique=True)
+    store = models.ForeignKey(Store, on_delete=models.PROTECT, default=default_store_id)
+    name = models.CharField(max_length=255)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['store', 'name'], name='unique_category_name_per_store')]
 
     def __str__(self):
         return self.name
 
+class ItemQuerySet(models.QuerySet):
+    def low_stock(self):
+        """Items at or below their reorder level (forecast reorder point, else the manual threshold)"""
+        # alias() keeps the forecast join a LEFT JOIN, so items without a forecast still match
+        return self.alias(
+            reorder_level=Coalesce('forecast__reorder_point', 'low_stock_threshold')
+        ).filter(quantity__lte=F('reorder_level'))
+
 class Item(models.Model):
     """Stores inventory items"""
+    store = models.ForeignKey(Store, on_delete=models.PROTECT, default=default_store_id)
     name = models.CharField(max_length=255)
+    sku = models.CharField(max_length=64, null=True, blank=True)  # Barcode scanned at the till
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     buying_price = models.DecimalField(max_digits=10, decimal_places=2)
     selling_price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.PositiveIntegerField()
     low_stock_threshold = models.PositiveIntegerField(default=5)  # Alerts when below this
+    # Bumped by every edit so a stale item form can't overwrite it; sales change stock without bumping it
+    version = models.PositiveIntegerField(default=1)
+
+    objects = ItemQuerySet.as_manager()
+
+    class Meta:
+        # The item list shows one store's items sorted by name, optionally of one category
+        indexes = [
+            models.Index(fields=['store', 'name'], name='inventory_item_store_name_idx'),
+            models.Index(fields=['category', 'name'], name='inventory_item_cat_name_idx'),
+        ]
+        constraints = [models.UniqueConstraint(fields=['store', 'sku'], name='unique_item_sku_per_store')]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
 
     def sell_item(self, quantity_sold, selling_price=None):
         """Handles item sale, reduces stock, and records sale"""
-        if self.quantity >= quantity_sold:
-            self.quantity -= quantity_sold
-            Sale.objects.create(
+        from STORE_MANAGER.watermarks import touch
+        from .sku_cache import sku_cache
+
+        using = self._state.db
+        with transaction.atomic(using=using):
+            # Only the stock changes, conditionally, so concurrent sales and price edits don't overwrite each other
+            updated = Item.objects.using(using).filter(pk=self.pk, quantity__gte=quantity_sold).update(
+                quantity=F('quantity') - quantity_sold
+            )
+            self.refresh_from_db(fields=['quantity'])
+            if not updated:
+                return False
+            # Saving an instance (rather than objects.create) routes the sale to the item's store database
+            Sale(
+                store_id=self.store_id,
                 item=self,
                 quantity_sold=quantity_sold,
                 selling_price=selling_price or self.selling_price
-            )
-            self.save()
-            return True
-        return False
+            ).save()
+            # Stock changed through update(), which sends no save signals
+            transaction.on_commit(lambda: sku_cache.invalidate_items(self.store_id, [self.pk]), using=using)
+            touch('items', self.store_id, using=using)
+        return True
+
+    def reorder_level(self):
+        """Forecast reorder point when one has been computed, else the manual threshold"""
+        try:
+            return self.forecast.reorder_point
+        except StockForecast.DoesNotExist:
+            return self.low_stock_threshold
 
     def is_low_stock(self):
         """Check if stock is below threshold"""
-        return self.quantity <= self.low_stock_threshold
+        return self.quantity <= self.reorder_level()
 
     def __str__(self):
         return f"{self.name} - {self.quantity} left"
 
 class Sale(models.Model):
     """Stores sales transactions"""
+    store = models.ForeignKey(Store, on_delete=models.PROTECT, default=default_store_id)
     item = models.ForeignKey(Item, on_delete=models.CASCADE)
     quantity_sold = models.PositiveIntegerField()
     selling_price = models.DecimalField(max_digits=10, decimal_places=2)
-    sold_at = models.DateTimeField(default=now)
+    sold_at = models.DateTimeField(default=now, db_index=True)
+    # Client-generated key so tills can replay offline sales without duplicates
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+
+    class Meta:
+        # Tills generate keys on their own, so they are only unique within a store
+        constraints = [
+            models.UniqueConstraint(fields=['store', 'idempotency_key'], name='unique_sale_store_idempotency_key'),
+        ]
+        # Reports and the dashboard read one store's sales for a period
+        indexes = [models.Index(fields=['store', 'sold_at'], name='inventory_sale_store_sold_idx')]
 
     def profit(self):
         """Calculate profit per sale"""
@@ -60,6 +128,89 @@ class StockAlert(models.Model):
         """Updates alert status based on stock level"""
         self.is_alert_active = self.item.is_low_stock()
         self.save()
+
+    @classmethod
+    def reconcile(cls, item_ids=None):
+        """Bring the alerts of many items (all of them by default) in line with their stock in bulk"""
+        if item_ids is None:
+            item_ids = Item.objects.values_list('pk', flat=True)
+            alerts = cls.objects.all()
+        else:
+            item_ids = list(item_ids)
+            alerts = cls.objects.filter(item_id__in=item_ids)
+        cls.objects.bulk_create([cls(item_id=pk) for pk in item_ids], ignore_conflicts=True)
+        low_stock = Item.objects.filter(pk=OuterRef('item_id')).low_stock()
+        alerts.update(is_alert_active=Exists(low_stock))
     
     def __str__(self):
         return f"Low Stock Alert: {self.item.name} ({self.item.quantity} left)"
+
+class StockForecast(models.Model):
+    """Sales velocity and stockout forecast per item, refreshed by the forecast_stock command"""
+    item = models.OneToOneField(Item, on_delete=models.CASCADE, related_name='forecast')
+    daily_velocity = models.FloatField()  # Units sold per day (weighted moving average)
+    days_until_stockout = models.FloatField(null=True, blank=True)  # None when the item isn't selling
+    reorder_point = models.PositiveIntegerField()  # Alert when stock falls to this level
+    suggested_reorder_quantity = models.PositiveIntegerField()
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Forecast for {self.item.name}: {self.daily_velocity:.2f}/day"
+
+class SaleSummary(models.Model):
+    """Monthly sales totals per item for sales moved out by the archive_history command"""
+    store = models.ForeignKey(Store, on_delete=models.PROTECT, default=default_store_id)
+    month = models.DateField()  # First day of the month
+    # Not a foreign key: the summary outlives the item
+    item_id = models.BigIntegerField()
+    item_name = models.CharField(max_length=255)
+    category_name = models.CharField(max_length=255)
+    sales_count = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    profit = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['month', 'item_id'], name='unique_sale_summary_month_item')]
+
+    def __str__(self):
+        return f"{self.item_name}: {self.units} sold in {self.month.strftime('%Y-%m')}"
+
+class GoodsReceipt(models.Model):
+    """A delivery booked into stock in one go (goods-received note)"""
+    store = models.ForeignKey(Store, on_delete=models.PROTECT, default=default_store_id)
+    supplier = models.CharField(max_length=255, blank=True)
+    reference = models.CharField(max_length=100, blank=True)  # The supplier's delivery note or invoice number
+    # A username rather than a foreign key: users live on the default database, receipts on the store's
+    received_by = models.CharField(max_length=150, blank=True)
+    received_at = models.DateTimeField(default=now)
+
+    class Meta:
+        indexes = [models.Index(fields=['store', 'received_at'], name='inventory_grn_store_recv_idx')]
+
+    def __str__(self):
+        return f"Goods received {self.received_at.strftime('%Y-%m-%d')}" + (f" from {self.supplier}" if self.supplier else "")
+
+class GoodsReceiptLine(models.Model):
+    """One item of a delivery"""
+    receipt = models.ForeignKey(GoodsReceipt, on_delete=models.CASCADE, related_name='lines')
+    item = models.ForeignKey(Item, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    buying_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)  # New cost price, if it changed
+
+    def __str__(self):
+        return f"{self.quantity} x {self.item.name}"
+
+class PriceHistory(models.Model):
+    """An item's prices before a change, so margins can be analysed with the prices in effect at the time"""
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='price_history')
+    buying_price = models.DecimalField(max_digits=10, decimal_places=2)
+    selling_price = models.DecimalField(max_digits=10, decimal_places=2)
+    changed_at = models.DateTimeField(default=now)  # The prices above applied until this moment
+    reason = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['item', 'changed_at'], name='inventory_price_item_chg_idx')]
+
+    def __str__(self):
+        return f"{self.item.name}: {self.buying_price}/{self.selling_price} until {self.changed_at.strftime('%Y-%m-%d')}"
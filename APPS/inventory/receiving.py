@@ -0,0 +1,140 @@
+"""
+Booking deliveries into stock.
+
+A goods-received note lists every item of a delivery, one per line:
+
+    <SKU or #item id>, <quantity>[, <new buying price>]
+
+The whole note is applied in one transaction with a fixed number of queries
+however long it is: one bulk UPDATE adds each line's quantity with
+``F('quantity') + n`` (so sales made meanwhile are kept), one INSERT each for
+the receipt and its lines, and one set-based refresh of the stock alerts of
+the delivered items.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from STORE_MANAGER.watermarks import touch
+
+from .models import GoodsReceipt, GoodsReceiptLine, Item, StockAlert
+from .sku_cache import sku_cache
+
+
+class ReceiptLineError(ValueError):
+    """One or more lines of a goods-received note can't be booked"""
+
+    def __init__(self, errors):
+        super().__init__('\n'.join(errors))
+        self.errors = errors
+
+
+def parse_lines(text):
+    """Split a goods-received note into (line number, item reference, quantity, buying price or None)"""
+    lines, errors = [], []
+    for number, line in enumerate(text.splitlines(), start=1):
+        parts = [part.strip() for part in line.split(',')]
+        if not any(parts):
+            continue
+        if len(parts) not in (2, 3) or not parts[0]:
+            errors.append(f"Line {number}: expected 'SKU, quantity' or 'SKU, quantity, buying price'.")
+            continue
+        try:
+            quantity = int(parts[1])
+        except ValueError:
+            errors.append(f"Line {number}: quantity must be a whole number.")
+            continue
+        if quantity <= 0:
+            errors.append(f"Line {number}: quantity must be greater than zero.")
+            continue
+        buying_price = None
+        if len(parts) == 3 and parts[2]:
+            try:
+                buying_price = Decimal(parts[2])
+            except InvalidOperation:
+                errors.append(f"Line {number}: buying price must be a number.")
+                continue
+            if buying_price < 0 or buying_price != buying_price.quantize(Decimal('0.01')):
+                errors.append(f"Line {number}: buying price must be a positive amount with at most 2 decimals.")
+                continue
+        lines.append((number, parts[0], quantity, buying_price))
+    if errors:
+        raise ReceiptLineError(errors)
+    if not lines:
+        raise ReceiptLineError(["The delivery has no lines."])
+    return lines
+
+
+def resolve_lines(store, lines):
+    """
+    Look up the items of parsed lines in one query and return (item, quantity, buying price) tuples.
+
+    Items are referenced by SKU, or by ``#<id>`` for items without a barcode.
+    """
+    skus = {reference for _, reference, _, _ in lines if not reference.startswith('#')}
+    ids = set()
+    errors = []
+    for number, reference, _, _ in lines:
+        if reference.startswith('#'):
+            if reference[1:].isdigit():
+                ids.add(int(reference[1:]))
+            else:
+                errors.append(f"Line {number}: '{reference}' is not an item id.")
+    if errors:
+        raise ReceiptLineError(errors)
+
+    items = Item.objects.filter(Q(sku__in=skus) | Q(pk__in=ids), store=store)
+    by_sku, by_id = {}, {}
+    for item in items:
+        by_id[item.pk] = item
+        if item.sku:
+            by_sku[item.sku] = item
+
+    resolved = []
+    for number, reference, quantity, buying_price in lines:
+        item = by_id.get(int(reference[1:])) if reference.startswith('#') else by_sku.get(reference)
+        if item is None:
+            errors.append(f"Line {number}: no item '{reference}' in this store.")
+        else:
+            resolved.append((item, quantity, buying_price))
+    if errors:
+        raise ReceiptLineError(errors)
+    return resolved
+
+
+def receive_goods(store, lines, supplier='', reference='', received_by=''):
+    """Add a delivery's (item, quantity, buying price) lines to stock and return its GoodsReceipt"""
+    # Several lines for the same item add up; the last price given wins
+    totals = {}
+    for item, quantity, buying_price in lines:
+        total = totals.setdefault(item.pk, {'quantity': 0, 'buying_price': None})
+        total['quantity'] += quantity
+        if buying_price is not None:
+            total['buying_price'] = buying_price
+
+    # Expressions rather than values, so the UPDATE adds to whatever the stock is at that moment
+    items = []
+    for item_id, total in totals.items():
+        if total['buying_price'] is None:
+            buying_price, version = F('buying_price'), F('version')
+        else:
+            # A new cost price is an edit; bump the version so open item forms notice it
+            buying_price, version = total['buying_price'], F('version') + 1
+        items.append(Item(pk=item_id, store=store, quantity=F('quantity') + total['quantity'],
+                          buying_price=buying_price, version=version))
+
+    with transaction.atomic():
+        receipt = GoodsReceipt.objects.create(
+            store=store, supplier=supplier, reference=reference, received_by=received_by,
+        )
+        GoodsReceiptLine.objects.bulk_create([
+            GoodsReceiptLine(receipt=receipt, item_id=item.pk, quantity=quantity, buying_price=buying_price)
+            for item, quantity, buying_price in lines
+        ])
+        Item.objects.bulk_update(items, ['quantity', 'buying_price', 'version'])
+        StockAlert.reconcile(list(totals))
+        # Stock changed through update(), which sends no save signals
+        transaction.on_commit(lambda: sku_cache.invalidate_items(store.pk, list(totals)))
+        touch('items', store.pk)
+    return receipt
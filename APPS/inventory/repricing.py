@@ -0,0 +1,103 @@
+"""
+Repricing many items at once.
+
+A change (a percentage or an amount, to buying and/or selling prices,
+rounded to a price step) is turned into F() expressions and applied in the
+database, with one UPDATE per CHUNK_SIZE items. Items whose new selling price
+would fall below their new buying price, or whose price would go negative,
+are left alone by the UPDATE's WHERE clause (the same rule ItemForm
+enforces), and reported back. The old prices of the repriced items are
+written to PriceHistory with one bulk_create.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Value
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from STORE_MANAGER.watermarks import touch
+
+from .models import PriceHistory
+from .sku_cache import sku_cache
+
+PRICE_FIELDS = {
+    'selling': ['selling_price'],
+    'buying': ['buying_price'],
+    'both': ['buying_price', 'selling_price'],
+}
+
+# Price steps new prices are rounded to (to the nearest step)
+ROUNDING_CHOICES = [
+    ('0.01', 'Nearest cent'),
+    ('1', 'Nearest 1'),
+    ('5', 'Nearest 5'),
+    ('10', 'Nearest 10'),
+    ('50', 'Nearest 50'),
+    ('100', 'Nearest 100'),
+]
+
+CHUNK_SIZE = 2000
+
+
+def new_price(field, percent=None, amount=None, step=Decimal('0.01')):
+    """SQL expression for a price after the change, rounded to ``step``"""
+    price = DecimalField(max_digits=10, decimal_places=2)
+    if percent is not None:
+        changed = F(field) * Value(1 + Decimal(percent) / 100, output_field=price)
+    else:
+        changed = F(field) + Value(Decimal(amount), output_field=price)
+    step = Value(Decimal(step), output_field=price)
+    return ExpressionWrapper(Round(changed / step) * step, output_field=price)
+
+
+def reprice(items, target='selling', percent=None, amount=None, step='0.01', reason='', dry_run=False):
+    """
+    Change the prices of every item in the ``items`` queryset.
+
+    Returns (number of items repriced, number skipped because selling would fall below buying or below zero).
+    """
+    if (percent is None) == (amount is None):
+        raise ValueError("Give either a percentage or an amount.")
+    fields = PRICE_FIELDS[target]
+
+    new_prices = {f'new_{field}': new_price(field, percent, amount, step) for field in fields}
+    buying = new_prices.get('new_buying_price', F('buying_price'))
+    selling = new_prices.get('new_selling_price', F('selling_price'))
+    candidates = items.alias(**new_prices)
+    allowed = candidates.alias(new_buying=buying, new_selling=selling).filter(
+        new_buying__gte=0, new_selling__gte=F('new_buying'),
+    )
+
+    with transaction.atomic():
+        old = list(allowed.select_for_update().values_list('pk', 'store_id', 'buying_price', 'selling_price'))
+        skipped = candidates.count() - len(old)
+        if dry_run or not old:
+            return len(old), skipped
+
+        changed_at = timezone.now()
+        history = [
+            PriceHistory(item_id=pk, buying_price=buying_price, selling_price=selling_price,
+                         changed_at=changed_at, reason=reason)
+            for pk, _, buying_price, selling_price in old
+        ]
+        PriceHistory.objects.bulk_create(history, batch_size=CHUNK_SIZE)
+        # Only the items read above are updated, so every repriced item has its history row, and items that
+        # became eligible since are left out. A price change is an edit, so bump the version.
+        pks = [pk for pk, _, _, _ in old]
+        updated = 0
+        for i in range(0, len(pks), CHUNK_SIZE):
+            updated += allowed.filter(pk__in=pks[i:i + CHUNK_SIZE]).update(
+                version=F('version') + 1,
+                **{field: new_prices[f'new_{field}'] for field in fields},
+            )
+
+        by_store = defaultdict(list)
+        for pk, store_id, _, _ in old:
+            by_store[store_id].append(pk)
+        # The update sends no save signals
+        transaction.on_commit(lambda: [sku_cache.invalidate_items(store_id, pks) for store_id, pks in by_store.items()])
+        for store_id in by_store:
+            touch('items', store_id)
+    return updated, skipped
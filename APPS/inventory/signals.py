@@ -0,0 +1,36 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from STORE_MANAGER.watermarks import touch
+
+from .categories import categories
+from .models import Category, Item, Sale
+from .sku_cache import sku_cache
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def invalidate_sku_cache(sender, instance, **kwargs):
+    """Drop the cached scan result when an item changes"""
+    sku_cache.invalidate_items(instance.store_id, [instance.pk])
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def touch_items(sender, instance, using, **kwargs):
+    touch('items', instance.store_id, using=using)
+
+
+# No post_delete receiver: archiving deletes sales by the thousand, and Django would fetch every one to send it
+@receiver(post_save, sender=Sale)
+def touch_sales(sender, instance, using, **kwargs):
+    touch('sales', instance.store_id, using=using)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_categories(sender, instance, using, **kwargs):
+    """Every worker reloads the store's category list"""
+    categories.invalidate(instance.store_id, using=using)
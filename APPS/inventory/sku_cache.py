@@ -0,0 +1,114 @@
+"""
+Per-process LRU cache of recently scanned SKUs.
+
+Scans at the till hit the same few hundred products all day, so each worker
+keeps their price and stock in memory. Entries are dropped when the item is
+saved or deleted in this process (see signals.py) and by code that changes
+stock with queryset updates. Other workers only see a change once their entry
+expires, so entries live for SKU_CACHE_TTL seconds at most. Low stock uses
+the item's reorder level (forecast reorder point, else the manual threshold,
+like ItemQuerySet.low_stock), kept with the entry and dropped when forecasts
+are refreshed. Sales always re-check stock against the database, so a
+slightly stale quantity is only ever shown, never sold.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models.functions import Coalesce
+
+from .models import Item
+
+
+class SKUCache:
+    """Keys are (store id, SKU): every store has its own catalogue and barcodes"""
+
+    def __init__(self, maxsize=1024, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (store id, sku) -> (expires_at, data)
+        self._skus_by_item = {}  # (store id, item id) -> key, so an item can be dropped after its SKU changed
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, store_id, sku):
+        key = (store_id, sku)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, data = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return data
+                self._remove(key)
+            self.misses += 1
+        return None
+
+    def set(self, store_id, sku, data):
+        key = (store_id, sku)
+        with self._lock:
+            self._remove(key)
+            previous_key = self._skus_by_item.get((store_id, data['id']))
+            if previous_key is not None:
+                self._remove(previous_key)
+            self._entries[key] = (time.monotonic() + self.ttl, data)
+            self._skus_by_item[(store_id, data['id'])] = key
+            while len(self._entries) > self.maxsize:
+                (evicted_store_id, _), (_, evicted) = self._entries.popitem(last=False)
+                self._skus_by_item.pop((evicted_store_id, evicted['id']), None)
+
+    def invalidate_items(self, store_id, item_ids):
+        with self._lock:
+            for item_id in item_ids:
+                key = self._skus_by_item.pop((store_id, item_id), None)
+                if key is not None:
+                    self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._skus_by_item.clear()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._skus_by_item.pop((key[0], entry[1]['id']), None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+sku_cache = SKUCache(
+    maxsize=getattr(settings, 'SKU_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'SKU_CACHE_TTL', 30),
+)
+
+
+def lookup_sku(sku, store_id):
+    """Return price and stock for a SKU scanned in a store, or None if no item there has it"""
+    data = sku_cache.get(store_id, sku)
+    if data is not None:
+        return data
+
+    try:
+        row = Item.objects.values(
+            'id', 'name', 'sku', 'selling_price', 'quantity',
+            reorder_level=Coalesce('forecast__reorder_point', 'low_stock_threshold'),
+        ).get(store_id=store_id, sku=sku)
+    except Item.DoesNotExist:
+        return None
+
+    data = {
+        'id': row['id'],
+        'name': row['name'],
+        'sku': row['sku'],
+        'selling_price': str(row['selling_price']),
+        'quantity': row['quantity'],
+        'reorder_level': row['reorder_level'],
+        'is_low_stock': row['quantity'] <= row['reorder_level'],
+    }
+    sku_cache.set(store_id, sku, data)
+    return data
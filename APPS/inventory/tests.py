@@ -1,3 +1,597 @@
-from django.test import TestCase
+import json
+import tempfile
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from STORE_MANAGER.query_plans import QueryPlanTestMixin
+
+from APPS.stores.models import Store, get_default_store
+
+from .analytics import get_analytics
+from .archive import archive_sales, archived_sales_by_item, restore_sales
+from .categories import categories as category_cache
+from .forecast import compute_forecast, refresh_forecasts
+from .forms import ItemForm, SearchForm
+from .models import Category, GoodsReceipt, Item, PriceHistory, Sale, SaleSummary, StockAlert
+from .repricing import reprice
+from .sku_cache import lookup_sku, sku_cache
+
+# Low stock compares two columns of every item (quantity against its reorder level); no index can answer that
+LOW_STOCK = ('inventory_item', 'COALESCE("inventory_stockforecast"."reorder_point"')
+# The dashboard's stock worth sums the whole catalogue
+STOCK_WORTH = ('inventory_item', 'SUM("inventory_item"."buying_price")')
+
+
+class QueryPlanTests(QueryPlanTestMixin, TestCase):
+    """The hot inventory pages must not scan whole sales or item tables"""
+
+    @classmethod
+    def setUpTestData(cls):
+        categories = Category.objects.bulk_create(Category(name=f'Category {i}') for i in range(5))
+        category_cache.clear()  # bulk_create sends no signals
+        Item.objects.bulk_create(
+            Item(name=f'Item {i}', sku=f'{600000000000 + i}', category=categories[i % 5],
+                 buying_price=Decimal('100.00'), selling_price=Decimal('150.00'), quantity=i % 40)
+            for i in range(300)
+        )
+        items = list(Item.objects.all())
+        StockAlert.objects.bulk_create(StockAlert(item=item) for item in items)
+        now = timezone.now()
+        Sale.objects.bulk_create(
+            Sale(item=items[i % len(items)], quantity_sold=1 + i % 3, selling_price=Decimal('150.00'),
+                 sold_at=now - timedelta(hours=i))
+            for i in range(3000)
+        )
+        cls.category = categories[0]
+        cls.item = items[39]
+
+    def get(self, url, **kwargs):
+        response = self.client.get(url, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_dashboard(self):
+        self.assertNoFullScans(lambda: self.get(reverse('dashboard')), allow=[LOW_STOCK, STOCK_WORTH])
+
+    def test_item_list(self):
+        self.assertNoFullScans(lambda: self.get(reverse('item_list')), allow=[LOW_STOCK])
+
+    def test_item_list_by_category(self):
+        self.assertNoFullScans(lambda: self.get(reverse('item_list'), data={'category': self.category.pk}), allow=[LOW_STOCK])
+
+    def test_item_search(self):
+        self.assertNoFullScans(lambda: self.get(reverse('item_list'), data={'search_query': 'Item 1'}), allow=[LOW_STOCK])
+
+    def test_sell_item(self):
+        url = reverse('sell_item', args=[self.item.pk])
+        self.assertNoFullScans(lambda: self.get(url))
+
+        def sell():
+            response = self.client.post(url, {'item': self.item.pk, 'quantity_sold': 1, 'selling_price': '150.00'})
+            self.assertRedirects(response, reverse('item_list'), fetch_redirect_response=False)
+
+        self.assertNoFullScans(sell)
+
+    def test_check_stock(self):
+        self.assertNoFullScans(lambda: self.get(
+            reverse('check_stock'), data={'item_id': self.item.pk}, headers={'x-requested-with': 'XMLHttpRequest'},
+        ))
+
+    def test_report(self):
+        self.assertNoFullScans(lambda: self.get(reverse('report')))
+
+    def test_report_download(self):
+        self.assertNoFullScans(lambda: self.get(reverse('download_report', args=['weekly'])))
+
+    def test_index_walks_are_full_scans(self):
+        def walk():
+            # Reading a whole index is still reading every item
+            return list(Item.objects.values('category_id').annotate(count=Count('pk')))
+
+        with self.assertRaisesMessage(AssertionError, 'full scan of inventory_item'):
+            self.assertNoFullScans(walk)
+        self.assertNoFullScans(walk, allow=[('inventory_item', 'COUNT("inventory_item"."id")')])
+        self.assertNoFullScans(lambda: Item.objects.filter(category=self.category).count())
+
+
+class SaleBatchTests(TestCase):
+    """Tills replay offline sales in batches, safely and at most once"""
+
+    def setUp(self):
+        category = Category.objects.create(name='Phones')
+        self.item = Item.objects.create(name='Charger', category=category, buying_price=Decimal('100.00'),
+                                        selling_price=Decimal('150.00'), quantity=5)
+
+    def post(self, sales):
+        response = self.client.post(reverse('sale_batch'), json.dumps({'sales': sales}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def sale(self, key, quantity=1, **extra):
+        return {'idempotency_key': key, 'item_id': self.item.pk, 'quantity_sold': quantity, **extra}
+
+    def test_accepted_batch(self):
+        result = self.post([self.sale('a', 2), self.sale('b', 1, selling_price='140.00')])
+        self.assertEqual((result['accepted'], result['duplicates'], result['rejected']), (2, 0, 0))
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 2)
+        self.assertEqual(sorted(Sale.objects.values_list('selling_price', flat=True)),
+                         [Decimal('140.00'), Decimal('150.00')])
+
+    def test_resubmitted_batch_is_not_sold_twice(self):
+        first = self.post([self.sale('a', 2)])
+        again = self.post([self.sale('a', 2)])
+        self.assertEqual((again['accepted'], again['duplicates']), (0, 1))
+        self.assertEqual(again['results'][0]['sale_id'], first['results'][0]['sale_id'])
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.quantity, Sale.objects.count()), (3, 1))
+
+    def test_duplicate_key_in_one_batch(self):
+        result = self.post([self.sale('a'), self.sale('a')])
+        self.assertEqual([entry['status'] for entry in result['results']], ['accepted', 'duplicate'])
+        self.assertEqual(Sale.objects.count(), 1)
+
+    def test_unknown_item_and_bad_lines_are_rejected(self):
+        result = self.post([
+            {**self.sale('a'), 'item_id': self.item.pk + 1000},
+            self.sale('b', 0),
+            {'item_id': self.item.pk, 'quantity_sold': 1},
+            self.sale('c'),
+        ])
+        self.assertEqual([entry['status'] for entry in result['results']],
+                         ['rejected', 'rejected', 'rejected', 'accepted'])
+        self.assertEqual(result['results'][0]['error'], 'Item not found.')
+        self.assertEqual(Sale.objects.count(), 1)
+
+    def test_out_of_range_values_are_rejected(self):
+        result = self.post([
+            self.sale('nan', selling_price='NaN'),
+            self.sale('infinity', selling_price='Infinity'),
+            self.sale('huge-price', selling_price='1e20'),
+            self.sale('fraction', selling_price='149.999'),
+            self.sale('no-such-day', sold_at='2024-02-30T10:00:00'),
+            {**self.sale('huge-id'), 'item_id': 10 ** 30},
+            self.sale('huge-quantity', 10 ** 30),
+            self.sale('ok', selling_price='99999999.99'),
+        ])
+        self.assertEqual([entry['status'] for entry in result['results']], ['rejected'] * 7 + ['accepted'])
+        self.assertEqual(result['results'][0]['error'], 'selling_price must be a number.')
+        self.assertEqual(result['results'][4]['error'], 'sold_at must be an ISO 8601 datetime.')
+        self.assertEqual(result['results'][5]['error'], 'Item not found.')
+        self.assertEqual(Sale.objects.get().selling_price, Decimal('99999999.99'))
+
+    def test_oversell_keeps_stock_at_zero(self):
+        result = self.post([self.sale('a', 3), self.sale('b', 3), self.sale('c', 2)])
+        self.assertEqual([entry['status'] for entry in result['results']], ['accepted', 'rejected', 'accepted'])
+        self.assertEqual(result['results'][1]['error'], 'Not enough stock.')
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 0)
+        self.assertEqual(self.post([self.sale('d')])['rejected'], 1)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 0)
+
+    def test_keys_are_per_store(self):
+        other_store = Store.objects.create(name='Branch', code='branch')
+        other_category = Category.objects.create(store=other_store, name='Phones')
+        other_item = Item.objects.create(store=other_store, name='Charger', category=other_category, buying_price=Decimal('100.00'),
+                                         selling_price=Decimal('150.00'), quantity=5)
+        Sale.objects.create(store=other_store, item=other_item, quantity_sold=1, selling_price=Decimal('150.00'),
+                            idempotency_key='a')
+        result = self.post([self.sale('a')])
+        self.assertEqual(result['accepted'], 1)
+        self.assertEqual(Sale.objects.filter(store=self.item.store).count(), 1)
+
+
+class AnalyticsTests(TestCase):
+    """Items are ranked and put in ABC classes by revenue, unsold stock is listed, and results are cached per range"""
+
+    def setUp(self):
+        cache.clear()
+        phones = Category.objects.create(name='Phones')
+        cables = Category.objects.create(name='Cables')
+        items = {}
+        for name, category, buying_price, quantity in (
+            ('Phone', phones, '100.00', 5), ('Charger', cables, '10.00', 20), ('Cable', cables, '1.00', 60),
+            ('Case', phones, '30.00', 4), ('Sold out', phones, '30.00', 0),
+        ):
+            items[name] = Item.objects.create(name=name, category=category, buying_price=Decimal(buying_price),
+                                              selling_price=Decimal(buying_price), quantity=quantity)
+        # Revenue 800 + 150 + 50: the charger starts at 80% of revenue and the cable at 95%
+        Sale.objects.bulk_create([
+            Sale(item=items['Phone'], quantity_sold=1, selling_price=Decimal('800.00')),
+            Sale(item=items['Charger'], quantity_sold=10, selling_price=Decimal('15.00')),
+            Sale(item=items['Cable'], quantity_sold=50, selling_price=Decimal('1.00')),
+        ])
+
+    def get(self, **params):
+        return self.client.get(reverse('analytics_api'), params)
+
+    def test_ranking_and_abc_classes(self):
+        result = self.get().json()
+        self.assertEqual(result['totals'], {'units': 61, 'revenue': '1000.00', 'profit': '750.00'})
+        self.assertEqual([(item['name'], item['abc_class']) for item in result['items']],
+                         [('Phone', 'A'), ('Charger', 'B'), ('Cable', 'C')])
+        self.assertEqual({label: band['items'] for label, band in result['abc'].items()}, {'A': 1, 'B': 1, 'C': 1})
+        self.assertEqual(result['abc']['A']['share'], 0.8)
+        self.assertEqual([category['name'] for category in result['categories']], ['Phones', 'Cables'])
+
+        result = self.get(rank_by='units', limit=2).json()
+        self.assertEqual([item['name'] for item in result['items']], ['Cable', 'Charger'])
+        result = self.get(rank_by='units').json()
+        self.assertEqual([category['name'] for category in result['categories']], ['Cables', 'Phones'])
+
+    def test_dead_stock(self):
+        result = self.get().json()
+        # Items in stock without a sale in the range; sold out items aren't dead stock
+        self.assertEqual([(row['name'], row['stock_value']) for row in result['dead_stock']], [('Case', '120.00')])
+        self.assertEqual(result['dead_stock_count'], 1)
+
+    def test_limit_must_be_positive(self):
+        for limit in ('0', '-1', 'many'):
+            response = self.get(limit=limit)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('limit', response.json()['errors'])
+        self.assertEqual(len(self.get(limit=1).json()['items']), 1)
+
+    def test_results_are_cached_per_range(self):
+        today = timezone.localdate()
+        self.assertEqual(self.get().json()['totals']['units'], 61)
+        Sale.objects.create(item=Item.objects.get(name='Case'), quantity_sold=1, selling_price=Decimal('40.00'))
+        store = get_default_store()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_analytics(today - timedelta(days=29), today, store)['totals']['units'], 61)
+        # Another range is computed on its own
+        self.assertEqual(self.get(start=today.isoformat()).json()['totals']['units'], 62)
+
+
+class ItemEditConflictTests(TestCase):
+    """Item edits only write the fields that changed, and never over a newer version"""
+
+    def setUp(self):
+        category = Category.objects.create(name='Phones')
+        self.item = Item.objects.create(name='Charger', category=category, buying_price=Decimal('100.00'),
+                                        selling_price=Decimal('150.00'), quantity=10)
+        self.url = reverse('item_update', args=[self.item.pk])
+
+    def form_data(self, **changes):
+        """What the edit form posts when it was loaded now"""
+        data = {
+            'name': self.item.name, 'sku': '', 'category': self.item.category_id,
+            'buying_price': self.item.buying_price, 'selling_price': self.item.selling_price,
+            'quantity': self.item.quantity, 'low_stock_threshold': self.item.low_stock_threshold,
+            'version': self.item.version, 'original_quantity': self.item.quantity,
+        }
+        data.update(changes)
+        return data
+
+    def test_price_edit_keeps_sales_made_meanwhile(self):
+        data = self.form_data(selling_price='175.00')
+        self.item.sell_item(3)
+        response = self.client.post(self.url, data)
+        self.assertRedirects(response, reverse('item_list'), fetch_redirect_response=False)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.selling_price, Decimal('175.00'))
+        self.assertEqual(self.item.quantity, 7)
+        self.assertEqual(self.item.version, 2)
+
+    def test_stale_edit_is_a_conflict(self):
+        data = self.form_data(selling_price='175.00')
+        Item.objects.filter(pk=self.item.pk).update(selling_price=Decimal('160.00'), version=2)
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.context['form']['selling_price'].value(), Decimal('175.00'))
+        self.assertEqual(response.context['form']['version'].value(), 2)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.selling_price, Decimal('160.00'))
+
+        # Saving the merge form applies the edit on top of the other one
+        self.client.post(self.url, self.form_data(selling_price='175.00'))
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.selling_price, Decimal('175.00'))
+
+    def test_stock_edit_conflicts_with_sales(self):
+        data = self.form_data(quantity=20)
+        self.item.sell_item(3)
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 409)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 7)
+
+
+class GoodsReceiptTests(TestCase):
+    """A whole delivery is booked in with a fixed number of queries"""
+
+    def setUp(self):
+        category = Category.objects.create(name='Accessories')
+        self.items = Item.objects.bulk_create(
+            Item(name=f'Item {i}', sku=f'{700000000000 + i}', category=category, buying_price=Decimal('100.00'),
+                 selling_price=Decimal('150.00'), quantity=2)
+            for i in range(50)
+        )
+        StockAlert.reconcile()
+
+    def receive(self, lines, **data):
+        return self.client.post(reverse('goods_receipt_create'), {'lines': '\n'.join(lines), **data})
+
+    def test_receive_delivery(self):
+        lines = [f'{item.sku}, 10' for item in self.items]
+        lines[0] = f'#{self.items[0].pk}, 5, 90.00'
+        with self.assertNumQueries(8):
+            response = self.receive(lines, supplier='Acme', reference='DN-1')
+        receipt = GoodsReceipt.objects.get()
+        self.assertRedirects(response, reverse('goods_receipt_detail', args=[receipt.pk]), fetch_redirect_response=False)
+        self.assertEqual(receipt.lines.count(), 50)
+
+        first, second = Item.objects.filter(pk__in=[self.items[0].pk, self.items[1].pk]).order_by('pk')
+        self.assertEqual((first.quantity, first.buying_price, first.version), (7, Decimal('90.00'), 2))
+        self.assertEqual((second.quantity, second.buying_price, second.version), (12, Decimal('100.00'), 1))
+        self.assertFalse(StockAlert.objects.filter(is_alert_active=True).exists())
+
+    def test_bad_lines_book_nothing(self):
+        response = self.receive([f'{self.items[0].sku}, 10', 'unknown, 3', '#999999, 1'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['form'].errors['lines']), 2)
+        response = self.receive([f'{self.items[0].sku}, 10', f'{self.items[1].sku}, -1'])
+        self.assertEqual(response.context['form'].errors['lines'], ['Line 2: quantity must be greater than zero.'])
+        self.assertFalse(GoodsReceipt.objects.exists())
+        self.assertEqual(Item.objects.get(pk=self.items[0].pk).quantity, 2)
+
+
+class CategoryCacheTests(TestCase):
+    """Category dropdowns render from the reference data cache"""
+
+    def setUp(self):
+        self.store = get_default_store()
+        Category.objects.create(name='Phones')
+
+    def test_dropdowns_render_without_queries(self):
+        str(SearchForm(store=self.store))
+        with self.assertNumQueries(0):
+            search_form = str(SearchForm(store=self.store))
+            item_form = str(ItemForm(store=self.store))
+        self.assertIn('Phones', search_form)
+        self.assertIn('Phones', item_form)
+
+    def test_new_category_shows_up(self):
+        str(SearchForm(store=self.store))
+        Category.objects.create(name='Tablets')
+        self.assertIn('Tablets', str(SearchForm(store=self.store)))
+
+    def test_choice_is_validated_against_the_cache(self):
+        category = Category.objects.get(name='Phones')
+        str(SearchForm(store=self.store))
+        with self.assertNumQueries(0):
+            form = SearchForm({'category': category.pk}, store=self.store)
+            self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['category'], category)
+        self.assertFalse(SearchForm({'category': category.pk + 100}, store=self.store).is_valid())
+
+
+class RepricingTests(TestCase):
+    """Repricing a category updates only the items it read, and never puts selling below buying"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Chargers')
+        Item.objects.bulk_create(
+            Item(name=f'Charger {i}', category=self.category, buying_price=Decimal('100.00'),
+                 selling_price=Decimal('150.00') if i else Decimal('101.00'), quantity=1)
+            for i in range(20)
+        )
+
+    def test_reprice_category(self):
+        items = Item.objects.filter(category=self.category)
+        with self.assertNumQueries(6):
+            repriced, skipped = reprice(items, percent=Decimal('-4'), step='5', reason='Promotion')
+        self.assertEqual((repriced, skipped), (19, 1))
+
+        item = Item.objects.get(name='Charger 1')
+        self.assertEqual((item.selling_price, item.buying_price, item.version), (Decimal('145.00'), Decimal('100.00'), 2))
+        self.assertEqual(Item.objects.get(name='Charger 0').selling_price, Decimal('101.00'))
+        history = PriceHistory.objects.get(item=item)
+        self.assertEqual((history.selling_price, history.reason), (Decimal('150.00'), 'Promotion'))
+        self.assertEqual(PriceHistory.objects.count(), 19)
+
+    def test_only_items_read_are_repriced(self):
+        bulk_create = PriceHistory.objects.bulk_create
+
+        def write_history(*args, **kwargs):
+            # Charger 0 becomes eligible after the prices were read
+            Item.objects.filter(name='Charger 0').update(selling_price=Decimal('150.00'))
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch('APPS.inventory.repricing.CHUNK_SIZE', 5), \
+                mock.patch.object(PriceHistory.objects, 'bulk_create', write_history):
+            repriced, skipped = reprice(Item.objects.filter(category=self.category), percent=Decimal('-4'), step='5')
+        self.assertEqual((repriced, skipped), (19, 1))
+        self.assertEqual(Item.objects.filter(selling_price=Decimal('145.00')).count(), 19)
+        self.assertEqual(Item.objects.get(name='Charger 0').selling_price, Decimal('150.00'))
+        self.assertEqual(PriceHistory.objects.count(), 19)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('reprice_items', '--category', 'Chargers', '--target', 'both', '--amount', '10', stdout=out)
+        self.assertIn('Repriced 20 item(s)', out.getvalue())
+        item = Item.objects.get(name='Charger 0')
+        self.assertEqual((item.buying_price, item.selling_price), (Decimal('110.00'), Decimal('111.00')))
+
+
+@override_settings(CONDITIONAL_REQUESTS=True)
+class ConditionalRequestTests(TestCase):
+    """Reports and the dashboard answer revalidations with 304 until the store's data changes"""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Phones')
+        self.item = Item.objects.create(name='Charger', category=category, buying_price=Decimal('100.00'),
+                                        selling_price=Decimal('150.00'), quantity=10)
+
+    def test_unchanged_dashboard_is_not_modified(self):
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_sale_changes_report(self):
+        url = reverse('download_report', args=['daily'])
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(etag, self.client.get(reverse('download_report', args=['weekly']))['ETag'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.sell_item(1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class SKUCacheTests(TestCase):
+    """Scans are answered from the per-process cache until the item changes"""
+
+    def setUp(self):
+        sku_cache.clear()
+        category = Category.objects.create(name='Phones')
+        self.item = Item.objects.create(name='Charger', sku='600000000001', category=category, quantity=8,
+                                        buying_price=Decimal('100.00'), selling_price=Decimal('150.00'))
+
+    def test_scan(self):
+        response = self.client.get(reverse('scan', args=[' 600000000001 ']))
+        self.assertEqual(response.json()['id'], self.item.pk)
+        self.assertEqual(response.json()['selling_price'], '150.00')
+        hits = sku_cache.hits
+        self.assertEqual(self.client.get(reverse('scan', args=['600000000001'])).json(), response.json())
+        self.assertEqual(sku_cache.hits, hits + 1)
+
+        response = self.client.get(reverse('scan', args=['999']))
+        self.assertEqual((response.status_code, response.json()), (404, {'error': 'Item not found'}))
+
+    def test_saving_an_item_drops_its_entry(self):
+        store_id = self.item.store_id
+        lookup_sku('600000000001', store_id)
+        self.item.selling_price = Decimal('160.00')
+        self.item.save()
+        self.assertEqual(len(sku_cache), 0)
+        self.assertEqual(lookup_sku('600000000001', store_id)['selling_price'], '160.00')
+
+        # A new SKU drops the entry under the old one
+        self.item.sku = '600000000009'
+        self.item.save()
+        self.assertIsNone(lookup_sku('600000000001', store_id))
+        self.assertEqual(lookup_sku('600000000009', store_id)['id'], self.item.pk)
+
+
+class ForecastTests(TestCase):
+    """Velocity, stockout and reorder figures from known daily sales"""
+
+    def test_compute_forecast(self):
+        # Item 1 sells 2 a day for ten days, item 2 never sells, item 3 sold 3 yesterday and 1 today and is out
+        result = compute_forecast(
+            [1, 2, 3], [30, 5, 0],
+            sale_item_ids=[1] * 10 + [3, 3], sale_ages=list(range(10)) + [0, 1], sale_units=[2] * 10 + [1, 3],
+            half_life_days=1, lead_time_days=7, safety_days=3, cover_days=14,
+        )
+        self.assertEqual(result['has_history'].tolist(), [True, False, True])
+
+        # A steady rate is its own average; otherwise yesterday weighs half as much as today
+        self.assertAlmostEqual(result['velocity'][0], 2.0)
+        self.assertEqual(result['velocity'][1], 0.0)
+        self.assertAlmostEqual(result['velocity'][2], (1 + 3 * 0.5) / (1 + 0.5))
+
+        self.assertAlmostEqual(result['days_until_stockout'][0], 15.0)
+        self.assertTrue(np.isnan(result['days_until_stockout'][1]))
+        self.assertEqual(result['days_until_stockout'][2], 0.0)
+
+        # Reorder at 10 days' sales (lead time + safety), top up to 24 days' worth
+        self.assertEqual(result['reorder_point'].tolist(), [20, 0, 17])
+        self.assertEqual(result['reorder_quantity'].tolist(), [18, 0, 40])
+
+    def test_scans_use_the_forecast_reorder_level(self):
+        category = Category.objects.create(name='Phones')
+        item = Item.objects.create(name='Charger', sku='600000000001', category=category, quantity=8,
+                                   low_stock_threshold=5, buying_price=Decimal('100.00'),
+                                   selling_price=Decimal('150.00'))
+        idle = Item.objects.create(name='Case', sku='600000000002', category=category, quantity=3,
+                                   low_stock_threshold=5, buying_price=Decimal('10.00'), selling_price=Decimal('20.00'))
+        store = get_default_store()
+        sku_cache.clear()
+        data = lookup_sku(item.sku, store.pk)
+        self.assertEqual((data['reorder_level'], data['is_low_stock']), (5, False))
+
+        now = timezone.now()
+        Sale.objects.bulk_create(Sale(item=item, quantity_sold=2, selling_price=item.selling_price,
+                                      sold_at=now - timedelta(days=i)) for i in range(10))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(refresh_forecasts(store), 1)
+
+        data = lookup_sku(item.sku, store.pk)
+        self.assertEqual((data['reorder_level'], data['is_low_stock']), (20, True))
+        # Without sales the manual threshold still applies
+        data = lookup_sku(idle.sku, store.pk)
+        self.assertEqual((data['reorder_level'], data['is_low_stock']), (5, True))
+
+
+class ArchiveTests(TestCase):
+    """Archiving a month moves its sales into summaries, and restoring brings them back once"""
+
+    def setUp(self):
+        category = Category.objects.create(name='Phones')
+        self.item = Item.objects.create(name='Charger', category=category, buying_price=Decimal('100.00'),
+                                        selling_price=Decimal('150.00'), quantity=10)
+        self.month = (timezone.localdate() - timedelta(days=100)).replace(day=1)
+        sold_at = timezone.make_aware(datetime.combine(self.month.replace(day=15), time(12)))
+        self.old = [
+            Sale.objects.create(item=self.item, quantity_sold=quantity, selling_price=Decimal('150.00'), sold_at=sold_at)
+            for quantity in (2, 1)
+        ]
+        self.recent = Sale.objects.create(item=self.item, quantity_sold=1, selling_price=Decimal('150.00'))
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = self.settings(ARCHIVE_DIR=Path(directory.name))
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_archive_and_restore(self):
+        store = get_default_store()
+        self.assertEqual(archive_sales(store, timezone.now() - timedelta(days=30)), {self.month: 2})
+        self.assertEqual(list(Sale.objects.values_list('pk', flat=True)), [self.recent.pk])
+        summary = SaleSummary.objects.get(store=store, month=self.month, item_id=self.item.pk)
+        self.assertEqual((summary.sales_count, summary.units, summary.revenue, summary.profit),
+                         (2, 3, Decimal('450.00'), Decimal('150.00')))
+
+        # The partition is only removed once the restore commits, so it can be read twice
+        self.assertEqual(restore_sales(store, self.month), 2)
+        self.assertEqual(
+            set(Sale.objects.values_list('pk', 'quantity_sold', 'sold_at')),
+            {(sale.pk, sale.quantity_sold, sale.sold_at) for sale in self.old + [self.recent]},
+        )
+        self.assertFalse(SaleSummary.objects.exists())
+        self.assertEqual(restore_sales(store, self.month), 0)
+        self.assertEqual(Sale.objects.count(), 3)
+
+    def test_crashed_run_is_not_counted_twice(self):
+        store = get_default_store()
+        archive_sales(store, timezone.now() - timedelta(days=30))
+        late = Sale.objects.create(item=self.item, quantity_sold=4, selling_price=Decimal('150.00'),
+                                   sold_at=self.old[0].sold_at)
+        # A second run writes its file, then dies before deleting the sale
+        with mock.patch('APPS.inventory.archive.add_to_summaries', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                archive_sales(store, timezone.now() - timedelta(days=30))
+        self.assertTrue(Sale.objects.filter(pk=late.pk).exists())
+
+        # Part of the month is read from its files, skipping the sale that is still live
+        totals = archived_sales_by_item(self.month.replace(day=10), self.month.replace(day=20), store)
+        self.assertEqual((totals[self.item.pk]['sales_count'], totals[self.item.pk]['units']), (2, 3))
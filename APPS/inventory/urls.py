@@ -17,9 +17,18 @@ urlpatterns = [
     
     # Sales
     path('items/<int:item_id>/sell/', views.sell_item_view, name='sell_item'),
+
+    # Goods receiving
+    path('receipts/add/', views.goods_receipt_create_view, name='goods_receipt_create'),
+    path('receipts/<int:pk>/', views.goods_receipt_detail_view, name='goods_receipt_detail'),
     
     # Ajax endpoints
     path('api/check-stock/', views.check_stock_view, name='check_stock'),
+    path('api/sales/batch/', views.sale_batch_view, name='sale_batch'),
+    path('api/scan/<str:sku>/', views.scan_view, name='scan'),
+
+    path('analytics/', views.analytics_view, name='analytics'),
+    path('api/analytics/', views.analytics_api_view, name='analytics_api'),
 
     path('report/', report_view, name='report'),
     path('report/download/<str:timeframe>/', download_report, name='download_report'),
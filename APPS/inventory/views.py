@@ -4,16 +4,24 @@ from django.db.models import Q
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.http import JsonResponse
+from django.views.decorators.http import require_POST
+from django.conf import settings
+import json
+from decimal import Decimal
 from calendar import monthrange  # Make sure this import is here and not commented
 
-from .models import Item, Category, Sale, StockAlert
-from .forms import ItemForm, CategoryForm, SaleForm, SearchForm
+from .models import Item, Category, Sale, StockAlert, GoodsReceipt
+from .forms import EditConflict, ItemForm, CategoryForm, SaleForm, SearchForm, AnalyticsForm, GoodsReceiptForm
+from .analytics import get_analytics, ranked
+from .categories import store_categories
+from .ingest import ingest_sales, ACCEPTED, DUPLICATE, REJECTED
+from .receiving import receive_goods
+from .sku_cache import lookup_sku
 from django.http import HttpResponse
-from django.db.models import Sum
+from django.db.models import Sum, F, DecimalField
 from django.utils.timezone import now, timedelta
-from django.template.loader import get_template
-from xhtml2pdf import pisa
-from .models import Sale
+from STORE_MANAGER.pdf import PDFReport, render_pdf_response
+from STORE_MANAGER.watermarks import conditional
 # Item Management Views
 class ItemListView(ListView):
     model = Item
@@ -21,8 +29,9 @@ class ItemListView(ListView):
     context_object_name = 'items'
     
     def get_queryset(self):
-        queryset = Item.objects.all()
-        form = SearchForm(self.request.GET)
+        # The template shows the category and checks the forecast for every item
+        queryset = Item.objects.filter(store=self.request.store).select_related('category', 'forecast').order_by('name')
+        form = SearchForm(self.request.GET, store=self.request.store)
         
         if form.is_valid():
             search_query = form.cleaned_data.get('search_query')
@@ -41,15 +50,26 @@ class ItemListView(ListView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['search_form'] = SearchForm(self.request.GET)
+        context['search_form'] = SearchForm(self.request.GET, store=self.request.store)
         
         # Get low stock alerts
-        low_stock_items = Item.objects.filter(quantity__lte=Item.objects.values('low_stock_threshold'))
+        low_stock_items = Item.objects.filter(store=self.request.store).low_stock().select_related('forecast')
         context['low_stock_items'] = low_stock_items
         
         return context
 
-class ItemCreateView(CreateView):
+class StoreItemMixin:
+    """Item views only see the current store's items, and their forms only its categories"""
+
+    def get_queryset(self):
+        return Item.objects.filter(store=self.request.store)
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['store'] = self.request.store
+        return kwargs
+
+class ItemCreateView(StoreItemMixin, CreateView):
     model = Item
     form_class = ItemForm
     template_name = 'inventory/item_form.html'
@@ -64,14 +84,17 @@ class ItemCreateView(CreateView):
         messages.success(self.request, f"Item '{self.object.name}' added successfully!")
         return response
 
-class ItemUpdateView(UpdateView):
+class ItemUpdateView(StoreItemMixin, UpdateView):
     model = Item
     form_class = ItemForm
     template_name = 'inventory/item_form.html'
     success_url = reverse_lazy('item_list')
     
     def form_valid(self, form):
-        response = super().form_valid(form)
+        try:
+            response = super().form_valid(form)
+        except EditConflict as conflict:
+            return self.conflict_response(form, conflict.fields)
         
         # Update stock alert
         alert, created = StockAlert.objects.get_or_create(item=self.object)
@@ -80,10 +103,30 @@ class ItemUpdateView(UpdateView):
         messages.success(self.request, f"Item '{self.object.name}' updated successfully!")
         return response
 
+    def conflict_response(self, form, fields):
+        """Show the user's edits next to the item as it is now, with a form to apply them again"""
+        current = self.get_object()
+        mine = {name: form.cleaned_data[name] for name in fields}
+        changes = [
+            {'label': form.fields[name].label, 'mine': value, 'current': getattr(current, name)}
+            for name, value in mine.items()
+        ]
+        # Prefilled with the user's edits on top of the current item and its new version
+        merge_form = ItemForm(instance=current, store=self.request.store, initial=mine)
+        return render(self.request, self.template_name, {
+            'form': merge_form,
+            'object': current,
+            'item': current,
+            'changes': changes,
+        }, status=409)
+
 class ItemDeleteView(DeleteView):
     model = Item
     template_name = 'inventory/item_confirm_delete.html'
     success_url = reverse_lazy('item_list')
+
+    def get_queryset(self):
+        return Item.objects.filter(store=self.request.store)
     
     def delete(self, request, *args, **kwargs):
         item = self.get_object()
@@ -98,6 +141,11 @@ class CategoryCreateView(CreateView):
     template_name = 'inventory/category_form.html'
     success_url = reverse_lazy('item_list')
     
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['store'] = self.request.store
+        return kwargs
+
     def form_valid(self, form):
         response = super().form_valid(form)
         messages.success(self.request, f"Category '{self.object.name}' created successfully!")
@@ -105,7 +153,7 @@ class CategoryCreateView(CreateView):
 
 # Sales Management Views
 def sell_item_view(request, item_id):
-    item = get_object_or_404(Item, id=item_id)
+    item = get_object_or_404(Item, id=item_id, store=request.store)
     
     if request.method == 'POST':
         form = SaleForm(request.POST, item_id=item_id)
@@ -138,12 +186,69 @@ def sell_item_view(request, item_id):
         'item': item
     })
 
+# Goods receiving
+def goods_receipt_create_view(request):
+    """Book a whole delivery into stock at once"""
+    if request.method == 'POST':
+        form = GoodsReceiptForm(request.POST, store=request.store)
+        if form.is_valid():
+            receipt = receive_goods(
+                request.store,
+                form.cleaned_data['lines'],
+                supplier=form.cleaned_data['supplier'],
+                reference=form.cleaned_data['reference'],
+                received_by=request.user.get_username() if request.user.is_authenticated else '',
+            )
+            messages.success(request, f"Received {len(form.cleaned_data['lines'])} line(s) into stock.")
+            return redirect('goods_receipt_detail', pk=receipt.pk)
+    else:
+        form = GoodsReceiptForm(store=request.store)
+
+    return render(request, 'inventory/goods_receipt_form.html', {'form': form})
+
+def goods_receipt_detail_view(request, pk):
+    receipt = get_object_or_404(GoodsReceipt, pk=pk, store=request.store)
+    lines = receipt.lines.select_related('item').order_by('pk')
+    return render(request, 'inventory/goods_receipt_detail.html', {'receipt': receipt, 'lines': lines})
+
+@require_POST
+def sale_batch_view(request):
+    """Record a batch of sales replayed by a till after being offline"""
+    try:
+        payload = json.loads(request.body)
+        entries = payload['sales']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected a JSON object with a "sales" list.'}, status=400)
+    if not isinstance(entries, list):
+        return JsonResponse({'error': '"sales" must be a list.'}, status=400)
+
+    max_size = getattr(settings, 'SALE_BATCH_MAX_SIZE', 500)
+    if len(entries) > max_size:
+        return JsonResponse({'error': f'A batch can hold at most {max_size} sales.'}, status=413)
+
+    results = ingest_sales(entries, request.store)
+    statuses = [result['status'] for result in results]
+    return JsonResponse({
+        'accepted': statuses.count(ACCEPTED),
+        'duplicates': statuses.count(DUPLICATE),
+        'rejected': statuses.count(REJECTED),
+        'results': results,
+    })
+
+def scan_view(request, sku):
+    """Resolve a scanned barcode to the item's id, price and stock"""
+    data = lookup_sku(sku.strip(), request.store.pk)
+    if data is None:
+        return JsonResponse({'error': 'Item not found'}, status=404)
+    return JsonResponse(data)
+
 # Ajax view for checking stock
 def check_stock_view(request):
-    if request.is_ajax():
+    # HttpRequest.is_ajax() was removed in Django 4.0
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         item_id = request.GET.get('item_id')
         try:
-            item = Item.objects.get(id=item_id)
+            item = Item.objects.get(id=item_id, store=request.store)
             return JsonResponse({
                 'quantity': item.quantity,
                 'is_low_stock': item.is_low_stock(),
@@ -153,17 +258,19 @@ def check_stock_view(request):
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
 # Dashboard and Reports
+@conditional('sales', 'items')
 def dashboard_view(request):
     # Get low stock alerts
-    low_stock_items = Item.objects.filter(quantity__lte=Item.objects.values('low_stock_threshold'))
+    items = Item.objects.filter(store=request.store)
+    low_stock_items = items.low_stock().select_related('forecast')
     
     # Get recent sales (last 10)
-    recent_sales = Sale.objects.order_by('-sold_at')[:10]
+    recent_sales = Sale.objects.filter(store=request.store).select_related('item').order_by('-sold_at')[:10]
     # Get total items and categories
-    total_items = Item.objects.count()
-    total_worth = Item.objects.aggregate(total=Sum('buying_price'))['total'] or 0
+    total_items = items.count()
+    total_worth = items.aggregate(total=Sum('buying_price'))['total'] or 0
 
-    total_categories = Category.objects.count()
+    total_categories = len(store_categories(request.store.pk))
     
     return render(request, 'inventory/dashboard.html', {
         'low_stock_items': low_stock_items,
@@ -176,8 +283,45 @@ def dashboard_view(request):
     })
 
 
-def generate_report(timeframe):
-    """Helper function to filter sales data based on timeframe."""
+def analytics_view(request):
+    """Top sellers, ABC classes and dead stock for a date range"""
+    form = AnalyticsForm(request.GET)
+    params = form.params()
+
+    analytics = get_analytics(params['start'], params['end'], request.store)
+    rank_by = params['rank_by']
+    return render(request, 'inventory/analytics.html', {
+        'form': form,
+        'analytics': analytics,
+        'rank_by': rank_by,
+        'top_items': ranked(analytics['items'], rank_by, limit=20),
+        'bottom_items': ranked(analytics['items'], rank_by)[-20:][::-1],
+        'categories': ranked(analytics['categories'], rank_by),
+    })
+
+def analytics_api_view(request):
+    """JSON version of the analytics view"""
+    form = AnalyticsForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    limit = form.cleaned_data['limit']
+
+    analytics = get_analytics(form.cleaned_data['start'], form.cleaned_data['end'], request.store)
+    rank_by = form.cleaned_data['rank_by']
+    return JsonResponse({
+        'start': analytics['start'],
+        'end': analytics['end'],
+        'rank_by': rank_by,
+        'totals': analytics['totals'],
+        'abc': analytics['abc'],
+        'items': ranked(analytics['items'], rank_by, limit=limit),
+        'categories': ranked(analytics['categories'], rank_by),
+        'dead_stock': analytics['dead_stock'][:limit],
+        'dead_stock_count': analytics['dead_stock_count'],
+    })
+
+def generate_report(timeframe, store):
+    """Helper function to filter a store's sales data based on timeframe."""
     today = now().date()
     
     if timeframe == 'daily':
@@ -203,23 +347,38 @@ def generate_report(timeframe):
     start_datetime = make_aware(datetime.combine(start_date, time.min))
     end_datetime = make_aware(datetime.combine(end_date, time.max))
 
-    sales = Sale.objects.filter(sold_at__range=[start_datetime, end_datetime])
-    total_profit = sum(sale.profit() for sale in sales)
+    sales = Sale.objects.filter(store=store, sold_at__range=[start_datetime, end_datetime]).select_related('item')
+    # Sum profit in the database instead of looping over every sale
+    profit = (F('selling_price') - F('item__buying_price')) * F('quantity_sold')
+    total_profit = sales.aggregate(
+        total=Sum(profit, output_field=DecimalField(max_digits=12, decimal_places=2))
+    )['total'] or Decimal('0')
+    total_profit = total_profit.quantize(Decimal('0.01'))  # SQLite doesn't round aggregates
 
     return sales, total_profit
 
+def iter_sale_rows(sales, chunk_size=2000):
+    """Yield PDF table rows for sales, fetched from the database in chunks"""
+    rows = sales.values_list(
+        'item__name', 'quantity_sold', 'selling_price', 'item__buying_price', 'sold_at'
+    ).iterator(chunk_size=chunk_size)
+    for name, quantity_sold, selling_price, buying_price, sold_at in rows:
+        yield name, quantity_sold, f"Ksh {(selling_price - buying_price) * quantity_sold}", sold_at
+
+@conditional('sales', 'items')
 def report_view(request):
     """Render the report page with sales data."""
     reports = [
-        ('Daily', *generate_report('daily')),
-        ('Weekly', *generate_report('weekly')),
-        ('Monthly', *generate_report('monthly')),
+        ('Daily', *generate_report('daily', request.store)),
+        ('Weekly', *generate_report('weekly', request.store)),
+        ('Monthly', *generate_report('monthly', request.store)),
     ]
     return render(request, 'inventory/report.html', {'reports': reports})
 
+@conditional('sales', 'items', key=lambda request, timeframe: timeframe)
 def download_report(request, timeframe):
     """Generate a PDF report based on the selected timeframe."""
-    sales, total_profit = generate_report(timeframe)
+    sales, total_profit = generate_report(timeframe, request.store)
     
     # You could include date information if needed for the PDF
     today = now().date()
@@ -244,14 +403,13 @@ def download_report(request, timeframe):
         'generated_on': now()
     }
     
-    template = get_template(template_path)
-    html = template.render(context)
-
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{timeframe}_report.pdf"'
-
-    pisa_status = pisa.CreatePDF(html, dest=response)
-    if pisa_status.err:
-        return HttpResponse('Error generating PDF', content_type='text/plain')
-
-    return response
\ No newline at end of file
+    report = PDFReport(
+        title=report_title,
+        template_name=template_path,
+        context=context,
+        columns=['Item', 'Quantity', 'Profit', 'Date'],
+        rows=iter_sale_rows(sales),
+        row_count=sales.count(),
+        totals=[('Total Profit', f"Ksh {total_profit}")],
+    )
+    return render_pdf_response(report, f"{timeframe}_report.pdf")
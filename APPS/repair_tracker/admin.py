@@ -1,25 +1,49 @@
 # repair_tracker/admin.py
+import re
+
 from django.contrib import admin
 from django.contrib import messages
-from .models import Repair, Revenue
+from django.utils import timezone
+from APPS.report.ledger import remove_repairs
+from STORE_MANAGER.watermarks import touch
+
+from .models import Repair, RepairStatusChange, RepairSummary, Revenue
+from .phones import normalize_phone, prefix_range
+
+re_phone_search = re.compile(r'^[\d\s+()-]+$')
 
 @admin.register(Repair)
 class RepairAdmin(admin.ModelAdmin):
-    list_display = ['owner_name', 'phone_name', 'status', 'charges', 'created_at']
-    list_filter = ['status']
+    list_display = ['owner_name', 'phone_name', 'status', 'charges', 'store', 'created_at']
+    list_filter = ['store', 'status']
     search_fields = ['owner_name', 'owner_phone', 'phone_name']
     actions = ['reset_repairs', 'mark_as_collected', 'delete_selected']
 
+    def get_search_results(self, request, queryset, search_term):
+        # A phone number is looked up on the indexed normalized number instead of icontains over every repair
+        if re_phone_search.match(search_term) and normalize_phone(search_term):
+            return queryset.filter(**prefix_range(normalize_phone(search_term))), False
+        return super().get_search_results(request, queryset, search_term)
+
     def reset_repairs(self, request, queryset):
+        # update() bypasses Repair.save(), which logs status changes
+        reopened = list(queryset.exclude(status='IN_PROGRESS').values_list('pk', 'store_id', 'status'))
         queryset.update(status='IN_PROGRESS', collected_at=None)
+        now = timezone.now()
+        RepairStatusChange.objects.bulk_create(
+            RepairStatusChange(store_id=store_id, repair_id=pk, from_status=status, to_status='IN_PROGRESS', changed_at=now)
+            for pk, store_id, status in reopened
+        )
+        for store_id in set(queryset.values_list('store_id', flat=True)):
+            touch('repairs', store_id)
         # Delete associated revenue records
         for repair in queryset:
             Revenue.objects.filter(repair=repair).delete()
+        remove_repairs(list(queryset.values_list('pk', flat=True)))
         self.message_user(request, f"{queryset.count()} repairs have been reset to 'In Progress'.")
     reset_repairs.short_description = "Reset selected repairs to 'In Progress'"
 
     def mark_as_collected(self, request, queryset):
-        from django.utils import timezone
         now = timezone.now()
         
         for repair in queryset:
@@ -46,11 +70,20 @@ class RepairAdmin(admin.ModelAdmin):
         
         # Then delete the repairs
         deletion_count = queryset.count()
+        store_ids = set(queryset.values_list('store_id', flat=True))
+        remove_repairs(list(queryset.values_list('pk', flat=True)))
         queryset.delete()
+        for store_id in store_ids:
+            touch('repairs', store_id)
         
         self.message_user(request, f"{deletion_count} repairs have been permanently deleted.")
     delete_selected.short_description = "Delete selected repairs permanently"
 
+    def delete_model(self, request, obj):
+        remove_repairs([obj.pk])
+        super().delete_model(request, obj)
+        touch('repairs', obj.store_id)
+
 @admin.register(Revenue)
 class RevenueAdmin(admin.ModelAdmin):
     list_display = ['repair', 'amount', 'collected_at']
@@ -60,6 +93,31 @@ class RevenueAdmin(admin.ModelAdmin):
 
     def delete_selected(self, request, queryset):
         deletion_count = queryset.count()
+        repairs = list(queryset.values_list('repair_id', 'repair__store_id'))
         queryset.delete()
+        remove_repairs([repair_id for repair_id, _ in repairs])
+        for store_id in {store_id for _, store_id in repairs}:
+            touch('repairs', store_id)
         self.message_user(request, f"{deletion_count} revenue records have been permanently deleted.")
-    delete_selected.short_description = "Delete selected revenue records permanently"
\ No newline at end of file
+    delete_selected.short_description = "Delete selected revenue records permanently"
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        remove_repairs([obj.repair_id])
+        touch('repairs', obj.repair.store_id)
+
+@admin.register(RepairSummary)
+class RepairSummaryAdmin(admin.ModelAdmin):
+    list_display = ['month', 'store', 'repairs_count', 'revenue']
+    list_filter = ['store']
+    ordering = ['-month']
+
+@admin.register(RepairStatusChange)
+class RepairStatusChangeAdmin(admin.ModelAdmin):
+    list_display = ['repair', 'from_status', 'to_status', 'changed_at', 'store']
+    list_filter = ['store', 'to_status']
+    list_select_related = ['repair']
+    readonly_fields = ['store', 'repair', 'from_status', 'to_status', 'changed_at']
+
+    def has_add_permission(self, request):
+        return False
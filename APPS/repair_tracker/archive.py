@@ -0,0 +1,174 @@
+"""
+Moving old collected repairs (and their revenue rows) out of the hot tables.
+
+Works like the sales archive: each month before the horizon is written to a
+compressed archive partition, folded into RepairSummary and then deleted.
+Repairs that haven't been collected are never archived.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Min
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import localdate, make_aware
+
+from APPS.report.ledger import record_repairs
+from STORE_MANAGER.archive import archived_rows, months_between, next_month, read_partition, remove_partition, write_partition
+from STORE_MANAGER.watermarks import touch
+
+from .models import Repair, RepairSummary, Revenue
+from .phones import normalize_phone
+
+KIND = 'repairs'
+CHUNK_SIZE = 2000
+
+FIELDS = (
+    'id', 'owner_name', 'owner_phone', 'phone_name', 'phone_model', 'issue_description',
+    'charges', 'status', 'created_at', 'updated_at', 'collected_at',
+)
+
+
+def partition(store):
+    return f'{KIND}/{store.code}'
+
+
+def month_range(month, before=None):
+    start = make_aware(datetime.combine(month, time.min))
+    end = make_aware(datetime.combine(next_month(month), time.min))
+    return start, min(end, before) if before else end
+
+
+def row_revenue(row):
+    """Revenue of an archived repair; the charges when no revenue row was recorded"""
+    return Decimal(row['revenue']['amount'] if row['revenue'] else row['charges'])
+
+
+def collected_between(store, start, end):
+    return Repair.objects.filter(store=store, status='COLLECTED', collected_at__gte=start, collected_at__lt=end)
+
+
+def archive_month(store, month, before):
+    """Archive one month of a store's repairs collected before ``before``; returns the number moved"""
+    start, end = month_range(month, before)
+    ids = []
+    revenue = Decimal('0.00')
+
+    def rows():
+        nonlocal revenue
+        repairs = (
+            collected_between(store, start, end)
+            .order_by('pk')
+            .values_list(*FIELDS, 'revenue__id', 'revenue__amount', 'revenue__collected_at')
+        )
+        for values in repairs.iterator(chunk_size=CHUNK_SIZE):
+            row = dict(zip(FIELDS, values))
+            revenue_id, amount, revenue_collected_at = values[len(FIELDS):]
+            row['charges'] = str(row['charges'])
+            row['revenue'] = None
+            if revenue_id:
+                row['revenue'] = {'id': revenue_id, 'amount': str(amount), 'collected_at': revenue_collected_at}
+            ids.append(row['id'])
+            revenue += row_revenue(row)
+            yield row
+
+    count = write_partition(partition(store), month, rows())
+    if count:
+        with transaction.atomic():
+            summary, _ = RepairSummary.objects.select_for_update().get_or_create(store=store, month=month)
+            summary.repairs_count += count
+            summary.revenue += revenue
+            summary.save()
+            for i in range(0, len(ids), CHUNK_SIZE):
+                # Deleting the repairs cascades to their revenue rows
+                Repair.objects.filter(pk__in=ids[i:i + CHUNK_SIZE]).delete()
+            touch('repairs', store.pk)
+    return count
+
+
+def archive_repairs(store, before, dry_run=False):
+    """Archive all of a store's repairs collected before ``before``; returns {month: repairs moved}"""
+    first = Repair.objects.filter(store=store, status='COLLECTED', collected_at__lt=before).aggregate(first=Min('collected_at'))['first']
+    if first is None:
+        return {}
+    moved = {}
+    for month in months_between(localdate(first), localdate(before - timedelta(microseconds=1))):
+        if dry_run:
+            count = collected_between(store, *month_range(month, before)).count()
+        else:
+            count = archive_month(store, month, before)
+        if count:
+            moved[month] = count
+    return moved
+
+
+def chunked(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == CHUNK_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def restore_repairs(store, month):
+    """Put an archived month of a store's repairs back into the Repair and Revenue tables; returns the number restored"""
+    count = 0
+    with transaction.atomic():
+        for batch in chunked(read_partition(partition(store), month)):
+            # Repairs already back (an earlier restore, or never deleted) are skipped and not counted
+            existing = set(Repair.objects.filter(pk__in=[row['id'] for row in batch]).values_list('pk', flat=True))
+            batch = [row for row in batch if row['id'] not in existing]
+            repairs = [
+                Repair(store=store,
+                       **{field: row[field] for field in FIELDS if field not in ('charges', 'created_at', 'updated_at', 'collected_at')},
+                       owner_phone_key=normalize_phone(row['owner_phone']),
+                       charges=Decimal(row['charges']),
+                       collected_at=parse_datetime(row['collected_at']))
+                for row in batch
+            ]
+            Repair.objects.bulk_create(repairs, ignore_conflicts=True)
+            count += len(repairs)
+
+            # bulk_create stamps auto_now(_add) fields with the current time; put the originals back
+            timestamps = {row['id']: row for row in batch}
+            for repair in repairs:
+                repair.created_at = parse_datetime(timestamps[repair.pk]['created_at'])
+                repair.updated_at = parse_datetime(timestamps[repair.pk]['updated_at'])
+            Repair.objects.bulk_update(repairs, ['created_at', 'updated_at'])
+
+            revenues = Revenue.objects.bulk_create(
+                [Revenue(pk=row['revenue']['id'], repair_id=row['id'], amount=Decimal(row['revenue']['amount']),
+                         collected_at=parse_datetime(row['revenue']['collected_at']))
+                 for row in batch if row['revenue']],
+                ignore_conflicts=True,
+            )
+            # The ledger kept archived repairs; this only adds those archived before it existed
+            record_repairs((revenue, store.pk) for revenue in revenues)
+        RepairSummary.objects.filter(store=store, month=month).delete()
+        touch('repairs', store.pk)
+        transaction.on_commit(lambda: remove_partition(partition(store), month))
+    return count
+
+
+def archived_repair_totals(start_date, end_date, store):
+    """
+    Number of a store's archived repairs and their revenue, collected between two dates (inclusive).
+
+    Months the range covers completely come from RepairSummary; a month it only
+    partly covers is read from its archive file.
+    """
+    totals = {'repairs_count': 0, 'revenue': Decimal('0.00')}
+    summaries = RepairSummary.objects.filter(store=store, month__gte=start_date.replace(day=1), month__lte=end_date)
+    for summary in summaries:
+        if summary.month >= start_date and next_month(summary.month) - timedelta(days=1) <= end_date:
+            totals['repairs_count'] += summary.repairs_count
+            totals['revenue'] += summary.revenue
+            continue
+        for row in archived_rows(partition(store), summary.month, Repair):
+            if start_date <= localdate(parse_datetime(row['collected_at'])) <= end_date:
+                totals['repairs_count'] += 1
+                totals['revenue'] += row_revenue(row)
+    return totals
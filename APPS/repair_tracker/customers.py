@@ -0,0 +1,76 @@
+"""
+Returning customers, found by phone number.
+
+A customer is everyone who left a repair under the same normalized number
+(Repair.owner_phone_key). Both lookups read the (store, owner_phone_key,
+created_at) index: a prefix search walks a short range of it, a customer's
+history is an equality match. Archived repairs (archive_history) are no
+longer in the Repair table and aren't counted.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, Max, OuterRef, Q, Subquery, Sum
+
+from .models import Repair
+from .phones import normalize_phone, prefix_range
+
+MIN_PREFIX_DIGITS = 3
+MAX_MATCHES = 10
+
+
+def customer_totals():
+    return {
+        'repairs': Count('pk'),
+        'revenue': Sum('charges', filter=Q(status='COLLECTED'), default=0),
+        'last_visit': Max('created_at'),
+    }
+
+
+def with_revenue(totals):
+    # SQLite doesn't round aggregates
+    return {**totals, 'revenue': Decimal(totals['revenue']).quantize(Decimal('0.01'))}
+
+
+def find_customers(store, number, limit=MAX_MATCHES):
+    """The customers whose number starts with ``number``, with their repair count and revenue"""
+    prefix = normalize_phone(number)
+    if len(prefix) < MIN_PREFIX_DIGITS:
+        return []
+    repairs = Repair.objects.filter(store=store)
+    # The first matching numbers straight off the index, then totals for those numbers only
+    keys = list(
+        repairs.filter(**prefix_range(prefix)).order_by('owner_phone_key')
+        .values_list('owner_phone_key', flat=True).distinct()[:limit]
+    )
+    latest = repairs.filter(owner_phone_key=OuterRef('owner_phone_key')).order_by('-created_at')
+    return [with_revenue(customer) for customer in (
+        repairs.filter(owner_phone_key__in=keys).values('owner_phone_key')
+        .annotate(
+            owner_name=Subquery(latest.values('owner_name')[:1]),
+            owner_phone=Subquery(latest.values('owner_phone')[:1]),
+            **customer_totals(),
+        )
+        .order_by('owner_phone_key')
+    )]
+
+
+def customer_history(store, number):
+    """A customer's repairs, newest first, and their totals; None if the number has no repairs"""
+    key = normalize_phone(number)
+    if not key:
+        return None
+    repairs = Repair.objects.filter(store=store, owner_phone_key=key)
+    totals = with_revenue(repairs.aggregate(**customer_totals()))
+    if not totals['repairs']:
+        return None
+    history = list(repairs.order_by('-created_at').values(
+        'id', 'owner_name', 'owner_phone', 'phone_name', 'phone_model', 'issue_description', 'charges', 'status',
+        'created_at', 'collected_at',
+    ))
+    return {
+        'owner_phone_key': key,
+        'owner_name': history[0]['owner_name'],
+        'owner_phone': history[0]['owner_phone'],
+        **totals,
+        'history': history,
+    }
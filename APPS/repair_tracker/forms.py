@@ -1,4 +1,7 @@
 from django import forms
+
+from STORE_MANAGER.forms import DateRangeForm
+
 from .models import Repair
 
 class RepairForm(forms.ModelForm):
@@ -9,3 +12,6 @@ class RepairForm(forms.ModelForm):
         widgets = {
             'issue_description': forms.Textarea(attrs={'rows': 4}),
         }
+
+class TurnaroundForm(DateRangeForm):
+    """Date range of the turnaround report"""
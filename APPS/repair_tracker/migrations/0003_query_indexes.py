@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repair_tracker', '0002_repairsummary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='repair',
+            name='collected_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='repair',
+            index=models.Index(fields=['status', 'created_at'], name='repair_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:17
+
+import APPS.stores.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repair_tracker', '0003_query_indexes'),
+        ('stores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='repair',
+            name='repair_status_created_idx',
+        ),
+        migrations.AddField(
+            model_name='repair',
+            name='store',
+            field=models.ForeignKey(default=APPS.stores.models.default_store_id, on_delete=django.db.models.deletion.PROTECT, to='stores.store'),
+        ),
+        migrations.AddField(
+            model_name='repairsummary',
+            name='store',
+            field=models.ForeignKey(default=APPS.stores.models.default_store_id, on_delete=django.db.models.deletion.PROTECT, to='stores.store'),
+        ),
+        migrations.AlterField(
+            model_name='repairsummary',
+            name='month',
+            field=models.DateField(),
+        ),
+        migrations.AddIndex(
+            model_name='repair',
+            index=models.Index(fields=['store', 'status', 'created_at'], name='repair_store_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repair',
+            index=models.Index(fields=['store', 'collected_at'], name='repair_store_collected_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='repairsummary',
+            constraint=models.UniqueConstraint(fields=('store', 'month'), name='unique_repair_summary_store_month'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:59
+
+from django.db import migrations, models
+
+from APPS.repair_tracker.phones import normalize_phone
+
+BATCH_SIZE = 2000
+
+
+def fill_phone_keys(apps, schema_editor):
+    Repair = apps.get_model('repair_tracker', 'Repair')
+    repairs = Repair.objects.using(schema_editor.connection.alias)
+    batch = []
+    for repair in repairs.only('pk', 'owner_phone').iterator(chunk_size=BATCH_SIZE):
+        repair.owner_phone_key = normalize_phone(repair.owner_phone)
+        batch.append(repair)
+        if len(batch) == BATCH_SIZE:
+            repairs.bulk_update(batch, ['owner_phone_key'])
+            batch = []
+    repairs.bulk_update(batch, ['owner_phone_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repair_tracker', '0004_store'),
+        ('stores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repair',
+            name='owner_phone_key',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        # Before the index exists, so filling it doesn't update the index row by row
+        migrations.RunPython(fill_phone_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='repair',
+            index=models.Index(fields=['store', 'owner_phone_key', 'created_at'], name='repair_store_phone_idx'),
+        ),
+    ]
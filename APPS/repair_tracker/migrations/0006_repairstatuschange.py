@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-19 16:02
+
+import APPS.stores.models
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repair_tracker', '0005_owner_phone_key'),
+        ('stores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RepairStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, choices=[('IN_PROGRESS', 'In Progress'), ('COMPLETED', 'Completed'), ('COLLECTED', 'Collected')], max_length=20)),
+                ('to_status', models.CharField(choices=[('IN_PROGRESS', 'In Progress'), ('COMPLETED', 'Completed'), ('COLLECTED', 'Collected')], max_length=20)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('repair', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='repair_tracker.repair')),
+                ('store', models.ForeignKey(default=APPS.stores.models.default_store_id, on_delete=django.db.models.deletion.PROTECT, to='stores.store')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['store', 'changed_at'], name='repair_change_store_idx'), models.Index(fields=['repair', 'changed_at'], name='repair_change_repair_idx')],
+            },
+        ),
+    ]
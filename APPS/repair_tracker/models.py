@@ -2,6 +2,10 @@
 from django.db import models
 from django.utils import timezone
 
+from APPS.stores.models import Store, default_store_id
+
+from .phones import normalize_phone
+
 class Repair(models.Model):
     STATUS_CHOICES = [
         ('IN_PROGRESS', 'In Progress'),
@@ -9,8 +13,11 @@ class Repair(models.Model):
         ('COLLECTED', 'Collected'),
     ]
     
+    store = models.ForeignKey(Store, on_delete=models.PROTECT, default=default_store_id)
     owner_name = models.CharField(max_length=100)
     owner_phone = models.CharField(max_length=20)
+    # owner_phone normalized (phones.py), to find a customer's repairs by number
+    owner_phone_key = models.CharField(max_length=20, blank=True, editable=False)
     phone_name = models.CharField(max_length=100)
     phone_model = models.CharField(max_length=100)
     issue_description = models.TextField()
@@ -18,7 +25,34 @@ class Repair(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='IN_PROGRESS')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    collected_at = models.DateTimeField(null=True, blank=True)
+    collected_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        # The repair list shows a store's open repairs, newest first; reports read its collections per period
+        indexes = [
+            models.Index(fields=['store', 'status', 'created_at'], name='repair_store_status_idx'),
+            models.Index(fields=['store', 'collected_at'], name='repair_store_collected_idx'),
+            models.Index(fields=['store', 'owner_phone_key', 'created_at'], name='repair_store_phone_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        repair = super().from_db(db, field_names, values)
+        # Remembered so save() can log status changes
+        repair._saved_status = repair.__dict__.get('status')
+        return repair
+
+    def save(self, *args, **kwargs):
+        self.owner_phone_key = normalize_phone(self.owner_phone)
+        if kwargs.get('update_fields') is not None and 'owner_phone' in kwargs['update_fields']:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'owner_phone_key'}
+        previous = '' if self._state.adding else getattr(self, '_saved_status', None)
+        super().save(*args, **kwargs)
+        # None: loaded without its status, so whether it changed is unknown
+        if previous is not None and previous != self.status:
+            RepairStatusChange(store_id=self.store_id, repair=self, from_status=previous, to_status=self.status,
+                               changed_at=self.created_at if previous == '' else timezone.now()).save()
+        self._saved_status = self.status
     
     def mark_as_collected(self):
         self.status = 'COLLECTED'
@@ -35,3 +69,33 @@ class Revenue(models.Model):
     
     def __str__(self):
         return f"Revenue from {self.repair.owner_name} - ${self.amount}"
+
+class RepairStatusChange(models.Model):
+    """A repair entering a status; the turnaround metrics (turnaround.py) are computed from these"""
+    store = models.ForeignKey(Store, on_delete=models.PROTECT, default=default_store_id)
+    repair = models.ForeignKey(Repair, on_delete=models.CASCADE, related_name='status_changes')
+    from_status = models.CharField(max_length=20, choices=Repair.STATUS_CHOICES, blank=True)  # Blank: created
+    to_status = models.CharField(max_length=20, choices=Repair.STATUS_CHOICES)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['store', 'changed_at'], name='repair_change_store_idx'),
+            models.Index(fields=['repair', 'changed_at'], name='repair_change_repair_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.repair_id}: {self.from_status or 'new'} -> {self.to_status}"
+
+class RepairSummary(models.Model):
+    """Monthly totals for collected repairs moved out by the archive_history command"""
+    store = models.ForeignKey(Store, on_delete=models.PROTECT, default=default_store_id)
+    month = models.DateField()  # First day of the month
+    repairs_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['store', 'month'], name='unique_repair_summary_store_month')]
+
+    def __str__(self):
+        return f"{self.repairs_count} repairs collected in {self.month.strftime('%Y-%m')}"
@@ -0,0 +1,31 @@
+"""
+Phone numbers as keys for finding returning customers.
+
+Staff type a customer's number however it comes ('0712 345 678',
+'+254712345678', '254-712-345678'); ``normalize_phone()`` turns all of them
+into the same digits, which Repair stores in the indexed ``owner_phone_key``.
+"""
+import re
+
+from django.conf import settings
+
+re_non_digits = re.compile(r'\D')
+
+
+def normalize_phone(number):
+    """Digits only, with the country code (PHONE_COUNTRY_CODE) replaced by the trunk prefix 0"""
+    digits = re_non_digits.sub('', number or '')
+    country_code = getattr(settings, 'PHONE_COUNTRY_CODE', '254')
+    # After a '+', or followed by a whole subscriber number, the leading digits are the country code (and
+    # '254...' typed alone is the start of some other number)
+    international = (number or '').lstrip().startswith('+') or len(digits) >= len(country_code) + 9
+    if country_code and digits.startswith(country_code) and international:
+        digits = '0' + digits[len(country_code):]
+    return digits
+
+
+def prefix_range(prefix):
+    """owner_phone_key lookups matching keys that start with ``prefix``, as an index range"""
+    # ':' sorts right after '9', so the range holds exactly the keys with the prefix. A range (unlike
+    # startswith's LIKE) uses the index on every database.
+    return {'owner_phone_key__gte': prefix, 'owner_phone_key__lt': prefix + ':'}
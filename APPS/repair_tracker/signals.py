@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from STORE_MANAGER.watermarks import touch
+
+from .models import Repair
+
+
+# No post_delete receiver: archiving deletes repairs by the thousand, and would touch once per repair
+@receiver(post_save, sender=Repair)
+def touch_repairs(sender, instance, using, **kwargs):
+    touch('repairs', instance.store_id, using=using)
@@ -1,3 +1,243 @@
+import tempfile
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from io import BytesIO
+from pathlib import Path
+
+import pypdf
+
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from STORE_MANAGER.query_plans import QueryPlanTestMixin
+
+from .archive import archive_repairs, restore_repairs
+from .models import Repair, RepairStatusChange, RepairSummary, Revenue
+from .phones import normalize_phone
+from .turnaround import compute_turnaround
+
+
+class QueryPlanTests(QueryPlanTestMixin, TestCase):
+    """The repair list and reports must not scan the whole repair history"""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        statuses = ['IN_PROGRESS', 'COMPLETED', 'COLLECTED', 'COLLECTED', 'COLLECTED']
+        Repair.objects.bulk_create(
+            Repair(owner_name=f'Owner {i}', owner_phone=f'07{i:08d}', owner_phone_key=f'07{i:08d}', phone_name='Phone', phone_model='X',
+                   issue_description='Screen', charges=Decimal('1500.00'), status=statuses[i % 5],
+                   collected_at=now - timedelta(hours=i) if statuses[i % 5] == 'COLLECTED' else None)
+            for i in range(1000)
+        )
+        Revenue.objects.bulk_create(
+            Revenue(repair=repair, amount=repair.charges, collected_at=repair.collected_at)
+            for repair in Repair.objects.filter(status='COLLECTED')
+        )
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_repair_list(self):
+        self.assertNoFullScans(lambda: self.get(reverse('repair_tracker:repair_list')))
+
+    def test_repair_history(self):
+        self.assertNoFullScans(lambda: self.get(reverse('repair_tracker:repair_history') + '?collected=3'))
+
+    def test_customer_lookup(self):
+        self.assertNoFullScans(lambda: self.get(reverse('repair_tracker:customer_lookup') + '?phone=0700000'))
+        self.assertNoFullScans(lambda: self.get(reverse('repair_tracker:customer_history', args=['0700000001'])))
+
+    def test_turnaround(self):
+        self.assertNoFullScans(lambda: self.get(reverse('repair_tracker:turnaround')))
+
+    def test_report(self):
+        self.assertNoFullScans(lambda: self.get(reverse('repair_tracker:report')))
+
+    def test_report_pdf(self):
+        self.assertNoFullScans(lambda: self.get(reverse('repair_tracker:download_report_pdf', args=['monthly'])))
+
+
+class RepairBoardTests(TestCase):
+    """The board counts every open status in one query and loads only a page of each"""
+
+    def setUp(self):
+        Repair.objects.bulk_create(
+            Repair(owner_name=f'Owner {i}', owner_phone='0700000000', phone_name='Phone', phone_model='X',
+                   issue_description='Screen', charges=Decimal('100.00'), status='COMPLETED' if i % 3 else 'IN_PROGRESS')
+            for i in range(80)
+        )
+
+    def test_board(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('repair_tracker:repair_list'), {'completed': 2})
+        in_progress, completed = response.context['columns']
+        self.assertEqual((in_progress['count'], in_progress['charges']), (27, Decimal('2700.00')))
+        self.assertEqual((completed['count'], completed['page'].number), (53, 2))
+        self.assertEqual(len(completed['page']), 24)
+        self.assertEqual(completed['previous_url'], '?completed=1')
+        self.assertEqual(in_progress['next_url'], '?completed=2&in_progress=2')
+
+
+class CustomerLookupTests(TestCase):
+    """Returning customers are found by any spelling of their number"""
+
+    def setUp(self):
+        for phone, status in [('0712 345 678', 'COLLECTED'), ('+254-712-345678', 'IN_PROGRESS'), ('0712999000', 'COLLECTED')]:
+            Repair.objects.create(owner_name='Amina', owner_phone=phone, phone_name='Phone', phone_model='X',
+                                  issue_description='Screen', charges=Decimal('1000.00'), status=status)
+
+    def test_normalize_phone(self):
+        self.assertEqual(normalize_phone('+254 (712) 345-678'), '0712345678')
+        self.assertEqual(normalize_phone('254712'), '254712')
+
+    def test_lookup(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('repair_tracker:customer_lookup'), {'phone': '+254712'})
+        customers = response.json()['customers']
+        self.assertEqual([(c['repairs'], c['revenue']) for c in customers], [(2, '1000.00'), (1, '1000.00')])
+        self.assertEqual(self.client.get(reverse('repair_tracker:customer_lookup'), {'phone': '07'}).json(),
+                         {'customers': []})
+
+    def test_history(self):
+        response = self.client.get(reverse('repair_tracker:customer_history', args=['254712345678']))
+        self.assertEqual((response.json()['repairs'], len(response.json()['history'])), (2, 2))
+        self.assertEqual(response.json()['history'][0]['status'], 'IN_PROGRESS')
+        response = self.client.get(reverse('repair_tracker:customer_history', args=['0799']))
+        self.assertEqual(response.status_code, 404)
+
+
+class TurnaroundTests(TestCase):
+    """Status changes are logged, and turned into time-in-status percentiles"""
+
+    def setUp(self):
+        self.repair = Repair.objects.create(owner_name='Amina', owner_phone='0712345678', phone_name='Phone',
+                                            phone_model='X', issue_description='Screen', charges=Decimal('1000.00'))
+
+    def test_status_changes_are_logged(self):
+        data = {'owner_name': 'Amina', 'owner_phone': '0712345678', 'phone_name': 'Phone', 'phone_model': 'X',
+                'issue_description': 'Screen', 'charges': '1000.00', 'status': 'COMPLETED'}
+        self.client.post(reverse('repair_tracker:repair-update', args=[self.repair.pk]), data)
+        self.client.post(reverse('repair_tracker:repair-update', args=[self.repair.pk]), data)
+        self.client.post(reverse('repair_tracker:repair-update', args=[self.repair.pk]), {**data, 'status': 'COLLECTED'})
+        changes = RepairStatusChange.objects.filter(repair=self.repair).order_by('changed_at', 'pk')
+        self.assertEqual(
+            [(change.from_status, change.to_status) for change in changes],
+            [('', 'IN_PROGRESS'), ('IN_PROGRESS', 'COMPLETED'), ('COMPLETED', 'COLLECTED')],
+        )
+
+    def test_percentiles(self):
+        now = timezone.now()
+        RepairStatusChange.objects.all().delete()
+        for i in range(1, 11):
+            repair = Repair.objects.create(owner_name=f'Owner {i}', owner_phone='0700000000', phone_name='Phone',
+                                           phone_model='X', issue_description='Screen', charges=Decimal('100.00'))
+            received = now - timedelta(days=2)
+            # i hours in progress, then collected a day later
+            RepairStatusChange.objects.filter(repair=repair).update(changed_at=received)
+            RepairStatusChange.objects.create(repair=repair, from_status='IN_PROGRESS', to_status='COMPLETED',
+                                              changed_at=received + timedelta(hours=i))
+            RepairStatusChange.objects.create(repair=repair, from_status='COMPLETED', to_status='COLLECTED',
+                                              changed_at=received + timedelta(hours=i + 24))
+            Repair.objects.filter(pk=repair.pk).update(status='COLLECTED', created_at=received,
+                                                       collected_at=received + timedelta(hours=i + 24))
+
+        store = self.repair.store
+        with self.assertNumQueries(2):
+            result = compute_turnaround(now.date() - timedelta(days=7), now.date(), store)
+        in_progress, completed = result['statuses']
+        self.assertEqual((in_progress['count'], in_progress['p50'], in_progress['p90']), (10, 5.5, 9.1))
+        self.assertEqual((completed['count'], completed['p50'], completed['p99']), (10, 24.0, 24.0))
+        self.assertEqual((result['collection']['count'], result['collection']['p50']), (10, 29.5))
+
+    def test_archived_repairs_leave_the_report(self):
+        # archive_history deletes repairs, and their status log cascades with them
+        received = timezone.now() - timedelta(days=60)
+        RepairStatusChange.objects.filter(repair=self.repair).update(changed_at=received)
+        RepairStatusChange.objects.create(repair=self.repair, from_status='IN_PROGRESS', to_status='COLLECTED',
+                                          changed_at=received + timedelta(hours=5))
+        Repair.objects.filter(pk=self.repair.pk).update(status='COLLECTED', created_at=received,
+                                                       collected_at=received + timedelta(hours=5))
+        store = self.repair.store
+        days = (received.date() - timedelta(days=1), received.date() + timedelta(days=1))
+        result = compute_turnaround(*days, store)
+        self.assertEqual((result['statuses'][0]['count'], result['collection']['p50']), (1, 5.0))
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with self.settings(ARCHIVE_DIR=Path(directory.name)):
+            self.assertEqual(sum(archive_repairs(store, timezone.now() - timedelta(days=30)).values()), 1)
+        self.assertFalse(RepairStatusChange.objects.exists())
+        result = compute_turnaround(*days, store)
+        self.assertEqual((result['statuses'][0]['count'], result['collection']['count']), (0, 0))
+
+    def test_bad_range_shows_the_default(self):
+        response = self.client.get(reverse('repair_tracker:turnaround'), {'start': '2024-02-01', 'end': '2024-01-01'})
+        self.assertContains(response, 'Start date must be on or before the end date')
+        end = timezone.now().date()
+        self.assertEqual(response.context['turnaround']['start'], (end - timedelta(days=29)).isoformat())
+
+
+class ArchiveTests(TestCase):
+    """Archiving a month moves its collected repairs into summaries, and restoring brings them back once"""
+
+    def setUp(self):
+        self.month = (timezone.localdate() - timedelta(days=100)).replace(day=1)
+        self.collected_at = timezone.make_aware(datetime.combine(self.month.replace(day=15), time(12)))
+        self.old = []
+        for charges in (Decimal('1000.00'), Decimal('500.00')):
+            repair = Repair.objects.create(owner_name='Amina', owner_phone='0712345678', phone_name='Phone',
+                                           phone_model='X', issue_description='Screen', charges=charges)
+            Repair.objects.filter(pk=repair.pk).update(status='COLLECTED', collected_at=self.collected_at,
+                                                       created_at=self.collected_at - timedelta(days=2))
+            Revenue.objects.create(repair=repair, amount=charges, collected_at=self.collected_at)
+            self.old.append(repair.pk)
+        self.open = Repair.objects.create(owner_name='Brian', owner_phone='0722000000', phone_name='Phone',
+                                          phone_model='Y', issue_description='Battery', charges=Decimal('300.00'))
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = self.settings(ARCHIVE_DIR=Path(directory.name))
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_archive_and_restore(self):
+        store = self.open.store
+        self.assertEqual(archive_repairs(store, timezone.now() - timedelta(days=30)), {self.month: 2})
+        self.assertEqual(list(Repair.objects.values_list('pk', flat=True)), [self.open.pk])
+        self.assertFalse(Revenue.objects.exists())
+        summary = RepairSummary.objects.get(store=store, month=self.month)
+        self.assertEqual((summary.repairs_count, summary.revenue), (2, Decimal('1500.00')))
+
+        # The partition is only removed once the restore commits, so it can be read twice
+        self.assertEqual(restore_repairs(store, self.month), 2)
+        restored = Repair.objects.filter(pk__in=self.old)
+        self.assertEqual(
+            sorted(restored.values_list('status', 'collected_at', 'created_at', 'revenue__amount')),
+            [('COLLECTED', self.collected_at, self.collected_at - timedelta(days=2), amount)
+             for amount in (Decimal('500.00'), Decimal('1000.00'))],
+        )
+        self.assertFalse(RepairSummary.objects.exists())
+        self.assertEqual(restore_repairs(store, self.month), 0)
+        self.assertEqual((Repair.objects.count(), Revenue.objects.count()), (3, 2))
+
+    def test_reports_include_archived_repairs(self):
+        store = self.open.store
+        now = timezone.now()
+        Repair.objects.filter(pk=self.open.pk).update(status='COLLECTED', collected_at=now - timedelta(seconds=1))
+        archive_repairs(store, now)
+        self.assertFalse(Repair.objects.exists())
+        live = Repair.objects.create(owner_name='Chero', owner_phone='0733000000', phone_name='Phone',
+                                     phone_model='Z', issue_description='Port', charges=Decimal('200.00'))
+        Repair.objects.filter(pk=live.pk).update(status='COLLECTED', collected_at=timezone.now())
+
+        response = self.client.get(reverse('repair_tracker:report'))
+        self.assertEqual((response.context['daily_count'], response.context['daily_revenue']), (2, Decimal('500.00')))
+        self.assertEqual(list(response.context['daily_repairs']), [live])
 
-# Create your tests here.
+        response = self.client.get(reverse('repair_tracker:download_report_pdf', args=['daily']))
+        text = pypdf.PdfReader(BytesIO(response.content)).pages[0].extract_text()
+        self.assertIn('Archived Repairs (not listed)', text)
+        self.assertIn('Chero', text)
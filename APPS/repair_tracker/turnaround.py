@@ -0,0 +1,103 @@
+"""
+Repair turnaround: how long repairs spend in each status, and how long
+customers wait from drop-off to collection, as median/p90/p99 over a date range.
+
+Time in a status runs from a repair entering it to its next status change
+(RepairStatusChange); a stay counts in the range it ended in. All the changes
+needed are read with one query and the stays are worked out with NumPy, with
+no per-repair Python loop. Time to collection comes from Repair itself
+(created_at to collected_at), so it also covers repairs from before the log.
+archive_history deletes the repairs it moves out, and their status changes
+with them (the log cascades), so ranges that have been archived report no
+turnaround; their counts and revenue live on in RepairSummary.
+
+Results are cached per range and keyed on the store's repairs watermark
+(STORE_MANAGER/watermarks.py), so any repair edit gives fresh numbers.
+"""
+from datetime import datetime, time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.timezone import make_aware
+
+from STORE_MANAGER.watermarks import watermark
+
+from .models import Repair, RepairStatusChange
+
+PERCENTILES = (50, 90, 99)
+
+
+def date_range(start_date, end_date):
+    return make_aware(datetime.combine(start_date, time.min)), make_aware(datetime.combine(end_date, time.max))
+
+
+def percentiles(seconds):
+    """Count and median/p90/p99 in hours of an array of durations in seconds"""
+    import numpy as np  # Only loaded by workers that compute metrics
+
+    if not seconds.size:
+        return {'count': 0, 'p50': None, 'p90': None, 'p99': None}
+    values = np.percentile(seconds, PERCENTILES) / 3600
+    return {'count': int(seconds.size), **{f'p{p}': round(float(v), 1) for p, v in zip(PERCENTILES, values)}}
+
+
+def status_durations(changes, start, end):
+    """
+    Stays in each status that ended between ``start`` and ``end`` (epoch
+    seconds), from (repair_id, to_status, changed_at) rows sorted by repair and time.
+    """
+    import numpy as np
+
+    repair_ids = np.fromiter((row[0] for row in changes), dtype=np.int64, count=len(changes))
+    statuses = np.array([row[1] for row in changes], dtype=object)
+    times = np.fromiter((row[2].timestamp() for row in changes), dtype=np.float64, count=len(changes))
+
+    # Each change ends the stay the previous change (of the same repair) started
+    same_repair = repair_ids[1:] == repair_ids[:-1]
+    ended = times[1:]
+    stays = same_repair & (ended >= start) & (ended <= end)
+    durations = (times[1:] - times[:-1])[stays]
+    entered = statuses[:-1][stays]
+    return {status: durations[entered == status] for status, _ in Repair.STATUS_CHOICES}
+
+
+def compute_turnaround(start_date, end_date, store):
+    import numpy as np
+
+    start, end = date_range(start_date, end_date)
+    # Every change of the repairs that changed status in the range, back to the changes that started their stays
+    changed = RepairStatusChange.objects.filter(store=store, changed_at__range=[start, end]).values('repair_id')
+    changes = list(
+        RepairStatusChange.objects.filter(store=store, repair_id__in=changed, changed_at__lte=end)
+        .order_by('repair_id', 'changed_at', 'pk').values_list('repair_id', 'to_status', 'changed_at')
+    )
+    durations = status_durations(changes, start.timestamp(), end.timestamp())
+
+    collected = list(
+        Repair.objects.filter(store=store, status='COLLECTED', collected_at__range=[start, end])
+        .values_list('created_at', 'collected_at')
+    )
+    created_at = np.fromiter((row[0].timestamp() for row in collected), dtype=np.float64, count=len(collected))
+    collected_at = np.fromiter((row[1].timestamp() for row in collected), dtype=np.float64, count=len(collected))
+    waits = collected_at - created_at
+
+    return {
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'statuses': [
+            {'status': status, 'label': label, **percentiles(durations[status])}
+            for status, label in Repair.STATUS_CHOICES if status != 'COLLECTED'
+        ],
+        'collection': percentiles(waits),
+    }
+
+
+def get_turnaround(start_date, end_date, store):
+    """A store's turnaround metrics for a date range, from the cache when possible"""
+    changed = watermark(['repairs'], store.pk)
+    key = f'repair_tracker:turnaround:{store.pk}:{start_date.isoformat()}:{end_date.isoformat()}:{changed!r}'
+    result = cache.get(key)
+    if result is None:
+        result = compute_turnaround(start_date, end_date, store)
+        cache.set(key, result, getattr(settings, 'TURNAROUND_CACHE_TIMEOUT', 300))
+    return result
@@ -5,8 +5,12 @@ app_name = 'repair_tracker'
 
 urlpatterns = [
     path('', views.RepairListView.as_view(), name='repair_list'),
+    path('history/', views.RepairHistoryView.as_view(), name='repair_history'),
     path('repair/new/', views.RepairCreateView.as_view(), name='repair-create'),
     path('repair/<int:pk>/edit/', views.RepairUpdateView.as_view(), name='repair-update'),
+    path('customers/', views.customer_lookup_view, name='customer_lookup'),
+    path('customers/<str:phone>/', views.customer_history_view, name='customer_history'),
+    path('turnaround/', views.turnaround_view, name='turnaround'),
     path('report/', views.report_view, name='report'),
     path('report/pdf/<str:timeframe>/', views.download_report_pdf, name='download_report_pdf'),
 ]
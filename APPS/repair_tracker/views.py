@@ -1,24 +1,82 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.views.generic import ListView, CreateView, UpdateView
-from django.urls import reverse_lazy
+from django.core.paginator import Paginator
+from django.views.generic import CreateView, TemplateView, UpdateView
+from django.urls import reverse, reverse_lazy
 from django.utils import timezone
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.template.loader import get_template
-from xhtml2pdf import pisa
-from datetime import timedelta
+from django.db.models import Count, Sum
+from django.http import HttpResponse, JsonResponse
+from STORE_MANAGER.pdf import PDFReport, render_pdf_response
+from STORE_MANAGER.watermarks import conditional
+from datetime import datetime, time, timedelta
+from .archive import archived_repair_totals
+from .customers import customer_history, find_customers
 from .models import Repair, Revenue
-from .forms import RepairForm
+from .forms import RepairForm, TurnaroundForm
+from .turnaround import get_turnaround
 
 
-class RepairListView(ListView):
-    model = Repair
+# Columns of the repair board; collected repairs are in the history
+BOARD_STATUSES = ['IN_PROGRESS', 'COMPLETED']
+REPAIRS_PER_PAGE = 24
+
+
+def page_url(request, param, number):
+    """The current URL with one column turned to another page"""
+    query = request.GET.copy()
+    query[param] = number
+    return f"?{query.urlencode()}"
+
+
+def repair_column(request, status, queryset, count=None):
+    """One status column: its count, charges total and the requested page of its repairs"""
+    param = status.lower()
+    paginator = Paginator(queryset, REPAIRS_PER_PAGE)
+    if count is not None:
+        paginator.count = count  # Known from the board's grouped totals; saves a COUNT per column
+    page = paginator.get_page(request.GET.get(param))
+    return {
+        'status': status,
+        'label': dict(Repair.STATUS_CHOICES)[status],
+        'css_class': f"status-{status.lower().replace('_', '-')}",
+        'count': paginator.count,
+        'page': page,
+        'previous_url': page_url(request, param, page.previous_page_number()) if page.has_previous() else None,
+        'next_url': page_url(request, param, page.next_page_number()) if page.has_next() else None,
+    }
+
+
+class RepairListView(TemplateView):
+    """The repair board: a paginated column per open status, under per-status totals"""
     template_name = 'repair_tracker/repair_list.html'
-    context_object_name = 'repairs'
 
-    def get_queryset(self):
-        return Repair.objects.exclude(status='COLLECTED').order_by('-created_at')
+    def get_context_data(self, **kwargs):
+        repairs = Repair.objects.filter(store=self.request.store)
+        # One grouped query for every column's count and charges total
+        totals = {
+            row['status']: row
+            for row in repairs.filter(status__in=BOARD_STATUSES).values('status')
+            .annotate(count=Count('pk'), charges=Sum('charges')).order_by()
+        }
+        columns = []
+        for status in BOARD_STATUSES:
+            total = totals.get(status, {'count': 0, 'charges': 0})
+            # Each column walks the (store, status, created_at) index for its page only
+            column = repair_column(self.request, status, repairs.filter(status=status).order_by('-created_at', '-pk'),
+                                   count=total['count'])
+            column['charges'] = total['charges']
+            columns.append(column)
+        return super().get_context_data(columns=columns, **kwargs)
+
+
+class RepairHistoryView(TemplateView):
+    """Collected repairs, most recently collected first"""
+    template_name = 'repair_tracker/repair_list.html'
+
+    def get_context_data(self, **kwargs):
+        collected = Repair.objects.filter(store=self.request.store, status='COLLECTED', collected_at__isnull=False)
+        column = repair_column(self.request, 'COLLECTED', collected.order_by('-collected_at', '-pk'))
+        return super().get_context_data(columns=[column], history=True, **kwargs)
 
 
 class RepairCreateView(CreateView):
@@ -28,6 +86,7 @@ class RepairCreateView(CreateView):
     success_url = reverse_lazy('repair_tracker:repair_list')
 
     def form_valid(self, form):
+        form.instance.store = self.request.store
         messages.success(self.request, 'Repair ticket created successfully.')
         return super().form_valid(form)
 
@@ -38,6 +97,9 @@ class RepairUpdateView(UpdateView):
     template_name = 'repair_tracker/repair_form.html'
     success_url = reverse_lazy('repair_tracker:repair_list')
 
+    def get_queryset(self):
+        return Repair.objects.filter(store=self.request.store)
+
     def form_valid(self, form):
         response = super().form_valid(form)
         repair = self.object
@@ -60,6 +122,65 @@ class RepairUpdateView(UpdateView):
 
         return response
 
+def turnaround_view(request):
+    """Median, p90 and p99 time in each status and time to collection for a date range"""
+    form = TurnaroundForm(request.GET)
+    params = form.params()
+    return render(request, 'repair_tracker/turnaround.html', {
+        'form': form,
+        'turnaround': get_turnaround(params['start'], params['end'], request.store),
+    })
+
+
+def customer_lookup_view(request):
+    """Customers whose phone number starts with ?phone=, for the repair form's autocomplete"""
+    customers = find_customers(request.store, request.GET.get('phone', ''))
+    return JsonResponse({'customers': [
+        {
+            'phone': customer['owner_phone'],
+            'name': customer['owner_name'],
+            'repairs': customer['repairs'],
+            'revenue': str(customer['revenue']),
+            'last_visit': customer['last_visit'],
+            'url': reverse('repair_tracker:customer_history', args=[customer['owner_phone_key']]),
+        }
+        for customer in customers
+    ]})
+
+
+def customer_history_view(request, phone):
+    """Every repair a customer left with the store, and their lifetime revenue"""
+    customer = customer_history(request.store, phone)
+    if customer is None:
+        return JsonResponse({'error': 'Customer not found'}, status=404)
+    return JsonResponse({
+        'phone': customer['owner_phone'],
+        'name': customer['owner_name'],
+        'repairs': customer['repairs'],
+        'revenue': str(customer['revenue']),
+        'last_visit': customer['last_visit'],
+        'history': [
+            {**repair, 'charges': str(repair['charges']),
+             'url': reverse('repair_tracker:repair-update', args=[repair['id']])}
+            for repair in customer['history']
+        ],
+    })
+
+def collected_between(store, start_date, end_date):
+    """A store's repairs collected between two dates (inclusive)"""
+    # A plain range on collected_at can use its index; collected_at__date can't
+    start = timezone.make_aware(datetime.combine(start_date, time.min))
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+    return Repair.objects.filter(store=store, collected_at__gte=start, collected_at__lt=end)
+
+def repair_totals(store, start_date, end_date):
+    """Live repairs collected in a period, and the number and revenue of those plus any archived ones"""
+    repairs = collected_between(store, start_date, end_date)
+    archived = archived_repair_totals(start_date, end_date, store)
+    revenue = (repairs.aggregate(Sum('charges'))['charges__sum'] or 0) + archived['revenue']
+    return repairs, repairs.count() + archived['repairs_count'], revenue
+
+@conditional('repairs')
 def report_view(request):
     today = timezone.now().date()
     
@@ -71,20 +192,18 @@ def report_view(request):
     next_month = (today.replace(day=1) + timedelta(days=32)).replace(day=1)  # First day of next month
     end_of_month = next_month - timedelta(days=1)  # Last day of current month
 
-    # Corrected query filters
-    daily_repairs = Repair.objects.filter(collected_at__date=today)
-    weekly_repairs = Repair.objects.filter(collected_at__date__range=[start_of_week, end_of_week])
-    monthly_repairs = Repair.objects.filter(collected_at__date__range=[start_of_month, end_of_month])
-
-    # Aggregate revenue correctly
-    daily_revenue = daily_repairs.aggregate(Sum('charges'))['charges__sum'] or 0
-    weekly_revenue = weekly_repairs.aggregate(Sum('charges'))['charges__sum'] or 0
-    monthly_revenue = monthly_repairs.aggregate(Sum('charges'))['charges__sum'] or 0
+    # Months moved out by archive_history count from their summaries
+    daily_repairs, daily_count, daily_revenue = repair_totals(request.store, today, today)
+    weekly_repairs, weekly_count, weekly_revenue = repair_totals(request.store, start_of_week, end_of_week)
+    monthly_repairs, monthly_count, monthly_revenue = repair_totals(request.store, start_of_month, end_of_month)
 
     context = {
         'daily_repairs': daily_repairs,
         'weekly_repairs': weekly_repairs,
         'monthly_repairs': monthly_repairs,
+        'daily_count': daily_count,
+        'weekly_count': weekly_count,
+        'monthly_count': monthly_count,
         'daily_revenue': daily_revenue,
         'weekly_revenue': weekly_revenue,
         'monthly_revenue': monthly_revenue,
@@ -98,48 +217,60 @@ def report_view(request):
     return render(request, 'repair_tracker/report.html', context)
 
 
+@conditional('repairs', key=lambda request, timeframe: timeframe)
 def download_report_pdf(request, timeframe):
     """Generate a PDF report for repairs and revenue based on the selected timeframe."""
     today = timezone.now().date()
 
     # Determine the timeframe filters with proper end dates
     if timeframe == 'daily':
-        repairs = Repair.objects.filter(collected_at__date=today)
+        repairs, count, total_revenue = repair_totals(request.store, today, today)
         title = f"Daily Report - {today}"
     elif timeframe == 'weekly':
         start_of_week = today - timedelta(days=today.weekday())
         end_of_week = start_of_week + timedelta(days=6)
-        repairs = Repair.objects.filter(collected_at__date__range=[start_of_week, end_of_week])
+        repairs, count, total_revenue = repair_totals(request.store, start_of_week, end_of_week)
         title = f"Weekly Report - {start_of_week} to {end_of_week}"
     elif timeframe == 'monthly':
         start_of_month = today.replace(day=1)
         next_month = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
         end_of_month = next_month - timedelta(days=1)
-        repairs = Repair.objects.filter(collected_at__date__range=[start_of_month, end_of_month])
+        repairs, count, total_revenue = repair_totals(request.store, start_of_month, end_of_month)
         title = f"Monthly Report - {start_of_month.strftime('%B %Y')}"
     else:
         return HttpResponse("Invalid timeframe", status=400)
 
-    # Calculate total revenue using the same approach as report_view
-    total_revenue = repairs.aggregate(Sum('charges'))['charges__sum'] or 0
+    # Archived repairs count towards the totals, but only live ones are listed
+    archived_count = count - repairs.count()
 
-    # Load the template and render HTML
-    template = get_template('repair_tracker/report_pdf.html')
     context = {
         'repairs': repairs,
+        'archived_count': archived_count,
         'total_revenue': total_revenue,
         'timeframe': timeframe,
         'title': title,
         'generation_date': timezone.now(),
     }
-    html = template.render(context)
 
     # Generate PDF response
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{timeframe}_report.pdf"'
+    report = PDFReport(
+        title=title,
+        template_name='repair_tracker/report_pdf.html',
+        context=context,
+        columns=['Owner', 'Phone', 'Charges', 'Collected'],
+        rows=iter_repair_rows(repairs),
+        row_count=repairs.count(),
+        totals=[('Total Revenue', f"Ksh {total_revenue}")] + (
+            [('Archived Repairs (not listed)', archived_count)] if archived_count else []
+        ),
+    )
+    return render_pdf_response(report, f"{timeframe}_report.pdf")
 
-    pisa_status = pisa.CreatePDF(html, dest=response)
-    if pisa_status.err:
-        return HttpResponse('Error generating PDF', content_type='text/plain')
 
-    return response
\ No newline at end of file
+def iter_repair_rows(repairs, chunk_size=2000):
+    """Yield PDF table rows for repairs, fetched from the database in chunks"""
+    rows = repairs.values_list(
+        'owner_name', 'phone_name', 'charges', 'collected_at'
+    ).iterator(chunk_size=chunk_size)
+    for owner_name, phone_name, charges, collected_at in rows:
+        yield owner_name, phone_name, f"Ksh {charges}", collected_at
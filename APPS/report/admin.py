@@ -1,3 +1,14 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import LedgerEntry
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'source_id', 'occurred_at', 'revenue', 'cost', 'store']
+    list_filter = ['store', 'kind']
+    ordering = ['-occurred_at']
+    readonly_fields = ['store', 'kind', 'source_id', 'occurred_at', 'revenue', 'cost']
+
+    def has_add_permission(self, request):
+        return False
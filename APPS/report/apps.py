@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class ReportConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'report'
+    name = 'APPS.report'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,11 @@
+from STORE_MANAGER.forms import DateRangeForm
+
+
+class LedgerRangeForm(DateRangeForm):
+    """A custom range for the ledger; unlike other report pages it has no default"""
+
+    def period(self):
+        """(start, end) of a complete, valid custom range, or None"""
+        if self.data.get('start') and self.data.get('end') and self.is_valid():
+            return self.cleaned_data['start'], self.cleaned_data['end']
+        return None
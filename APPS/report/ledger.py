@@ -0,0 +1,152 @@
+"""
+The revenue ledger: every sale and every collected repair's revenue in one
+narrow table (LedgerEntry), indexed by (store, occurred_at).
+
+Sales and repair revenue saved one at a time reach the ledger through
+signals.py. Code that creates them in bulk (bulk_create sends no signals) calls
+``record_sales()`` / ``record_repairs()`` itself, and code that deletes them on
+purpose (admin corrections, resets) calls ``remove_sales()`` /
+``remove_repairs()``. Deleting an item deletes its sales' entries along with
+them (LedgerEntry.item cascades), whichever way it is deleted. An edited sale
+keeps the unit cost it was recorded with. Archiving keeps the entries: the ledger is the long-term
+record of what the store earned.
+
+The combined reports read the ledger only: every period's totals come from
+one aggregate query, a day-by-day breakdown from one grouped query.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils.timezone import make_aware
+
+from .models import LedgerEntry
+
+cents = Decimal('0.01')
+
+
+def sale_entry(sale, buying_price):
+    return LedgerEntry(
+        store_id=sale.store_id,
+        kind=LedgerEntry.SALE,
+        source_id=sale.pk,
+        item_id=sale.item_id,
+        occurred_at=sale.sold_at,
+        quantity=sale.quantity_sold,
+        revenue=sale.selling_price * sale.quantity_sold,
+        cost=buying_price * sale.quantity_sold,
+    )
+
+
+def repair_entry(revenue, store_id):
+    return LedgerEntry(
+        store_id=store_id,
+        kind=LedgerEntry.REPAIR,
+        source_id=revenue.repair_id,
+        occurred_at=revenue.collected_at,
+        revenue=revenue.amount,
+    )
+
+
+def record_sales(sales, using=None):
+    """Add (sale, buying price) pairs to the ledger; sales already in it are skipped"""
+    entries = [sale_entry(sale, buying_price) for sale, buying_price in sales]
+    LedgerEntry.objects.db_manager(using).bulk_create(entries, batch_size=2000, ignore_conflicts=True)
+
+
+def record_repairs(revenues, using=None):
+    """Add (Revenue, store id) pairs to the ledger; repairs already in it are skipped"""
+    entries = [repair_entry(revenue, store_id) for revenue, store_id in revenues]
+    LedgerEntry.objects.db_manager(using).bulk_create(entries, batch_size=2000, ignore_conflicts=True)
+
+
+def remove_sales(sale_ids, using=None):
+    LedgerEntry.objects.db_manager(using).filter(kind=LedgerEntry.SALE, source_id__in=sale_ids).delete()
+
+
+def remove_repairs(repair_ids, using=None):
+    LedgerEntry.objects.db_manager(using).filter(kind=LedgerEntry.REPAIR, source_id__in=repair_ids).delete()
+
+
+def period_bounds(start_date, end_date):
+    """Aware datetimes from the start of ``start_date`` to the start of the day after ``end_date``"""
+    return (make_aware(datetime.combine(start_date, time.min)),
+            make_aware(datetime.combine(end_date + timedelta(days=1), time.min)))
+
+
+def standard_periods(today):
+    """Today, this week (Monday to Sunday) and this month, as (start date, end date)"""
+    start_of_week = today - timedelta(days=today.weekday())
+    start_of_month = today.replace(day=1)
+    next_month = (start_of_month + timedelta(days=32)).replace(day=1)
+    return {
+        'daily': (today, today),
+        'weekly': (start_of_week, start_of_week + timedelta(days=6)),
+        'monthly': (start_of_month, next_month - timedelta(days=1)),
+    }
+
+
+def combined(sales_count, sales_revenue, sales_cost, repairs_count, repairs_revenue):
+    """Sales and repair figures of a period or day, with their combined revenue and profit"""
+    sales_revenue = Decimal(sales_revenue or 0).quantize(cents)  # SQLite doesn't round aggregates
+    sales_cost = Decimal(sales_cost or 0).quantize(cents)
+    repairs_revenue = Decimal(repairs_revenue or 0).quantize(cents)
+    return {
+        'sales_count': sales_count,
+        'sales_revenue': sales_revenue,
+        'sales_profit': sales_revenue - sales_cost,
+        'repairs_count': repairs_count,
+        'repairs_revenue': repairs_revenue,
+        'revenue': sales_revenue + repairs_revenue,
+        # Repairs have no cost of goods in the ledger; their revenue is all profit here
+        'profit': sales_revenue - sales_cost + repairs_revenue,
+    }
+
+
+def period_totals(store, periods):
+    """Combined totals of each of ``periods`` ({name: (start date, end date)}), in one query"""
+    bounds = {name: period_bounds(start, end) for name, (start, end) in periods.items()}
+    aggregates = {}
+    for name, (start, end) in bounds.items():
+        for kind in (LedgerEntry.SALE, LedgerEntry.REPAIR):
+            in_period = Q(kind=kind, occurred_at__gte=start, occurred_at__lt=end)
+            aggregates[f'{name}:{kind}:count'] = Count('pk', filter=in_period)
+            aggregates[f'{name}:{kind}:revenue'] = Sum('revenue', filter=in_period)
+            if kind == LedgerEntry.SALE:
+                aggregates[f'{name}:{kind}:cost'] = Sum('cost', filter=in_period)
+
+    # Only the rows of the periods' overall span are read, along the (store, occurred_at) index
+    row = LedgerEntry.objects.filter(
+        store=store,
+        occurred_at__gte=min(start for start, _ in bounds.values()),
+        occurred_at__lt=max(end for _, end in bounds.values()),
+    ).aggregate(**aggregates)
+    return {
+        name: {
+            'start': periods[name][0],
+            'end': periods[name][1],
+            **combined(row[f'{name}:SALE:count'], row[f'{name}:SALE:revenue'], row[f'{name}:SALE:cost'],
+                       row[f'{name}:REPAIR:count'], row[f'{name}:REPAIR:revenue']),
+        }
+        for name in periods
+    }
+
+
+def daily_totals(store, start_date, end_date):
+    """Combined totals of every day with sales or repair revenue between two dates, in one grouped query"""
+    start, end = period_bounds(start_date, end_date)
+    rows = (
+        LedgerEntry.objects.filter(store=store, occurred_at__gte=start, occurred_at__lt=end)
+        .annotate(day=TruncDate('occurred_at')).values('day', 'kind')
+        .annotate(count=Count('pk'), revenue=Sum('revenue'), cost=Sum('cost')).order_by('day')
+    )
+    days = {}
+    for row in rows:
+        days.setdefault(row['day'], {})[row['kind']] = row
+    empty = {'count': 0, 'revenue': 0, 'cost': 0}
+    return [
+        {'day': day, **combined(sales['count'], sales['revenue'], sales['cost'], repairs['count'], repairs['revenue'])}
+        for day, kinds in days.items()
+        for sales, repairs in [(kinds.get(LedgerEntry.SALE, empty), kinds.get(LedgerEntry.REPAIR, empty))]
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.6 on 2025-02-20 04:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('total_revenue', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('total_sales', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('total_profit', models.DecimalField(decimal_places=2, max_digits=12)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MonthlyRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('total_revenue', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('total_sales', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('total_profit', models.DecimalField(decimal_places=2, max_digits=12)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WeeklyRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField(unique=True)),
+                ('end_date', models.DateField()),
+                ('total_revenue', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('total_sales', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('total_profit', models.DecimalField(decimal_places=2, max_digits=12)),
+            ],
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.1.6 on 2026-10-19 16:08
+
+import APPS.stores.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def fill_ledger(apps, schema_editor):
+    """Enter the sales and repair revenue recorded before the ledger existed"""
+    alias = schema_editor.connection.alias
+    Sale = apps.get_model('inventory', 'Sale')
+    Revenue = apps.get_model('repair_tracker', 'Revenue')
+    LedgerEntry = apps.get_model('report', 'LedgerEntry')
+
+    def entries():
+        sales = Sale.objects.using(alias).values_list(
+            'pk', 'store_id', 'sold_at', 'selling_price', 'quantity_sold', 'item__buying_price')
+        for pk, store_id, sold_at, selling_price, quantity, buying_price in sales.iterator(chunk_size=BATCH_SIZE):
+            yield LedgerEntry(store_id=store_id, kind='SALE', source_id=pk, occurred_at=sold_at,
+                              revenue=selling_price * quantity, cost=buying_price * quantity)
+        revenues = Revenue.objects.using(alias).values_list('repair_id', 'repair__store_id', 'collected_at', 'amount')
+        for repair_id, store_id, collected_at, amount in revenues.iterator(chunk_size=BATCH_SIZE):
+            yield LedgerEntry(store_id=store_id, kind='REPAIR', source_id=repair_id, occurred_at=collected_at,
+                              revenue=amount)
+
+    batch = []
+    for entry in entries():
+        batch.append(entry)
+        if len(batch) == BATCH_SIZE:
+            LedgerEntry.objects.using(alias).bulk_create(batch)
+            batch = []
+    LedgerEntry.objects.using(alias).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_pricehistory'),
+        ('report', '0001_initial'),
+        ('repair_tracker', '0006_repairstatuschange'),
+        ('stores', '0001_initial'),
+    ]
+
+    operations = [
+        # Precomputed totals of an earlier version of this app, unused since; the ledger replaces them
+        migrations.DeleteModel(name='DailyRecord'),
+        migrations.DeleteModel(name='MonthlyRecord'),
+        migrations.DeleteModel(name='WeeklyRecord'),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('SALE', 'Sale'), ('REPAIR', 'Repair')], max_length=10)),
+                ('source_id', models.BigIntegerField()),
+                ('occurred_at', models.DateTimeField()),
+                ('revenue', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('store', models.ForeignKey(default=APPS.stores.models.default_store_id, on_delete=django.db.models.deletion.PROTECT, to='stores.store')),
+            ],
+            options={
+                'verbose_name_plural': 'ledger entries',
+                'indexes': [models.Index(fields=['store', 'occurred_at'], name='ledger_store_time_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'source_id'), name='unique_ledger_source')],
+            },
+        ),
+        migrations.RunPython(fill_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.6 on 2026-10-19 16:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_items(apps, schema_editor):
+    """Link the entries of live sales to their items and quantities (archived sales keep neither)"""
+    alias = schema_editor.connection.alias
+    Sale = apps.get_model('inventory', 'Sale')
+    LedgerEntry = apps.get_model('report', 'LedgerEntry')
+    sale = Sale.objects.using(alias).filter(pk=OuterRef('source_id'))
+    LedgerEntry.objects.using(alias).filter(kind='SALE', source_id__in=Sale.objects.using(alias).values('pk')).update(
+        item_id=Subquery(sale.values('item_id')[:1]),
+        quantity=Subquery(sale.values('quantity_sold')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_sale_idempotency_key_per_store'),
+        ('report', '0002_ledgerentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ledgerentry',
+            name='item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventory.item'),
+        ),
+        migrations.AddField(
+            model_name='ledgerentry',
+            name='quantity',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(fill_items, migrations.RunPython.noop),
+    ]
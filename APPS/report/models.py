@@ -1,3 +1,33 @@
 from django.db import models
 
-# Create your models here.
+from APPS.stores.models import Store, default_store_id
+
+
+class LedgerEntry(models.Model):
+    """
+    One sale or one collected repair's revenue, as money in (and, for sales,
+    the cost of the goods). The combined reports read only this table.
+    """
+    SALE = 'SALE'
+    REPAIR = 'REPAIR'
+    KIND_CHOICES = [(SALE, 'Sale'), (REPAIR, 'Repair')]
+
+    store = models.ForeignKey(Store, on_delete=models.PROTECT, default=default_store_id)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # The Sale's or the Repair's id; no foreign key, so entries outlive archived sales and repairs
+    source_id = models.BigIntegerField()
+    # The item sold: deleting an item deletes its sales, and with them (however deleted) their entries
+    item = models.ForeignKey('inventory.Item', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    occurred_at = models.DateTimeField()
+    quantity = models.PositiveIntegerField(default=1)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2)
+    # Buying price at the time of the sale, so profit doesn't move with later price changes
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['kind', 'source_id'], name='unique_ledger_source')]
+        indexes = [models.Index(fields=['store', 'occurred_at'], name='ledger_store_time_idx')]
+        verbose_name_plural = 'ledger entries'
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.source_id}: Ksh {self.revenue}"
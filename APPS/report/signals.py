@@ -0,0 +1,49 @@
+from decimal import Decimal
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from APPS.inventory.models import Sale
+from APPS.repair_tracker.models import Revenue
+from STORE_MANAGER.watermarks import touch
+
+from .ledger import cents, record_repairs, record_sales
+from .models import LedgerEntry
+
+
+def entry_rows(kind, source_id, using):
+    return LedgerEntry.objects.using(using).filter(kind=kind, source_id=source_id)
+
+
+@receiver(post_save, sender=Sale)
+def record_sale(sender, instance, created, using, raw=False, **kwargs):
+    if raw:
+        return  # Fixtures bring their own ledger
+    recorded = None if created else entry_rows(LedgerEntry.SALE, instance.pk, using).values('cost', 'quantity').first()
+    if recorded is None:
+        record_sales([(instance, instance.item.buying_price)], using=using)
+        return
+    # An edited sale keeps the unit cost it was recorded with: the item's buying price may have changed since
+    unit_cost = recorded['cost'] / recorded['quantity'] if recorded['quantity'] else Decimal(0)
+    entry_rows(LedgerEntry.SALE, instance.pk, using).update(
+        store_id=instance.store_id,
+        item_id=instance.item_id,
+        occurred_at=instance.sold_at,
+        quantity=instance.quantity_sold,
+        revenue=instance.selling_price * instance.quantity_sold,
+        cost=(unit_cost * instance.quantity_sold).quantize(cents),
+    )
+
+
+@receiver(post_save, sender=Revenue)
+def record_repair(sender, instance, created, using, raw=False, **kwargs):
+    if raw:
+        return
+    store_id = instance.repair.store_id
+    updated = not created and entry_rows(LedgerEntry.REPAIR, instance.repair_id, using).update(
+        store_id=store_id, occurred_at=instance.collected_at, revenue=instance.amount,
+    )
+    if not updated:
+        record_repairs([(instance, store_id)], using=using)
+    # Revenue edited on its own (admin) changes the reports too
+    touch('repairs', store_id, using=using)
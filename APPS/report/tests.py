@@ -1,3 +1,155 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.admin.sites import site
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from APPS.inventory.models import Category, Item, Sale
+from APPS.inventory.views import generate_report
+from APPS.repair_tracker.models import Repair, Revenue
+from APPS.stores.models import get_default_store
+from STORE_MANAGER.query_plans import QueryPlanTestMixin
+
+from .forms import LedgerRangeForm
+from .ledger import period_totals, record_sales, standard_periods
+from .models import LedgerEntry
+
+
+class LedgerTests(TestCase):
+    """Sales and repair revenue reach the ledger, and come back as combined totals"""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Phones')
+        self.item = Item.objects.create(name='Charger', category=category, buying_price=Decimal('100.00'),
+                                        selling_price=Decimal('150.00'), quantity=10)
+        self.repair = Repair.objects.create(owner_name='Amina', owner_phone='0712345678', phone_name='Phone',
+                                            phone_model='X', issue_description='Screen', charges=Decimal('1000.00'))
+
+    def collect(self):
+        self.repair.status = 'COLLECTED'
+        self.repair.collected_at = timezone.now()
+        self.repair.save()
+        return Revenue.objects.create(repair=self.repair, amount=self.repair.charges,
+                                      collected_at=self.repair.collected_at)
+
+    def test_sales_and_revenue_are_recorded(self):
+        self.item.sell_item(2)
+        self.collect()
+        sale = Sale.objects.get()
+        entries = {entry.kind: entry for entry in LedgerEntry.objects.all()}
+        self.assertEqual(entries['SALE'].source_id, sale.pk)
+        self.assertEqual((entries['SALE'].revenue, entries['SALE'].cost), (Decimal('300.00'), Decimal('200.00')))
+        self.assertEqual((entries['REPAIR'].source_id, entries['REPAIR'].revenue), (self.repair.pk, Decimal('1000.00')))
+
+        # The cost stays what the item cost when it was sold
+        self.item.buying_price = Decimal('120.00')
+        self.item.save()
+        record_sales([(sale, self.item.buying_price)])
+        self.assertEqual(LedgerEntry.objects.get(kind='SALE').cost, Decimal('200.00'))
+
+    def test_period_totals(self):
+        self.item.sell_item(2)
+        self.item.sell_item(1, selling_price=Decimal('140.00'))
+        self.collect()
+        # An old sale falls outside every period
+        Sale.objects.filter(pk=Sale.objects.order_by('pk').first().pk).update(
+            sold_at=timezone.now() - timedelta(days=40))
+        LedgerEntry.objects.filter(kind='SALE', source_id=Sale.objects.order_by('pk').first().pk).update(
+            occurred_at=timezone.now() - timedelta(days=40))
+
+        store = get_default_store()
+        with self.assertNumQueries(1):
+            totals = period_totals(store, standard_periods(timezone.localdate()))
+        daily = totals['daily']
+        self.assertEqual((daily['sales_count'], daily['sales_revenue'], daily['sales_profit']),
+                         (1, Decimal('140.00'), Decimal('40.00')))
+        self.assertEqual((daily['repairs_count'], daily['repairs_revenue']), (1, Decimal('1000.00')))
+        self.assertEqual((daily['revenue'], daily['profit']), (Decimal('1140.00'), Decimal('1040.00')))
+        self.assertEqual(totals['monthly']['sales_count'], 1)
+
+    def test_ledger_page_and_downloads(self):
+        self.item.sell_item(1)
+        self.collect()
+        today = timezone.localdate()
+        response = self.client.get(reverse('report:ledger'), {'start': today - timedelta(days=3), 'end': today})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Custom Range')
+        self.assertContains(response, 'Ksh 1150.00')
+
+        response = self.client.get(reverse('report:ledger_download', args=['csv', 'weekly']))
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = response.content.decode().splitlines()
+        self.assertEqual(lines[1], f'{today.isoformat()},1,150.00,50.00,1,1000.00,1150.00,1050.00')
+        self.assertEqual(lines[-1], 'Total,1,150.00,50.00,1,1000.00,1150.00,1050.00')
+
+        self.assertEqual(self.client.get(reverse('report:ledger_download', args=['csv', 'yearly'])).status_code, 400)
+
+    def test_ledger_follows_item_deletes_and_sale_edits(self):
+        other = Item.objects.create(name='Cable', category=self.item.category, buying_price=Decimal('20.00'),
+                                    selling_price=Decimal('50.00'), quantity=10)
+        self.item.sell_item(2)
+        other.sell_item(3)
+        Item.objects.filter(pk=self.item.pk).update(buying_price=Decimal('110.00'))  # after the sale
+        self.item.refresh_from_db()
+
+        sale = Sale.objects.get(item=self.item)
+        sale.quantity_sold = 1
+        sale.selling_price = Decimal('160.00')
+        sale.save()
+        entry = LedgerEntry.objects.get(kind='SALE', source_id=sale.pk)
+        self.assertEqual((entry.quantity, entry.revenue, entry.cost), (1, Decimal('160.00'), Decimal('100.00')))
+
+        self.client.post(reverse('item_delete', args=[other.pk]))
+        self.assertFalse(Item.objects.filter(pk=other.pk).exists())
+        self.assertFalse(LedgerEntry.objects.filter(item_id=other.pk).exists())
+
+        # The combined P&L agrees with the inventory report (bar the later price change)
+        Item.objects.filter(pk=self.item.pk).update(buying_price=Decimal('100.00'))
+        sales, profit = generate_report('daily', get_default_store())
+        daily = period_totals(get_default_store(), standard_periods(timezone.localdate()))['daily']
+        self.assertEqual(daily['sales_count'], sales.count())
+        self.assertEqual(daily['sales_revenue'], sum(s.selling_price * s.quantity_sold for s in sales))
+        self.assertEqual(daily['sales_profit'], profit)
+
+    def test_deleting_a_sale_in_admin_removes_its_entry(self):
+        self.item.sell_item(1)
+        sale = Sale.objects.get()
+        site._registry[Sale].delete_model(RequestFactory().get('/'), sale)
+        self.assertFalse(LedgerEntry.objects.exists())
+
+    def test_deleting_a_revenue_in_admin_removes_its_entry(self):
+        revenue = self.collect()
+        site._registry[Revenue].delete_model(RequestFactory().get('/'), revenue)
+        self.assertFalse(LedgerEntry.objects.exists())
+
+    def test_custom_range(self):
+        today = timezone.localdate()
+        self.assertEqual(LedgerRangeForm({'start': today, 'end': today}).period(), (today, today))
+        # Other report pages default a missing date, the ledger only adds a complete range
+        self.assertIsNone(LedgerRangeForm({'start': today}).period())
+        self.assertIsNone(LedgerRangeForm({}).period())
+        self.assertIsNone(LedgerRangeForm({'start': today, 'end': today - timedelta(days=1)}).period())
+
+
+class QueryPlanTests(QueryPlanTestMixin, TestCase):
+    """The ledger page reads only the periods' entries, along the (store, occurred_at) index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        store = get_default_store()
+        now = timezone.now()
+        LedgerEntry.objects.bulk_create(
+            LedgerEntry(store=store, kind='SALE' if i % 3 else 'REPAIR', source_id=i, occurred_at=now - timedelta(hours=i),
+                        revenue=Decimal('150.00'), cost=Decimal('100.00') if i % 3 else 0)
+            for i in range(3000)
+        )
+
+    def test_ledger(self):
+        self.assertNoFullScans(lambda: self.client.get(reverse('report:ledger')))
+
+    def test_daily_breakdown(self):
+        self.assertNoFullScans(lambda: self.client.get(reverse('report:ledger_download', args=['csv', 'monthly'])))
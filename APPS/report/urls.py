@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = 'report'
+
+urlpatterns = [
+    path('', views.ledger_view, name='ledger'),
+    path('<str:fmt>/<str:timeframe>/', views.ledger_download, name='ledger_download'),
+]
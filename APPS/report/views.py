@@ -1,3 +1,75 @@
+import csv
+
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils import timezone
+
+from STORE_MANAGER.pdf import PDFReport, render_pdf_response
+from STORE_MANAGER.watermarks import conditional
+from .forms import LedgerRangeForm
+from .ledger import daily_totals, period_totals, standard_periods
+
+PERIOD_TITLES = {'daily': 'Today', 'weekly': 'This Week', 'monthly': 'This Month', 'custom': 'Custom Range'}
+
+
+def requested_periods(request):
+    """The standard periods, plus a 'custom' one when ?start= and ?end= give a valid range"""
+    periods = standard_periods(timezone.localdate())
+    form = LedgerRangeForm(request.GET)
+    custom = form.period()
+    if custom:
+        periods['custom'] = custom
+    return form, periods
+
+
+@conditional('sales', 'repairs', key=lambda request: request.GET.urlencode())
+def ledger_view(request):
+    """Combined sales and repair revenue and profit for today, this week, this month and a custom range"""
+    form, periods = requested_periods(request)
+    totals = period_totals(request.store, periods)
+    return render(request, 'report/ledger.html', {
+        'form': form,
+        'periods': [(name, PERIOD_TITLES[name], totals[name]) for name in periods],
+        'query': request.GET.urlencode(),
+    })
+
+
+@conditional('sales', 'repairs', key=lambda request, fmt, timeframe: f'{fmt}:{timeframe}:{request.GET.urlencode()}')
+def ledger_download(request, fmt, timeframe):
+    """A period's day-by-day combined totals as CSV or PDF"""
+    _, periods = requested_periods(request)
+    if timeframe not in periods or fmt not in ('csv', 'pdf'):
+        return HttpResponse("Invalid timeframe", status=400)
+    start, end = periods[timeframe]
+    days = daily_totals(request.store, start, end)
+    total = period_totals(request.store, {timeframe: (start, end)})[timeframe]
+    filename = f"{timeframe}_ledger_{start}_{end}"
+
+    columns = ['Date', 'Sales', 'Sales Revenue', 'Sales Profit', 'Repairs', 'Repair Revenue', 'Revenue', 'Profit']
+    rows = [
+        (day['day'], day['sales_count'], day['sales_revenue'], day['sales_profit'], day['repairs_count'],
+         day['repairs_revenue'], day['revenue'], day['profit'])
+        for day in days
+    ]
+
+    if fmt == 'csv':
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+        writer = csv.writer(response)
+        writer.writerow(columns)
+        writer.writerows((day.isoformat(), *figures) for day, *figures in rows)
+        writer.writerow(['Total', total['sales_count'], total['sales_revenue'], total['sales_profit'],
+                         total['repairs_count'], total['repairs_revenue'], total['revenue'], total['profit']])
+        return response
 
-# Create your views here.
+    title = f"{PERIOD_TITLES[timeframe]} - {start} to {end}"
+    report = PDFReport(
+        title=title,
+        template_name='report/ledger_pdf.html',
+        context={'title': title, 'days': days, 'total': total, 'generation_date': timezone.now()},
+        columns=columns,
+        rows=iter(rows),
+        row_count=len(rows),
+        totals=[('Revenue', f"Ksh {total['revenue']}"), ('Profit', f"Ksh {total['profit']}")],
+    )
+    return render_pdf_response(report, f"{filename}.pdf")
@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import Store
+
+@admin.register(Store)
+class StoreAdmin(admin.ModelAdmin):
+    list_display = ('name', 'code', 'database', 'created_at')
+    search_fields = ('name', 'code')
+    prepopulated_fields = {'code': ('name',)}
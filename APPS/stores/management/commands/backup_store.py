@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from APPS.stores.models import Store
+from STORE_MANAGER.backup import backup_root, backup_store
+from STORE_MANAGER.routers import using_store
+
+
+class Command(BaseCommand):
+    help = ("Write all of a store's data to a compressed backup file (restore it with restore_store). "
+            "It is read in one transaction: on SQLite, unless in WAL mode, writes wait until the backup is done.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', action='append', default=[],
+                            help="Code of a store to back up; repeat for several (default: every store)")
+        parser.add_argument('--output', help="Backup file to write (only with a single --store; "
+                                             "default: a timestamped file in BACKUP_DIR)")
+
+    def handle(self, *args, **options):
+        stores = Store.objects.order_by('code')
+        if options['store']:
+            stores = stores.filter(code__in=options['store'])
+            missing = set(options['store']) - {store.code for store in stores}
+            if missing:
+                raise CommandError(f"No store with code {', '.join(sorted(missing))}.")
+        if options['output'] and len(stores) != 1:
+            raise CommandError("--output needs exactly one --store.")
+
+        if not options['output']:
+            self.stdout.write(f"Backing up to {backup_root()}")
+        for store in stores:
+            start = time.perf_counter()
+            with using_store(store):
+                path, manifest = backup_store(
+                    store, options['output'],
+                    progress=lambda model, count: self.stdout.write(f"  {model._meta.label}: {count}"),
+                )
+            rows = sum(table['rows'] for table in manifest['tables'])
+            elapsed = time.perf_counter() - start
+            self.stdout.write(self.style.SUCCESS(f"{store.name}: {rows} rows to {path} in {elapsed:.2f}s."))
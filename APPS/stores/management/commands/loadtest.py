@@ -0,0 +1,200 @@
+import secrets
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+from django.utils import timezone
+
+from APPS.inventory.models import Category, Item, Sale
+from APPS.repair_tracker.forms import RepairForm
+from APPS.repair_tracker.models import Repair
+from APPS.stores.models import Store
+from STORE_MANAGER.loadtest import (
+    ERROR, LOCK_TIMEOUT, OK, OUT_OF_STOCK, TIMEOUT, LoadTestError, run_user, summarize,
+)
+from STORE_MANAGER.routers import using_store
+
+
+class Command(BaseCommand):
+    help = (
+        "Hit a running server with simulated tills, dashboards, searches and repair edits at once, then report "
+        "throughput, latency percentiles, error rates and whether stock and sales still agree. It sells real "
+        "stock and edits real repairs: run it against a copy of the data, with the server using the same database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Server to test")
+        parser.add_argument('--serve', action='store_true',
+                            help="Start a runserver on --url's port for the test and stop it afterwards")
+        parser.add_argument('--store', default=getattr(settings, 'DEFAULT_STORE_CODE', 'main'),
+                            help="Code of the store to sell from (default: the default store)")
+        parser.add_argument('--duration', type=float, default=30, help="Seconds to run")
+        parser.add_argument('--cashiers', type=int, default=8, help="Simulated tills selling items")
+        parser.add_argument('--dashboards', type=int, default=15, help="Simulated tablets polling the dashboard")
+        parser.add_argument('--searchers', type=int, default=4, help="Simulated staff searching the item list")
+        parser.add_argument('--repair-editors', type=int, default=2, help="Simulated technicians editing repairs")
+        parser.add_argument('--items', type=int, default=20,
+                            help="Number of in-stock items the tills sell from; fewer means more contention")
+        parser.add_argument('--think', type=float, default=0.0,
+                            help="Average pause between a user's requests in seconds (0 for none)")
+        parser.add_argument('--timeout', type=float, default=30.0, help="Seconds before a request counts as timed out")
+        parser.add_argument('--processes', action='store_true',
+                            help="Run each simulated user in its own process instead of a thread")
+
+    def handle(self, *args, **options):
+        try:
+            store = Store.objects.get(code=options['store'])
+        except Store.DoesNotExist:
+            raise CommandError(f"No store with code '{options['store']}'.")
+
+        with using_store(store):
+            config = self.prepare(store, options)
+        roles = (
+            ['cashier'] * options['cashiers'] + ['dashboard'] * options['dashboards']
+            + ['search'] * options['searchers'] + ['repairs'] * (options['repair_editors'] if config['repairs'] else 0)
+        )
+        if not roles:
+            raise CommandError("No simulated users; give at least one of --cashiers, --dashboards, ...")
+
+        server = self.start_server(options['url']) if options['serve'] else None
+        try:
+            started = timezone.now()
+            samples = self.run(roles, config, options)
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+
+        self.report(summarize(samples, options['duration']), len(roles), options['duration'])
+        with using_store(store):
+            consistent = self.check_stock(config, started, samples)
+        if not consistent:
+            raise CommandError("Stock and sales disagree after the load test.")
+
+    def prepare(self, store, options):
+        """Create the load test account and pick the items and repairs to work on"""
+        password = secrets.token_urlsafe(16)
+        user, _ = get_user_model().objects.get_or_create(username=f'loadtest-{store.code}', defaults={'store': store})
+        user.store = store
+        user.set_password(password)
+        user.save()
+
+        items = list(
+            Item.objects.filter(store=store, quantity__gt=0).order_by('?')
+            .values_list('pk', 'name', 'selling_price', 'quantity')[:options['items']]
+        )
+        if options['cashiers'] and not items:
+            raise CommandError(f"{store.name} has no items in stock to sell.")
+        repairs = list(
+            Repair.objects.filter(store=store, status='IN_PROGRESS').order_by('-created_at')
+            .values('id', *RepairForm._meta.fields)[:20]
+        )
+        if options['repair_editors'] and not repairs:
+            self.stdout.write(self.style.WARNING("No repairs in progress; skipping the repair editors."))
+
+        search_terms = {name.split()[0] for _, name, _, _ in items if name.split()}
+        search_terms.update(Category.objects.filter(store=store).values_list('name', flat=True)[:20])
+        return {
+            'url': options['url'],
+            'username': user.username,
+            'password': password,
+            'timeout': options['timeout'],
+            'think': options['think'],
+            'items': [(pk, str(price)) for pk, _, price, _ in items],
+            'start_quantities': {pk: quantity for pk, _, _, quantity in items},
+            'repairs': repairs,
+            'search_terms': sorted(search_terms) or ['a'],
+        }
+
+    def start_server(self, url):
+        address = url.split('://', 1)[-1].rstrip('/')
+        server = subprocess.Popen(
+            [sys.executable, str(Path(settings.BASE_DIR) / 'manage.py'), 'runserver', '--noreload', address],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                requests.get(url, timeout=1)
+                return server
+            except requests.ConnectionError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f"The server at {url} didn't start.")
+
+    def run(self, roles, config, options):
+        executor_class = ProcessPoolExecutor if options['processes'] else ThreadPoolExecutor
+        self.stdout.write(
+            f"Running {len(roles)} simulated users for {options['duration']:g}s against {config['url']} "
+            f"({'processes' if options['processes'] else 'threads'})"
+        )
+        samples = []
+        with executor_class(max_workers=len(roles)) as executor:
+            futures = [executor.submit(run_user, role, config, options['duration']) for role in roles]
+            try:
+                for future in futures:
+                    samples.extend(future.result())
+            except (LoadTestError, requests.RequestException) as e:
+                raise CommandError(str(e))
+        return samples
+
+    def report(self, rows, users, seconds):
+        self.stdout.write(f"{users} users, {seconds:g}s each")
+        self.stdout.write(
+            f"{'action':<13}{'requests':>9}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'no stock':>10}{'locked':>8}{'timeout':>9}{'errors':>8}"
+        )
+        for row in sorted(rows, key=lambda row: (row['action'] == 'total', row['action'])):
+            self.stdout.write(
+                f"{row['action']:<13}{row['requests']:>9}{row['per_second']:>8.1f}{row['p50']:>9.1f}"
+                f"{row['p95']:>9.1f}{row['p99']:>9.1f}{row[OUT_OF_STOCK]:>10}{row[LOCK_TIMEOUT]:>8}"
+                f"{row[TIMEOUT]:>9}{row[ERROR]:>8}"
+            )
+        total = next(row for row in rows if row['action'] == 'total')
+        if total['requests']:
+            failed = total[LOCK_TIMEOUT] + total[TIMEOUT] + total[ERROR]
+            self.stdout.write(
+                f"Error rate {failed / total['requests']:.2%} "
+                f"(lock timeouts {total[LOCK_TIMEOUT] / total['requests']:.2%})"
+            )
+
+    def check_stock(self, config, started, samples):
+        """No item sold below zero, and every item's stock moved by exactly what its recorded sales add up to"""
+        start_quantities = config['start_quantities']
+        if not start_quantities:
+            return True
+        final = dict(Item.objects.filter(pk__in=list(start_quantities)).values_list('pk', 'quantity'))
+        sold = dict(
+            Sale.objects.filter(item_id__in=list(start_quantities), sold_at__gte=started)
+            .values_list('item_id').annotate(units=Sum('quantity_sold')).values_list('item_id', 'units')
+        )
+        confirmed = sum(1 for action, _, outcome in samples if action == 'sell' and outcome == OK)
+
+        problems = []
+        oversold = [pk for pk, quantity in final.items() if quantity < 0]
+        if oversold:
+            problems.append(f"{len(oversold)} item(s) oversold below zero (ids {', '.join(map(str, oversold[:10]))})")
+        drifted = [pk for pk, quantity in start_quantities.items() if pk in final
+                   and quantity - sold.get(pk, 0) != final[pk]]
+        if drifted:
+            problems.append(f"{len(drifted)} item(s) whose stock doesn't match their sales "
+                            f"(ids {', '.join(map(str, drifted[:10]))})")
+        if sum(sold.values()) != confirmed:
+            problems.append(f"{confirmed} sale(s) confirmed to the tills but {sum(sold.values())} unit(s) recorded")
+
+        self.stdout.write(
+            f"Stock check: {len(start_quantities)} items, {confirmed} units sold, "
+            f"{sum(final.values())} left"
+        )
+        for problem in problems:
+            self.stdout.write(self.style.ERROR(f"  {problem}"))
+        if not problems:
+            self.stdout.write(self.style.SUCCESS("  No oversell; stock and sales agree."))
+        return not problems
@@ -0,0 +1,45 @@
+import time
+import zipfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from APPS.stores.models import Store
+from STORE_MANAGER.backup import BackupError, read_manifest, restore_store
+from STORE_MANAGER.routers import using_store
+
+
+class Command(BaseCommand):
+    help = "Load a backup written by backup_store into a store"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Backup file")
+        parser.add_argument('--store', help="Code of the store to restore into (default: the store that was backed up)")
+        parser.add_argument('--replace', action='store_true', help="Delete the store's current data first")
+
+    def handle(self, *args, **options):
+        try:
+            with zipfile.ZipFile(options['path']) as archive:
+                manifest = read_manifest(archive)
+        except (OSError, zipfile.BadZipFile) as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+        except BackupError as e:
+            raise CommandError(str(e))
+
+        code = options['store'] or manifest['store']['code']
+        try:
+            store = Store.objects.get(code=code)
+        except Store.DoesNotExist:
+            raise CommandError(f"No store with code '{code}'; create it first.")
+
+        self.stdout.write(f"Restoring {manifest['store']['name']} (backed up {manifest['created_at']}) into {store.name}")
+        start = time.perf_counter()
+        with using_store(store):
+            try:
+                restored = restore_store(
+                    options['path'], store, replace=options['replace'],
+                    progress=lambda model, count: self.stdout.write(f"  {model._meta.label}: {count}"),
+                )
+            except BackupError as e:
+                raise CommandError(str(e))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"Restored {sum(restored.values())} rows in {elapsed:.2f}s."))
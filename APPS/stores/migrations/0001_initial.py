@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-19 15:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_default_store(apps, schema_editor):
+    # Existing items, sales and repairs are moved into this store
+    Store = apps.get_model('stores', 'Store')
+    Store.objects.using(schema_editor.connection.alias).get_or_create(
+        code=getattr(settings, 'DEFAULT_STORE_CODE', 'main'), defaults={'name': 'Main Store'},
+    )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Store',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('code', models.SlugField(unique=True)),
+                ('database', models.CharField(default='default', max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(create_default_store, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, models
+
+
+class Store(models.Model):
+    """A shop (branch); items, sales and repairs belong to exactly one store"""
+    name = models.CharField(max_length=255)
+    code = models.SlugField(max_length=50, unique=True)
+    # Database alias holding this store's data (see STORE_DATABASES)
+    database = models.CharField(max_length=50, default=DEFAULT_DB_ALIAS)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+def get_default_store():
+    """The store for rows and users that don't name one; single-shop installs only ever use this one"""
+    code = getattr(settings, 'DEFAULT_STORE_CODE', 'main')
+    store, _ = Store.objects.get_or_create(code=code, defaults={'name': 'Main Store'})
+    return store
+
+
+_default_store_id = None
+
+
+def default_store_id():
+    """Default for the store foreign keys, remembered until a store is saved or deleted (see signals.py)"""
+    global _default_store_id
+    if _default_store_id is None:
+        _default_store_id = get_default_store().pk
+    return _default_store_id
+
+
+def forget_default_store():
+    global _default_store_id
+    _default_store_id = None
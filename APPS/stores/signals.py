@@ -0,0 +1,35 @@
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from STORE_MANAGER.routers import forget_store
+
+from .models import Store, forget_default_store
+
+
+@receiver(post_save, sender=Store)
+def copy_store_to_its_database(sender, instance, using, **kwargs):
+    """Keep a copy of the Store row on the store's own database, where its items point to it"""
+    forget_store(instance.pk)
+    forget_default_store()  # It may have been renamed away from DEFAULT_STORE_CODE
+    if instance.database != using:
+        instance.save(using=instance.database)
+        instance._state.db = using  # Later saves of this object still go to the default database
+
+
+@receiver(post_delete, sender=Store)
+def forget_deleted_store(sender, instance, **kwargs):
+    forget_store(instance.pk)
+    forget_default_store()
+
+
+@receiver(post_migrate)
+def forget_default_store_after_flush(**kwargs):
+    # flush (between TransactionTestCases) empties the table and sends post_migrate
+    forget_default_store()
+
+
+@receiver(setting_changed)
+def forget_default_store_code(setting, **kwargs):
+    if setting == 'DEFAULT_STORE_CODE':
+        forget_default_store()
@@ -0,0 +1,194 @@
+import json
+import tempfile
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from APPS.inventory.categories import categories as category_cache
+from APPS.inventory.forms import CategoryForm, ItemForm
+from APPS.inventory.models import Category, Item, Sale
+from APPS.repair_tracker.models import Repair, Revenue
+from APPS.user_manager.models import CustomUser
+from STORE_MANAGER.backup import backup_store
+from STORE_MANAGER.loadtest import summarize
+from STORE_MANAGER.routers import StoreRouter, using_store
+
+from .models import Store, default_store_id, get_default_store
+
+
+class StoreIsolationTests(TestCase):
+    """A store's staff only ever see and change their own store's data"""
+
+    def setUp(self):
+        cache.clear()
+        category_cache.clear()
+        self.main = get_default_store()
+        self.branch = Store.objects.create(name='Branch', code='branch')
+        self.category = Category.objects.create(name='Phones')
+        self.item = Item.objects.create(name='Charger', sku='600000000001', category=self.category,
+                                        buying_price=Decimal('100.00'), selling_price=Decimal('150.00'), quantity=10)
+        self.item.sell_item(1)
+        self.repair = Repair.objects.create(owner_name='Amina', owner_phone='0712345678', phone_name='Pixel',
+                                            phone_model='7', issue_description='Screen', charges=Decimal('1000.00'))
+        self.client.force_login(CustomUser.objects.create_user(username='branch', password='pw', store=self.branch))
+
+    def test_other_store_rows_are_not_found(self):
+        self.assertNotContains(self.client.get(reverse('item_list')), 'Charger')
+        self.assertNotContains(self.client.get(reverse('dashboard')), 'Charger')
+        for url in [reverse('item_update', args=[self.item.pk]), reverse('item_delete', args=[self.item.pk]),
+                    reverse('sell_item', args=[self.item.pk]),
+                    reverse('repair_tracker:repair-update', args=[self.repair.pk])]:
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+        self.assertEqual(self.client.get(reverse('check_stock'), {'item_id': self.item.pk},
+                                         HTTP_X_REQUESTED_WITH='XMLHttpRequest').status_code, 404)
+
+        self.client.post(reverse('sell_item', args=[self.item.pk]),
+                         {'item': self.item.pk, 'quantity_sold': 1, 'selling_price': '150.00'})
+        self.client.post(reverse('item_delete', args=[self.item.pk]))
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.quantity, Sale.objects.count()), (9, 1))
+
+    def test_new_rows_belong_to_the_users_store(self):
+        self.client.post(reverse('category_create'), {'name': 'Cables'})
+        self.assertEqual(Category.objects.get(name='Cables').store, self.branch)
+        self.client.post(reverse('repair_tracker:repair-create'), {
+            'owner_name': 'Baraka', 'owner_phone': '0722000000', 'phone_name': 'Galaxy', 'phone_model': 'S',
+            'issue_description': 'Battery', 'charges': '500.00', 'status': 'IN_PROGRESS',
+        })
+        self.assertEqual(Repair.objects.get(owner_name='Baraka').store, self.branch)
+
+    def test_item_form_only_offers_the_stores_categories(self):
+        data = {'name': 'Charger', 'sku': '', 'category': self.category.pk, 'buying_price': '100.00',
+                'selling_price': '150.00', 'quantity': 1, 'low_stock_threshold': 1}
+        form = ItemForm(data, store=self.branch)
+        self.assertFalse(form.is_valid())
+        self.assertIn('category', form.errors)
+
+    def test_names_and_skus_are_unique_per_store(self):
+        self.assertTrue(CategoryForm({'name': 'Phones'}, store=self.branch).is_valid())
+        self.assertFalse(CategoryForm({'name': 'Phones'}, store=self.main).is_valid())
+
+        branch_category = Category.objects.create(store=self.branch, name='Phones')
+        category_cache.clear()
+        data = {'name': 'Charger', 'sku': '600000000001', 'buying_price': '100.00', 'selling_price': '150.00',
+                'quantity': 1, 'low_stock_threshold': 1}
+        self.assertTrue(ItemForm({**data, 'category': branch_category.pk}, store=self.branch).is_valid())
+        form = ItemForm({**data, 'category': self.category.pk}, store=self.main)
+        self.assertFalse(form.is_valid())
+        self.assertIn('sku', form.errors)
+
+    def test_router_sends_queries_to_the_stores_database(self):
+        router = StoreRouter()
+        remote = Store(pk=self.branch.pk + 1, name='Remote', code='remote', database='branch2')
+        self.assertIsNone(router.db_for_read(Item))
+        with using_store(remote):
+            self.assertEqual(router.db_for_read(Item), 'branch2')
+            self.assertEqual(router.db_for_write(Sale), 'branch2')
+            self.assertEqual(router.db_for_read(Revenue), 'branch2')
+            # Users and stores stay on the default database
+            self.assertIsNone(router.db_for_read(CustomUser))
+            # A saved row goes to its own store's database, whatever the current store
+            self.assertEqual(router.db_for_write(Item, instance=self.item), 'default')
+
+    def test_default_store_follows_changes(self):
+        self.assertEqual(default_store_id(), self.main.pk)
+        self.main.code = 'old-main'
+        self.main.save()
+        self.assertNotEqual(default_store_id(), self.main.pk)
+        self.assertEqual(Store.objects.get(pk=default_store_id()).code, 'main')
+        with override_settings(DEFAULT_STORE_CODE='branch'):
+            self.assertEqual(default_store_id(), self.branch.pk)
+
+
+class BackupTests(TestCase):
+    """A store backs up to one file and restores with its ids and timestamps intact"""
+
+    def setUp(self):
+        self.store = get_default_store()
+        category = Category.objects.create(name='Cables')
+        items = Item.objects.bulk_create(
+            Item(name=f'Cable {i}', category=category, buying_price=Decimal('50.00'),
+                 selling_price=Decimal('80.00'), quantity=10)
+            for i in range(30)
+        )
+        Sale.objects.bulk_create(Sale(item=item, quantity_sold=2, selling_price=Decimal('80.00')) for item in items)
+        repair = Repair.objects.create(owner_name='Amina', owner_phone='0700000000', phone_name='Pixel',
+                                       phone_model='7', issue_description='Screen', charges=Decimal('1500.00'))
+        self.created_at = timezone.now() - timedelta(days=40)
+        Repair.objects.filter(pk=repair.pk).update(created_at=self.created_at, updated_at=self.created_at)
+        Revenue.objects.create(repair=repair, amount=Decimal('1500.00'), collected_at=self.created_at)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'main.zip'
+
+    def test_backup_and_restore(self):
+        call_command('backup_store', '--store', self.store.code, '--output', self.path, stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, 'already has data'):
+            call_command('restore_store', self.path, stdout=StringIO())
+
+        Item.objects.update(quantity=0)
+        Repair.objects.all().delete()
+        call_command('restore_store', self.path, '--replace', stdout=StringIO())
+        self.assertEqual(Item.objects.filter(quantity=10).count(), 30)
+        self.assertEqual(Sale.objects.count(), 30)
+        repair = Repair.objects.get()
+        self.assertEqual((repair.created_at, repair.updated_at), (self.created_at, self.created_at))
+        self.assertEqual(repair.revenue.amount, Decimal('1500.00'))
+
+    def test_damaged_backup_is_refused(self):
+        call_command('backup_store', '--store', self.store.code, '--output', self.path, stdout=StringIO())
+        with zipfile.ZipFile(self.path) as archive:
+            members = {name: archive.read(name) for name in archive.namelist()}
+        members['inventory.item.ndjson'] = members['inventory.item.ndjson'].replace(b'"80.00"', b'"8.00"', 1)
+        with zipfile.ZipFile(self.path, 'w') as archive:
+            for name, data in members.items():
+                archive.writestr(name, data)
+
+        with self.assertRaisesMessage(CommandError, 'inventory.item.ndjson is damaged'):
+            call_command('restore_store', self.path, '--replace', stdout=StringIO())
+        self.assertEqual(Sale.objects.count(), 30)
+
+
+class BackupTransactionTests(TransactionTestCase):
+    """A backup reads every table of the store inside one transaction"""
+
+    def test_backup_is_one_read_transaction(self):
+        store = get_default_store()
+        other = Store.objects.create(code='north', name='North')
+        category = Category.objects.create(name='Cables')
+        Category.objects.create(name='Cables', store=other)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        in_transaction = []
+
+        def check(model, count):
+            in_transaction.append(connection.in_atomic_block)
+
+        path, manifest = backup_store(store, Path(directory.name) / 'main.zip', progress=check)
+        self.assertTrue(in_transaction and all(in_transaction))
+        self.assertFalse(connection.in_atomic_block)
+        table = next(table for table in manifest['tables'] if table['model'] == 'inventory.category')
+        with zipfile.ZipFile(path) as archive:
+            row = json.loads(archive.read(table['file']))
+        self.assertEqual((table['rows'], row[0]), (1, category.pk))
+        self.assertEqual([entry.name for entry in Path(directory.name).iterdir()], ['main.zip'])
+
+
+class LoadTestSummaryTests(TestCase):
+    def test_summarize(self):
+        samples = [('sell', i / 1000, 'ok') for i in range(1, 101)] + [('sell', 2.0, 'lock_timeout'), ('dashboard', 0.05, 'error')]
+        rows = {row['action']: row for row in summarize(samples, 10)}
+        self.assertEqual((rows['sell']['requests'], rows['sell']['ok'], rows['sell']['lock_timeout']), (101, 100, 1))
+        self.assertEqual((rows['sell']['p50'], rows['sell']['p99']), (51.0, 100.0))
+        self.assertEqual(rows['total']['requests'], 102)
+        self.assertAlmostEqual(rows['total']['per_second'], 10.2)
@@ -4,7 +4,8 @@ from .models import CustomUser
 
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
-    list_display = ('username', 'email', 'phone_number', 'is_admin', 'is_staff', 'date_joined')
+    list_display = ('username', 'email', 'phone_number', 'store', 'is_admin', 'is_staff', 'date_joined')
+    list_filter = UserAdmin.list_filter + ('store',)
     search_fields = ('username', 'email', 'phone_number')
     readonly_fields = ('date_joined', 'last_login')
     
@@ -12,6 +13,7 @@ class CustomUserAdmin(UserAdmin):
     fieldsets = (
         (None, {'fields': ('username', 'password')}),
         ('Personal info', {'fields': ('first_name', 'last_name', 'email', 'phone_number')}),
+        ('Store', {'fields': ('store',)}),
         ('Permissions', {'fields': ('is_active', 'is_staff', 'is_superuser', 'is_admin', 'groups', 'user_permissions')}),
         ('Important dates', {'fields': ('last_login', 'date_joined')}),
     )
@@ -20,6 +22,6 @@ class CustomUserAdmin(UserAdmin):
     add_fieldsets = (
         (None, {
             'classes': ('wide',),
-            'fields': ('username', 'email', 'phone_number', 'password1', 'password2'),
+            'fields': ('username', 'email', 'phone_number', 'store', 'password1', 'password2'),
         }),
     )
\ No newline at end of file
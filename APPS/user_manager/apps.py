@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.contrib.auth.signals import user_logged_in
 
 
 class UserManagerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'APPS.user_manager'
+
+    def ready(self):
+        from .signals import update_last_login
+
+        # Same dispatch_uid as django.contrib.auth's receiver: this replaces it whichever app is ready first
+        user_logged_in.disconnect(dispatch_uid='update_last_login')
+        user_logged_in.connect(update_last_login, dispatch_uid='update_last_login')
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .user_cache import user_cache
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def forget_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+def update_last_login(sender, user, **kwargs):
+    """Replaces Django's receiver: record a login at most once per LAST_LOGIN_UPDATE_INTERVAL seconds"""
+    now = timezone.now()
+    interval = timedelta(seconds=getattr(settings, 'LAST_LOGIN_UPDATE_INTERVAL', 3600))
+    if user.last_login is not None and now - user.last_login < interval:
+        return
+    user.last_login = now
+    # update() rather than save(): no other field is written, and the cached user stays valid
+    type(user)._default_manager.filter(pk=user.pk).update(last_login=now)
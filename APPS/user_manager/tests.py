@@ -1,3 +1,49 @@
-from django.test import TestCase
+from datetime import timedelta
+from importlib import import_module
 
-# Create your tests here.
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import CustomUser
+from .user_cache import get_user, user_cache
+
+
+class AuthCacheTests(TestCase):
+    """Signed-in requests authenticate without touching the database"""
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.user = CustomUser.objects.create_user(username='cashier', password='pw')
+        self.client.force_login(self.user)
+
+    def request(self):
+        request = RequestFactory().get('/')
+        engine = import_module(django_settings.SESSION_ENGINE)
+        request.session = engine.SessionStore(self.client.session.session_key)
+        return request
+
+    def test_signed_in_request_runs_no_auth_queries(self):
+        self.assertEqual(get_user(self.request()), self.user)
+        with self.assertNumQueries(0):
+            user = get_user(self.request())
+            self.assertEqual(user.pk, self.user.pk)
+
+    def test_password_change_signs_out_old_sessions(self):
+        get_user(self.request())
+        self.user.set_password('new')
+        self.user.save()
+        self.assertFalse(get_user(self.request()).is_authenticated)
+
+    def test_last_login_is_throttled(self):
+        recent = timezone.now() - timedelta(minutes=10)
+        CustomUser.objects.filter(pk=self.user.pk).update(last_login=recent)
+        self.client.login(username='cashier', password='pw')
+        self.assertEqual(CustomUser.objects.get(pk=self.user.pk).last_login, recent)
+
+        CustomUser.objects.filter(pk=self.user.pk).update(last_login=timezone.now() - timedelta(hours=2))
+        self.client.login(username='cashier', password='pw')
+        self.assertGreater(CustomUser.objects.get(pk=self.user.pk).last_login, recent)
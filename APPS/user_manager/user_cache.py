@@ -0,0 +1,92 @@
+"""
+Per-process cache of signed-in users.
+
+Every page needs ``request.user``, and Django loads it from the database on
+each request. Each worker keeps recently seen users in memory instead, keyed
+by user id and the session's auth hash (derived from the password), so a
+session whose password has since changed never finds a cached user. Entries
+are dropped when the user is saved or deleted in this process (see
+signals.py); other workers only see a change, such as a deactivated account,
+once their entry expires, so entries live for AUTH_USER_CACHE_TTL seconds at
+most (0 turns the cache off).
+
+Together with cached sessions (SESSION_ENGINE) a signed-in request reads
+nothing from the database to authenticate.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.utils.crypto import constant_time_compare
+
+
+class UserCache:
+    def __init__(self, maxsize=1024, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (user id, session auth hash) -> (expires_at, user)
+        self._lock = threading.Lock()
+
+    def get(self, user_id, session_hash):
+        key = (user_id, session_hash)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        # A copy per request, so what one request caches on its user doesn't leak into another's
+        return copy.copy(user)
+
+    def set(self, user_id, session_hash, user):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[(user_id, session_hash)] = (time.monotonic() + self.ttl, copy.copy(user))
+            self._entries.move_to_end((user_id, session_hash))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(
+    maxsize=getattr(settings, 'AUTH_USER_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'AUTH_USER_CACHE_TTL', 30),
+)
+
+
+def get_user(request):
+    """``django.contrib.auth.get_user()``, answered from the cache when the session's user is in it"""
+    session = request.session
+    try:
+        user_id = get_user_model()._meta.pk.to_python(session[SESSION_KEY])
+        backend_path = session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    session_hash = session.get(HASH_SESSION_KEY)
+    if not session_hash or backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return auth.get_user(request)
+
+    user = user_cache.get(user_id, session_hash)
+    if user is None:
+        # Django verifies the session (and moves it to a rotated SECRET_KEY) as usual
+        user = auth.get_user(request)
+        if user.is_authenticated and constant_time_compare(session_hash, user.get_session_auth_hash()):
+            user_cache.set(user_id, session_hash, user)
+    return user
@@ -0,0 +1,119 @@
+"""
+Compressed monthly archive files for old rows.
+
+Rows are stored as gzip-compressed NDJSON, one directory per table, store and month:
+
+    ARCHIVE_DIR/<kind>/<YYYY-MM>/<run id>.ndjson.gz    (kind is e.g. "sales/<store code>")
+
+Every archive run writes a new file (to a temporary name first, then renamed),
+so a crash never leaves a half-written partition behind. Readers drop repeated
+ids, so a run that wrote its file but died before deleting the rows is
+harmless when it is retried; reports read through archived_rows(), which also
+skips the rows such a run left live.
+"""
+import gzip
+import json
+import os
+import shutil
+import uuid
+from datetime import date
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class ArchiveError(Exception):
+    """An archive partition can't be restored as it is"""
+
+
+def archive_root():
+    return Path(getattr(settings, 'ARCHIVE_DIR', Path(settings.BASE_DIR) / 'archive'))
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def months_between(start_date, end_date):
+    """First days of every month overlapping the range"""
+    month = month_start(start_date)
+    while month <= end_date:
+        yield month
+        month = next_month(month)
+
+
+def partition_dir(kind, month):
+    return archive_root() / kind / month.strftime('%Y-%m')
+
+
+def write_partition(kind, month, rows):
+    """Write rows (dicts) to a new file in the month's partition and return how many were written"""
+    directory = partition_dir(kind, month)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"{uuid.uuid4().hex}.ndjson.gz"
+    temp_path = directory / f".{name}.tmp"
+
+    count = 0
+    with open(temp_path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as archive:
+            for row in rows:
+                archive.write(json.dumps(row, cls=DjangoJSONEncoder).encode() + b'\n')
+                count += 1
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    if count:
+        os.replace(temp_path, directory / name)
+    else:
+        temp_path.unlink()
+    return count
+
+
+def read_partition(kind, month):
+    """Yield the rows of a month's partition, each id at most once"""
+    seen = set()
+    directory = partition_dir(kind, month)
+    if not directory.is_dir():
+        return
+    for path in sorted(directory.glob('*.ndjson.gz')):
+        with gzip.open(path, 'rt') as archive:
+            for line in archive:
+                row = json.loads(line)
+                if row['id'] in seen:
+                    continue
+                seen.add(row['id'])
+                yield row
+
+
+def archived_rows(kind, month, model, chunk_size=2000):
+    """
+    read_partition() without rows that are still in ``model``'s table: a run
+    that died after writing its file but before deleting them leaves them in
+    both, and they must only be counted once.
+    """
+    rows = read_partition(kind, month)
+    while batch := list(islice(rows, chunk_size)):
+        live = set(model._base_manager.filter(pk__in=[row['id'] for row in batch]).values_list('pk', flat=True))
+        yield from (row for row in batch if row['id'] not in live)
+
+
+def archived_months(kind):
+    directory = archive_root() / kind
+    if not directory.is_dir():
+        return []
+    months = []
+    for path in directory.iterdir():
+        if path.is_dir() and any(path.glob('*.ndjson.gz')):
+            year, month = path.name.split('-')
+            months.append(date(int(year), int(month), 1))
+    return sorted(months)
+
+
+def remove_partition(kind, month):
+    shutil.rmtree(partition_dir(kind, month), ignore_errors=True)
@@ -0,0 +1,276 @@
+"""
+Full backups of one store's data.
+
+A backup is a single zip file with one NDJSON member per table (one JSON
+array per row, in the column order the manifest lists) and a manifest.json
+holding the store, each table's columns, row count and SHA-256:
+
+    <store code>-<timestamp>.zip
+        manifest.json
+        inventory.category.ndjson
+        inventory.item.ndjson
+        ...
+
+Tables are read in primary-key chunks as plain value tuples and written as
+they are read, so memory use doesn't grow with the size of the store, and no
+model instance is ever built. Only the store's own rows are read, all inside
+one read transaction, so every table is read from the same moment. On SQLite
+in its default rollback-journal mode that transaction makes writers (sales at
+the till) wait until the backup is written; in WAL mode they don't.
+
+A restore first checks every member against the manifest, then inserts the
+rows in dependency order, in chunks, with foreign key checks deferred to the
+end of its transaction, keeping the backed-up ids and timestamps.
+"""
+import hashlib
+import json
+import os
+import uuid
+import zipfile
+from datetime import datetime, time
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.color import no_style
+from django.core.serializers import sort_dependencies
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connections, router, transaction
+from django.utils import timezone
+
+from .routers import STORE_APPS
+from .watermarks import DOMAINS, touch
+
+FORMAT = 1
+CHUNK_SIZE = 5000
+MANIFEST = 'manifest.json'
+
+JSON_NATIVE_TYPES = {
+    'AutoField', 'BigAutoField', 'BigIntegerField', 'BooleanField', 'CharField', 'ForeignKey', 'IntegerField',
+    'OneToOneField', 'PositiveIntegerField', 'PositiveSmallIntegerField', 'SlugField', 'SmallIntegerField', 'TextField',
+}
+
+
+class BackupError(Exception):
+    """A backup can't be restored as it is"""
+
+
+class BackupEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder, without rounding times to milliseconds"""
+
+    def default(self, o):
+        if isinstance(o, (datetime, time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def backup_root():
+    return Path(getattr(settings, 'BACKUP_DIR', Path(settings.BASE_DIR) / 'backups'))
+
+
+def store_models():
+    """Every store-scoped model, parents before the tables that point at them"""
+    return sort_dependencies([(apps.get_app_config(label), None) for label in sorted(STORE_APPS)])
+
+
+def store_lookup(model):
+    """The lookup from ``model`` to its store, e.g. 'store' or 'item__store'"""
+    names = {field.name for field in model._meta.concrete_fields}
+    if 'store' in names:
+        return 'store'
+    for field in model._meta.concrete_fields:
+        if (field.many_to_one or field.one_to_one) and 'store' in {f.name for f in field.related_model._meta.concrete_fields}:
+            return f'{field.name}__store'
+    raise ValueError(f"{model._meta.label} has no path to a store")
+
+
+def store_rows(model, store, using=None):
+    return model._base_manager.db_manager(using).filter(**{store_lookup(model): store})
+
+
+def columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def chunks(model, store, using=None):
+    """Yield a store's rows of ``model`` as lists of value tuples, CHUNK_SIZE at a time in primary key order"""
+    rows = store_rows(model, store, using).order_by('pk').values_list(*columns(model))
+    last = None
+    while True:
+        chunk = list((rows if last is None else rows.filter(pk__gt=last))[:CHUNK_SIZE])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1][0]
+
+
+def backup_store(store, path=None, progress=None):
+    """Write all of ``store``'s rows to a new backup file and return its path and manifest"""
+    if path is None:
+        path = backup_root() / f"{store.code}-{timezone.now():%Y%m%d-%H%M%S}.zip"
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+
+    encoder = BackupEncoder(separators=(',', ':'))
+    manifest = {
+        'format': FORMAT,
+        'store': {'code': store.code, 'name': store.name},
+        'created_at': timezone.now().isoformat(),
+        'tables': [],
+    }
+    try:
+        with zipfile.ZipFile(temp_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            using = router.db_for_read(store_models()[0])
+            with transaction.atomic(using=using):
+                for model in store_models():
+                    name = f'{model._meta.label_lower}.ndjson'
+                    digest = hashlib.sha256()
+                    count = 0
+                    with archive.open(name, 'w', force_zip64=True) as member:
+                        for chunk in chunks(model, store, using):
+                            data = ''.join(encoder.encode(row) + '\n' for row in chunk).encode()
+                            member.write(data)
+                            digest.update(data)
+                            count += len(chunk)
+                    manifest['tables'].append({
+                        'model': model._meta.label_lower,
+                        'file': name,
+                        'columns': columns(model),
+                        'rows': count,
+                        'sha256': digest.hexdigest(),
+                    })
+                    if progress:
+                        progress(model, count)
+            archive.writestr(MANIFEST, json.dumps(manifest, indent=2))
+        with open(temp_path, 'rb') as raw:
+            os.fsync(raw.fileno())
+        os.replace(temp_path, path)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+    return path, manifest
+
+
+def read_manifest(archive):
+    try:
+        manifest = json.loads(archive.read(MANIFEST))
+    except KeyError:
+        raise BackupError("Not a store backup: it has no manifest.")
+    if manifest.get('format') != FORMAT:
+        raise BackupError(f"Unsupported backup format {manifest.get('format')!r}.")
+    return manifest
+
+
+def verify(archive, manifest):
+    """Check every table of a backup against its manifest entry (and that this schema can take it)"""
+    for table in manifest['tables']:
+        try:
+            model = apps.get_model(table['model'])
+        except LookupError:
+            raise BackupError(f"The backup has a table for {table['model']}, which doesn't exist here.")
+        if set(table['columns']) != set(columns(model)):
+            raise BackupError(
+                f"The columns of {table['model']} differ from this database's; "
+                "restore into a database migrated to the same version as the backup."
+            )
+        digest = hashlib.sha256()
+        count = 0
+        with archive.open(table['file']) as member:
+            for line in member:
+                digest.update(line)
+                count += 1
+        if digest.hexdigest() != table['sha256'] or count != table['rows']:
+            raise BackupError(f"{table['file']} is damaged: its checksum doesn't match the manifest.")
+
+
+def has_rows(store):
+    return any(store_rows(model, store).exists() for model in store_models())
+
+
+def delete_rows(store):
+    """Delete every row of ``store``, children first"""
+    for model in reversed(store_models()):
+        store_rows(model, store).delete()
+
+
+def insert(model, using, column_names, rows, store):
+    """
+    Insert backed-up rows as they are, with one executemany() per chunk.
+
+    Not bulk_create(): it would stamp auto_now fields with the current time,
+    and compiling its INSERT costs more than the database's own work.
+    """
+    connection = connections[using]
+    by_column = {field.attname: field for field in model._meta.concrete_fields}
+    fields = [by_column[name] for name in column_names]
+    store_column = column_names.index('store_id') if 'store_id' in column_names else None
+    # Numbers, strings and booleans come out of JSON as the database takes them; dates and decimals need converting
+    converted = [i for i, field in enumerate(fields) if field.get_internal_type() not in JSON_NATIVE_TYPES]
+    values = []
+    for row in rows:
+        if store_column is not None:
+            # The store may have another id where the backup is restored
+            row[store_column] = store.pk
+        for i in converted:
+            row[i] = fields[i].get_db_prep_save(fields[i].to_python(row[i]), connection)
+        values.append(row)
+    if not values:
+        return
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table), ', '.join(quote(field.column) for field in fields), ', '.join(['%s'] * len(fields)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, values)
+
+
+def restore_store(path, store, replace=False, progress=None):
+    """Load a backup file into ``store``; returns {model label: rows restored}"""
+    from APPS.inventory.categories import categories
+    from APPS.inventory.sku_cache import sku_cache
+
+    with zipfile.ZipFile(path) as archive:
+        manifest = read_manifest(archive)
+        verify(archive, manifest)
+
+        using = router.db_for_write(store_models()[0])
+        connection = connections[using]
+        if has_rows(store) and not replace:
+            raise BackupError(f"{store.name} already has data; restore with --replace to overwrite it.")
+
+        restored = {}
+        try:
+            with transaction.atomic(using=using):
+                with connection.constraint_checks_disabled():
+                    if replace:
+                        delete_rows(store)
+                    for table in manifest['tables']:
+                        model = apps.get_model(table['model'])
+                        count = 0
+                        batch = []
+                        with archive.open(table['file']) as member:
+                            for line in member:
+                                batch.append(json.loads(line))
+                                if len(batch) == CHUNK_SIZE:
+                                    insert(model, using, table['columns'], batch, store)
+                                    count += len(batch)
+                                    batch = []
+                        insert(model, using, table['columns'], batch, store)
+                        count += len(batch)
+                        restored[model._meta.label] = count
+                        if progress:
+                            progress(model, count)
+                models = [apps.get_model(table['model']) for table in manifest['tables']]
+                connection.check_constraints(table_names=[model._meta.db_table for model in models])
+                # Explicit ids leave PostgreSQL's sequences behind
+                with connection.cursor() as cursor:
+                    for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                        cursor.execute(sql)
+                categories.invalidate(store.pk, using=using)
+                transaction.on_commit(sku_cache.clear, using=using)
+                for domain in DOMAINS:
+                    touch(domain, store.pk, using=using)
+        except IntegrityError as e:
+            raise BackupError(f"The backup doesn't fit this database ({e}); are its ids used by another store?")
+    return restored
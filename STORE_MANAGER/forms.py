@@ -0,0 +1,26 @@
+from django import forms
+from django.utils.timezone import now, timedelta
+
+
+class DateRangeForm(forms.Form):
+    """A start and end date for report pages, defaulting to the last 30 days"""
+    start = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    end = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        end = cleaned_data.get('end') or now().date()
+        start = cleaned_data.get('start') or end - timedelta(days=29)
+        if start > end:
+            self.add_error('start', 'Start date must be on or before the end date')
+        cleaned_data['start'] = start
+        cleaned_data['end'] = end
+        return cleaned_data
+
+    def params(self):
+        """The cleaned data, or the defaults when the form has errors (so a page can show them and still render)"""
+        if self.is_valid():
+            return self.cleaned_data
+        defaults = type(self)({})
+        defaults.is_valid()
+        return defaults.cleaned_data
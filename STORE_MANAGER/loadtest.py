@@ -0,0 +1,164 @@
+"""
+Simulated shop-floor traffic for the loadtest command.
+
+Each simulated user is an HTTP client with its own session, logged in as the
+load test account, that repeats one role's requests for the test's duration:
+
+    cashier    opens an item's sell page and sells one unit
+    dashboard  loads the dashboard
+    search     searches the item list
+    repairs    opens a repair and saves it with new charges
+
+Users only talk HTTP, so they run the same in threads or in processes. Every
+request becomes a (action, seconds, outcome) sample; summarize() turns them
+into throughput, latency percentiles and error rates.
+"""
+import math
+import random
+import re
+import time
+from collections import defaultdict
+
+import requests
+
+# Outcomes
+OK = 'ok'
+OUT_OF_STOCK = 'out_of_stock'
+LOCK_TIMEOUT = 'lock_timeout'
+TIMEOUT = 'timeout'
+ERROR = 'error'
+
+# Seen on the error page when a request gave up waiting for a lock (SQLite, PostgreSQL); the page only
+# names the exception with DEBUG on, so without it lock timeouts count as errors
+LOCK_ERRORS = re.compile(rb'database is locked|lock timeout|could not obtain lock|deadlock detected', re.IGNORECASE)
+
+
+class LoadTestError(Exception):
+    """A simulated user couldn't start"""
+
+
+class User:
+    def __init__(self, config):
+        self.config = config
+        self.base_url = config['url'].rstrip('/')
+        self.session = requests.Session()
+        self.random = random.Random()
+        self.samples = []
+
+    def url(self, path):
+        return self.base_url + path
+
+    def csrf_token(self):
+        return self.session.cookies.get('csrftoken', '')
+
+    def login(self):
+        self.session.get(self.url('/login/'), timeout=self.config['timeout'])
+        response = self.session.post(self.url('/login/'), data={
+            'username': self.config['username'],
+            'password': self.config['password'],
+            'csrfmiddlewaretoken': self.csrf_token(),
+        }, allow_redirects=False, timeout=self.config['timeout'])
+        if response.status_code != 302:
+            raise LoadTestError(f"Login as {self.config['username']} failed (HTTP {response.status_code}).")
+
+    def request(self, action, method, path, check=None, **kwargs):
+        """Send one request and record its sample; returns the response, or None if it failed"""
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.url(path), allow_redirects=False,
+                                            timeout=self.config['timeout'], **kwargs)
+        except requests.Timeout:
+            self.samples.append((action, time.perf_counter() - start, TIMEOUT))
+            return None
+        except requests.RequestException:
+            self.samples.append((action, time.perf_counter() - start, ERROR))
+            return None
+        elapsed = time.perf_counter() - start
+
+        if response.status_code >= 500:
+            outcome = LOCK_TIMEOUT if LOCK_ERRORS.search(response.content) else ERROR
+        elif response.status_code >= 400:
+            outcome = ERROR
+        else:
+            outcome = check(response) if check else OK
+        self.samples.append((action, elapsed, outcome))
+        return response if outcome == OK else None
+
+    def post_data(self, data):
+        return {**data, 'csrfmiddlewaretoken': self.csrf_token()}
+
+    # Roles
+
+    def cashier(self):
+        item_id, price = self.random.choice(self.config['items'])
+        path = f'/inventory/items/{item_id}/sell/'
+        if self.request('sell_page', 'get', path):
+            # A sale redirects; the form comes back when stock ran out
+            self.request('sell', 'post', path, data=self.post_data({
+                'item': item_id, 'quantity_sold': 1, 'selling_price': price,
+            }), check=lambda response: OK if response.status_code == 302 else OUT_OF_STOCK)
+
+    def dashboard(self):
+        self.request('dashboard', 'get', '/inventory/')
+
+    def search(self):
+        term = self.random.choice(self.config['search_terms'])
+        self.request('search', 'get', '/inventory/items/', params={'search_query': term})
+
+    def repairs(self):
+        repair = self.random.choice(self.config['repairs'])
+        path = f"/repairs/repair/{repair['id']}/edit/"
+        if self.request('repair_page', 'get', path):
+            data = {key: value for key, value in repair.items() if key != 'id'}
+            data['charges'] = f"{self.random.randint(500, 5000)}.00"
+            self.request('repair_edit', 'post', path, data=self.post_data(data),
+                         check=lambda response: OK if response.status_code == 302 else ERROR)
+
+    def run(self, role, until):
+        act = getattr(self, role)
+        think = self.config['think']
+        while time.monotonic() < until:
+            act()
+            if think:
+                time.sleep(self.random.uniform(0, 2 * think))
+        return self.samples
+
+
+def run_user(role, config, duration):
+    """Log in, then play ``role`` for ``duration`` seconds; returns the samples"""
+    user = User(config)
+    # Logging in hashes a password, slow enough to eat into the measured time with many users
+    user.login()
+    return user.run(role, time.monotonic() + duration)
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+def summarize(samples, seconds):
+    """Per action and overall: requests, throughput, latency percentiles (ms) and outcome counts"""
+    by_action = defaultdict(list)
+    for action, elapsed, outcome in samples:
+        by_action[action].append((elapsed, outcome))
+    by_action['total'] = [(elapsed, outcome) for _, elapsed, outcome in samples]
+
+    rows = []
+    for action, results in by_action.items():
+        latencies = sorted(elapsed * 1000 for elapsed, _ in results)
+        outcomes = defaultdict(int)
+        for _, outcome in results:
+            outcomes[outcome] += 1
+        rows.append({
+            'action': action,
+            'requests': len(results),
+            'per_second': len(results) / seconds if seconds else 0.0,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            **{outcome: outcomes[outcome] for outcome in (OK, OUT_OF_STOCK, LOCK_TIMEOUT, TIMEOUT, ERROR)},
+        })
+    return rows
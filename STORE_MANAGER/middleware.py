@@ -0,0 +1,272 @@
+import random
+import re
+import secrets
+import struct
+import zlib
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import SimpleLazyObject
+
+from .profiling import run_profiled
+from .routers import get_store, using_store
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, fall back to gzip only
+    brotli = None
+
+
+# Content types that are already compressed and would only cost CPU to compress again
+ALREADY_COMPRESSED_TYPES = (
+    'application/pdf',
+    'application/zip',
+    'application/gzip',
+    'application/x-gzip',
+    'application/octet-stream',
+    'image/',
+    'audio/',
+    'video/',
+    'font/woff',
+)
+
+re_encoding = re.compile(r'^\s*([^\s;]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$')
+
+
+def parse_accept_encoding(header):
+    """Return a dict of encoding -> quality from an Accept-Encoding header"""
+    encodings = {}
+    for part in header.split(','):
+        match = re_encoding.match(part)
+        if not match:
+            continue
+        name, quality = match.groups()
+        try:
+            encodings[name.lower()] = float(quality) if quality is not None else 1.0
+        except ValueError:
+            continue
+    return encodings
+
+
+def choose_encoding(header, allow_brotli=True):
+    """Pick 'br' or 'gzip' from the Accept-Encoding header, or None"""
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0)
+    candidates = ['br', 'gzip'] if brotli is not None and allow_brotli else ['gzip']
+
+    best, best_quality = None, 0
+    for encoding in candidates:
+        quality = accepted.get(encoding, wildcard)
+        # Ties go to the earlier candidate, so Brotli wins over gzip
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def gzip_header(max_random_bytes=0):
+    """
+    A gzip member header. With ``max_random_bytes`` it carries a file name of
+    random length, like django.utils.text.compress_string, so the compressed
+    size of a page doesn't give away how well a secret in it matched (BREACH).
+    """
+    if not max_random_bytes:
+        return b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+    return b'\x1f\x8b\x08\x08\x00\x00\x00\x00\x00\xff' + b'a' * secrets.randbelow(max_random_bytes) + b'\x00'
+
+
+class Compressor:
+    """Incremental gzip/Brotli compressor with a common interface"""
+
+    def __init__(self, encoding, gzip_level=6, brotli_quality=4, max_random_bytes=0):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            # A raw deflate stream; the gzip header and trailer are written here so the header can be padded
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+            self._header = gzip_header(max_random_bytes)
+            self._crc = 0
+            self._size = 0
+
+    def _start(self):
+        header, self._header = self._header, b''
+        return header
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._compressor.process(data)
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        return self._start() + self._compressor.compress(data)
+
+    def flush(self):
+        """Emit everything compressed so far without ending the stream"""
+        if self.encoding == 'br':
+            return self._compressor.flush()
+        return self._start() + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        trailer = struct.pack('<II', self._crc & 0xffffffff, self._size & 0xffffffff)
+        return self._start() + self._compressor.flush(zlib.Z_FINISH) + trailer
+
+
+def compress_bytes(data, encoding, gzip_level=6, brotli_quality=4, max_random_bytes=0):
+    """Compress a whole body in one go"""
+    compressor = Compressor(encoding, gzip_level, brotli_quality, max_random_bytes)
+    return compressor.compress(data) + compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with Brotli or gzip, whichever the client prefers.
+    Small and already-compressed responses (PDFs, images) are left alone.
+    Streaming responses are compressed chunk by chunk so they are never buffered.
+
+    gzip output is padded to a random length against BREACH. Brotli has no
+    room for padding, so pages that include the CSRF token are sent as gzip.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_length = getattr(settings, 'COMPRESSION_MIN_LENGTH', 200)
+        self.gzip_level = getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6)
+        self.brotli_quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 4)
+        self.max_random_bytes = getattr(settings, 'COMPRESSION_MAX_RANDOM_BYTES', 100)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    def should_compress(self, response):
+        if response.has_header('Content-Encoding'):
+            return False
+        content_type = response.get('Content-Type', '').lower()
+        if content_type.startswith(ALREADY_COMPRESSED_TYPES):
+            return False
+        if not response.streaming and len(response.content) < self.min_length:
+            return False
+        return True
+
+    def process_response(self, request, response):
+        if not self.should_compress(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        # get_token() flags the request when a page renders the CSRF token
+        has_csrf_token = request.META.get('CSRF_COOKIE_NEEDS_UPDATE', False)
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), allow_brotli=not has_csrf_token)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self.compress_async_stream(
+                    response.streaming_content, encoding
+                )
+            else:
+                response.streaming_content = self.compress_stream(
+                    response.streaming_content, encoding
+                )
+            # The compressed size isn't known until the stream is finished
+            del response.headers['Content-Length']
+        else:
+            compressed = compress_bytes(
+                response.content, encoding, self.gzip_level, self.brotli_quality, self.max_random_bytes
+            )
+            # Only use the compressed body if it actually saves bytes
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A strong ETag no longer matches the bytes on the wire, so make it weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def compress_stream(self, chunks, encoding):
+        compressor = Compressor(encoding, self.gzip_level, self.brotli_quality, self.max_random_bytes)
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+
+    async def compress_async_stream(self, chunks, encoding):
+        compressor = Compressor(encoding, self.gzip_level, self.brotli_quality, self.max_random_bytes)
+        async for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    AuthenticationMiddleware whose ``request.user`` comes from the per-process
+    user cache (APPS/user_manager/user_cache.py) when it can.
+    """
+
+    def process_request(self, request):
+        from APPS.user_manager.user_cache import get_user
+
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
+
+
+def get_request_store(request):
+    """The signed-in user's store, else the default store"""
+    from APPS.stores.models import default_store_id
+
+    user = getattr(request, 'user', None)
+    store_id = getattr(user, 'store_id', None) if user is not None and user.is_authenticated else None
+    return get_store(store_id or default_store_id())
+
+
+class CurrentStoreMiddleware:
+    """
+    Set ``request.store`` (looked up on first use) and route store-scoped
+    queries made while handling the request to that store's database.
+    Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.store = SimpleLazyObject(lambda: get_request_store(request))
+        with using_store(request.store):
+            return self.get_response(request)
+
+
+class ProfilingMiddleware:
+    """
+    Profile a request on demand (see profiling.py): staff users add an
+    ``X-Profile: 1`` header or ``?_profile=1``, and PROFILE_SAMPLE_RATE picks
+    a share of everyone's requests. Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILE_SAMPLE_RATE', 0.0)
+
+    def trigger(self, request):
+        if request.headers.get('X-Profile') == '1' or request.GET.get('_profile') == '1':
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_staff:
+                return 'requested'
+        if self.sample_rate and random.random() < self.sample_rate and not request.path.startswith('/admin/profiles/'):
+            return 'sampled'
+        return None
+
+    def __call__(self, request):
+        trigger = self.trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+        return run_profiled(self.get_response, request, trigger)
@@ -0,0 +1,174 @@
+"""
+On-demand profiles of single production requests.
+
+ProfilingMiddleware runs a request under cProfile when a staff user asks for
+it (``X-Profile: 1`` header or ``?_profile=1``) or when the request is picked
+by PROFILE_SAMPLE_RATE. Each profile is kept in PROFILE_DIR as a ``.prof``
+file (open it with pstats or snakeviz) next to a JSON summary: the request,
+its top functions and its SQL. Only the newest PROFILE_KEEP profiles are
+kept. They are listed at /admin/profiles/.
+"""
+import cProfile
+import json
+import os
+import pstats
+import re
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+TOP_FUNCTIONS = 30
+MAX_QUERIES = 1000
+
+re_profile_id = re.compile(r'^\d{8}-\d{6}-\d{6}-[0-9a-f]{8}$')
+
+
+def profile_root():
+    return Path(getattr(settings, 'PROFILE_DIR', Path(settings.BASE_DIR) / 'profiles'))
+
+
+class QueryLog:
+    """Database execute wrapper recording the SQL (without parameters) and time of every query"""
+
+    def __init__(self):
+        self.queries = []
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.seconds += elapsed
+            if len(self.queries) < MAX_QUERIES:
+                self.queries.append({
+                    'database': context['connection'].alias,
+                    'sql': sql,
+                    'many': many,
+                    'ms': round(elapsed * 1000, 3),
+                })
+
+    def record(self):
+        """Context manager logging queries on every database"""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+
+def short_path(filename):
+    """A source file relative to the project or site-packages, to keep the tables readable"""
+    for root in (str(settings.BASE_DIR), 'site-packages'):
+        index = filename.find(root)
+        if index != -1:
+            return filename[index + len(root):].lstrip(os.sep)
+    return filename
+
+
+def top_functions(stats, by='cumulative', limit=TOP_FUNCTIONS):
+    """The functions with the most cumulative time, or with the most time spent in themselves (``by='own'``)"""
+    column = 3 if by == 'cumulative' else 2
+    rows = sorted(stats.items(), key=lambda entry: entry[1][column], reverse=True)[:limit]
+    return [
+        {
+            'function': f"{short_path(filename)}:{line}({name})" if line else name,
+            'calls': calls,
+            'own_ms': round(own * 1000, 2),
+            'cumulative_ms': round(cumulative * 1000, 2),
+        }
+        for (filename, line, name), (_, calls, own, cumulative, _) in rows
+    ]
+
+
+def save_profile(profiler, summary):
+    """Store a profile and its summary, drop the oldest beyond PROFILE_KEEP, and return its id"""
+    root = profile_root()
+    root.mkdir(parents=True, exist_ok=True)
+    profile_id = f"{datetime.now(dt_timezone.utc):%Y%m%d-%H%M%S-%f}-{uuid.uuid4().hex[:8]}"
+    stats = pstats.Stats(profiler).stats
+    summary = {
+        'id': profile_id,
+        **summary,
+        'functions': top_functions(stats),
+        'hotspots': top_functions(stats, by='own', limit=10),
+    }
+
+    # Written under temporary names first, so the list never shows half a profile
+    temp_prof = root / f'.{profile_id}.prof.tmp'
+    temp_json = root / f'.{profile_id}.json.tmp'
+    profiler.dump_stats(temp_prof)
+    temp_json.write_text(json.dumps(summary))
+    os.replace(temp_prof, root / f'{profile_id}.prof')
+    os.replace(temp_json, root / f'{profile_id}.json')
+
+    for old in profile_ids()[getattr(settings, 'PROFILE_KEEP', 100):]:
+        for suffix in ('.json', '.prof'):
+            (root / f'{old}{suffix}').unlink(missing_ok=True)
+    return profile_id
+
+
+def profile_ids():
+    """Ids of the stored profiles, newest first"""
+    root = profile_root()
+    if not root.is_dir():
+        return []
+    return sorted((path.stem for path in root.glob('*.json')), reverse=True)
+
+
+def load_summary(profile_id):
+    if not re_profile_id.match(profile_id):
+        return None
+    try:
+        return json.loads((profile_root() / f'{profile_id}.json').read_text())
+    except (OSError, ValueError):
+        return None  # Dropped from the ring buffer meanwhile
+
+
+def profile_path(profile_id):
+    if not re_profile_id.match(profile_id):
+        return None
+    path = profile_root() / f'{profile_id}.prof'
+    return path if path.is_file() else None
+
+
+def run_profiled(get_response, request, trigger):
+    """Handle a request under cProfile and store the profile; the response gets its id in X-Profile-Id"""
+    profiler = cProfile.Profile()
+    query_log = QueryLog()
+    try:
+        profiler.enable()
+    except ValueError:
+        return get_response(request)  # Another request in this process is being profiled
+
+    start = time.perf_counter()
+    try:
+        with query_log.record():
+            response = get_response(request)
+    finally:
+        profiler.disable()
+    elapsed = time.perf_counter() - start
+
+    user = getattr(request, 'user', None)
+    profile_id = save_profile(profiler, {
+        'created_at': timezone.now().isoformat(),
+        'method': request.method,
+        'path': request.get_full_path(),
+        'user': user.get_username() if user is not None and user.is_authenticated else '',
+        'status': response.status_code,
+        'trigger': trigger,
+        'ms': round(elapsed * 1000, 1),
+        'query_count': query_log.count,
+        'query_ms': round(query_log.seconds * 1000, 1),
+        'queries': query_log.queries,
+    })
+    response['X-Profile-Id'] = profile_id
+    return response
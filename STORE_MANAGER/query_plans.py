@@ -0,0 +1,97 @@
+"""
+Query plan checks for tests.
+
+Captures the SQL a code path runs, asks the database how it would execute each
+statement (EXPLAIN QUERY PLAN on SQLite, EXPLAIN on PostgreSQL) and reports
+full scans of tables that grow with the business. On SQLite every SCAN is a
+full scan, including walks of a whole index (USING INDEX, USING COVERING
+INDEX); only SEARCH reads part of a table. Statements that really need to read
+everything are listed explicitly with ``allow``.
+
+PostgreSQL plans are taken as the planner makes them, with fresh statistics
+(ANALYZE) but no changed settings, so a test needs enough rows for an index to
+beat a sequential scan.
+"""
+import re
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Tables that grow with sales, stock and repairs; scanning them gets slower every month
+LARGE_TABLES = {
+    'inventory_item',
+    'inventory_sale',
+    'inventory_salesummary',
+    'inventory_stockalert',
+    'inventory_stockforecast',
+    'repair_tracker_repair',
+    'repair_tracker_revenue',
+}
+
+EXPLAINED = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+# Any SCAN, also USING (COVERING) INDEX; SEARCH lines look up part of a table
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?"?(\w+)"?')
+POSTGRES_FULL_SCAN = re.compile(r'Seq Scan on "?(\w+)"?')
+TABLE_ALIAS = re.compile(r'"(\w+)" (?:AS )?"?([A-Z]\d+)"?')
+
+
+def explain(sql):
+    """The lines of the database's plan for a statement"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN {sql}')
+            return [row[0] for row in cursor.fetchall()]
+    raise NotImplementedError(f"Query plans aren't supported on {connection.vendor}")
+
+
+def analyze():
+    """Refresh PostgreSQL's statistics of the large tables, so plans reflect the rows a test created"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {", ".join(sorted(LARGE_TABLES))}')
+
+
+def full_scans(sql):
+    """Large tables a statement reads in full"""
+    # SQLite names subquery tables by their alias (U0, T3, ...) in the plan
+    aliases = {alias: table for table, alias in TABLE_ALIAS.findall(sql)}
+    scanned = set()
+    for line in explain(sql):
+        if connection.vendor == 'sqlite':
+            match = SQLITE_FULL_SCAN.match(line.strip())
+        else:
+            match = POSTGRES_FULL_SCAN.search(line)
+        if match:
+            scanned.add(aliases.get(match.group(1), match.group(1)))
+    return scanned & LARGE_TABLES
+
+
+class QueryPlanTestMixin:
+    """TestCase mixin with an assertion that a code path doesn't scan large tables"""
+
+    def assertNoFullScans(self, func, allow=()):
+        """
+        Run ``func`` and fail if any statement it issues scans a large table.
+
+        ``allow`` lists (table, SQL fragment) pairs: a scan of the table is
+        accepted in statements that contain the fragment.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            result = func()
+
+        analyze()
+        problems = []
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith(EXPLAINED):
+                continue
+            for table in sorted(full_scans(sql)):
+                if not any(table == allowed and fragment in sql for allowed, fragment in allow):
+                    problems.append(f"full scan of {table}:\n    {sql}")
+        if problems:
+            self.fail("Unexpected full table scans:\n" + "\n".join(problems))
+        return result
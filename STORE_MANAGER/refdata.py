@@ -0,0 +1,121 @@
+"""
+Per-process cache of small reference tables (categories, stores).
+
+Almost every page shows the category dropdown, and every routed query needs
+its store, yet these tables change a few times a month. Each worker loads a
+table once and keeps it in memory, so rendering them costs no queries.
+
+Writes stamp a new version in the shared Django cache (CACHES) once their
+transaction commits. A worker compares its copy's version with the shared one
+at most every REFDATA_CHECK_INTERVAL seconds and reloads when they differ;
+the worker that made the write drops its copy at once. With several workers,
+CACHES must be a shared backend (Redis, Memcached) for them to see each
+other's writes; the default local-memory cache is only shared within one
+process.
+"""
+import time
+import uuid
+
+from django import forms
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.forms.models import ModelChoiceIterator
+
+
+class ReferenceTable:
+    """A cached table split by key (e.g. store id); ``load(key)`` reads one key's data from the database"""
+
+    def __init__(self, name, load):
+        self.name = name
+        self.load = load
+        self._entries = {}  # key -> (version, checked_at, data)
+
+    def version_key(self, key):
+        return f'refdata:{self.name}:{key}'
+
+    def shared_version(self, key):
+        version_key = self.version_key(key)
+        version = cache.get(version_key)
+        if version is None:
+            # First use, or evicted from the cache: start a new version, which makes every worker reload
+            cache.add(version_key, uuid.uuid4().hex, None)
+            version = cache.get(version_key)
+        return version
+
+    def get(self, key):
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and now - entry[1] < getattr(settings, 'REFDATA_CHECK_INTERVAL', 2):
+            return entry[2]
+
+        # Read the version before the data, so a write in between makes the next check reload
+        version = self.shared_version(key)
+        if entry is not None and entry[0] == version:
+            data = entry[2]
+        else:
+            data = self.load(key)
+        self._entries[key] = (version, now, data)
+        return data
+
+    def invalidate(self, key, using=None):
+        """Drop a key's data here now, and in every worker once the current transaction commits"""
+        self._entries.pop(key, None)
+
+        def bump():
+            self._entries.pop(key, None)
+            cache.set(self.version_key(key), uuid.uuid4().hex, None)
+
+        transaction.on_commit(bump, using=using)
+
+    def clear(self):
+        """Forget everything loaded in this process (for tests that bulk-load rows)"""
+        self._entries.clear()
+
+
+class ReferenceChoiceIterator(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in self.field.objects:
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.objects) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.objects)
+
+
+class ReferenceChoiceField(forms.ModelChoiceField):
+    """A ModelChoiceField over a list of cached objects: rendering and validating it run no queries"""
+    iterator = ReferenceChoiceIterator
+
+    def __init__(self, objects=(), **kwargs):
+        super().__init__(queryset=None, **kwargs)
+        self.objects = objects
+
+    @property
+    def objects(self):
+        return self._objects
+
+    @objects.setter
+    def objects(self, objects):
+        self._objects = list(objects)
+        self.widget.choices = self.choices
+
+    def __deepcopy__(self, memo):
+        result = super().__deepcopy__(memo)
+        result.objects = self._objects  # Points the copied widget's choices at the copy
+        return result
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if hasattr(value, '_meta'):
+            value = value.pk
+        for obj in self._objects:
+            if str(obj.pk) == str(value):
+                return obj
+        raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value})
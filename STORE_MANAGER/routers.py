@@ -0,0 +1,85 @@
+"""
+Database routing by store.
+
+When STORE_DATABASES adds database aliases, each store's inventory, repair and
+ledger rows live in the database named by its ``database`` field, so one deployment
+can spread branches over several databases. Users, sessions and the Store
+table itself stay on the default database (a copy of each Store row is kept on
+the store's own database for the foreign keys).
+
+The store for a query comes from the instance being saved (``obj.save()``) or,
+for querysets (including ``objects.create()``), from the current store: set per
+request by CurrentStoreMiddleware, or with ``using_store()`` in scripts and
+commands.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS
+
+from .refdata import ReferenceTable
+
+STORE_APPS = {'inventory', 'repair_tracker', 'report'}
+
+_current_store = ContextVar('current_store', default=None)
+
+
+def load_store(store_id):
+    from APPS.stores.models import Store
+    return Store.objects.using(DEFAULT_DB_ALIAS).get(pk=store_id)
+
+
+# Stores are created and changed rarely; every routed query needs one
+stores = ReferenceTable('stores', load_store)
+
+
+def current_store():
+    return _current_store.get()
+
+
+@contextmanager
+def using_store(store):
+    """Route store-scoped queries to ``store``'s database inside the block"""
+    token = _current_store.set(store)
+    try:
+        yield store
+    finally:
+        _current_store.reset(token)
+
+
+def get_store(store_id):
+    """A Store by id, from the reference data cache"""
+    return stores.get(store_id)
+
+
+def database_for_store(store_id):
+    return get_store(store_id).database
+
+
+def forget_store(store_id):
+    stores.invalidate(store_id, using=DEFAULT_DB_ALIAS)
+
+
+class StoreRouter:
+    def database(self, model, instance=None):
+        if model._meta.app_label not in STORE_APPS:
+            return None
+        store_id = getattr(instance, 'store_id', None)
+        if store_id is not None:
+            return database_for_store(store_id)
+        store = current_store()
+        if store is not None:
+            return store.database
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self.database(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self.database(model, hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Rows of the same store share a database; Store rows exist on every store database
+        if obj1._meta.app_label == 'stores' or obj2._meta.app_label == 'stores':
+            return True
+        return None
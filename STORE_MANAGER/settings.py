@@ -22,21 +22,92 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'APPS.stores',
     'APPS.inventory',
     'APPS.repair_tracker',
-    # 'APPS.report',
+    'APPS.report',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'STORE_MANAGER.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'STORE_MANAGER.middleware.CachedAuthenticationMiddleware',
+    'STORE_MANAGER.middleware.ProfilingMiddleware',
+    'STORE_MANAGER.middleware.CurrentStoreMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Sessions are read from the cache and written through to the database, so a signed-in page view reads no
+# session row. 'django.contrib.sessions.backends.cache' also skips the writes at login, but then sessions only
+# last as long as the cache: use it with a persistent shared CACHES (Redis).
+SESSION_ENGINE = os.getenv('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+# In-process cache of signed-in users (entries per worker, seconds before a reload; 0 to turn it off)
+AUTH_USER_CACHE_SIZE = int(os.getenv('AUTH_USER_CACHE_SIZE', 1024))
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', 30))
+# A user's last_login is written at most once per this many seconds
+LAST_LOGIN_UPDATE_INTERVAL = int(os.getenv('LAST_LOGIN_UPDATE_INTERVAL', 3600))
+
+# Response compression (Brotli preferred, gzip as fallback)
+COMPRESSION_MIN_LENGTH = int(os.getenv('COMPRESSION_MIN_LENGTH', 200))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))  # 1-9
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 4))  # 0-11
+# gzip output is padded with up to this many random bytes against BREACH (0 turns it off)
+COMPRESSION_MAX_RANDOM_BYTES = int(os.getenv('COMPRESSION_MAX_RANDOM_BYTES', 100))
+
+# PDF reports: 'auto' switches to the low-memory platypus engine for large reports
+PDF_RENDERER = os.getenv('PDF_RENDERER', 'auto')  # auto, xhtml2pdf or platypus
+PDF_LARGE_REPORT_ROWS = int(os.getenv('PDF_LARGE_REPORT_ROWS', 1000))
+
+# Customers' phone numbers are stored without it ('+254712...' becomes '0712...') so any spelling finds them
+PHONE_COUNTRY_CODE = os.getenv('PHONE_COUNTRY_CODE', '254')
+
+# Largest number of sales a till may replay in one batch request
+SALE_BATCH_MAX_SIZE = int(os.getenv('SALE_BATCH_MAX_SIZE', 500))
+
+# In-process cache of scanned SKUs (entries per worker, seconds before a refresh)
+SKU_CACHE_SIZE = int(os.getenv('SKU_CACHE_SIZE', 1024))
+SKU_CACHE_TTL = int(os.getenv('SKU_CACHE_TTL', 30))
+
+# In-process copies of small reference tables (categories, stores): seconds between checks of their version
+# in the shared cache. Workers only see each other's changes when CACHES is shared (e.g. Redis).
+REFDATA_CHECK_INTERVAL = float(os.getenv('REFDATA_CHECK_INTERVAL', 2))
+
+# ETag/Last-Modified on reports and the dashboard, from per-store "last change" watermarks in the shared cache.
+# Off by default: with more than one worker process this needs a shared CACHES, or workers answer 304 for each
+# other's writes (a system check warns when it is on with the per-process default cache).
+CONDITIONAL_REQUESTS = os.getenv('CONDITIONAL_REQUESTS', 'False') == 'True'
+# Part of every ETag, so a deploy (new templates) never serves a cached page
+RELEASE_ID = os.getenv('RELEASE_ID', os.getenv('RENDER_GIT_COMMIT', ''))
+
+# Stock forecasting (python manage.py forecast_stock), all values in days
+FORECAST_HISTORY_DAYS = int(os.getenv('FORECAST_HISTORY_DAYS', 730))
+FORECAST_HALF_LIFE_DAYS = int(os.getenv('FORECAST_HALF_LIFE_DAYS', 14))  # weight of a day's sales halves every N days
+FORECAST_LEAD_TIME_DAYS = int(os.getenv('FORECAST_LEAD_TIME_DAYS', 7))  # supplier delivery time
+FORECAST_SAFETY_DAYS = int(os.getenv('FORECAST_SAFETY_DAYS', 3))
+FORECAST_COVER_DAYS = int(os.getenv('FORECAST_COVER_DAYS', 14))  # stock a reorder should last for
+
+# Inventory analytics: ABC class boundaries (cumulative revenue share) and cache lifetime
+ABC_A_SHARE = float(os.getenv('ABC_A_SHARE', 0.8))
+ABC_B_SHARE = float(os.getenv('ABC_B_SHARE', 0.95))
+ANALYTICS_CACHE_TIMEOUT = int(os.getenv('ANALYTICS_CACHE_TIMEOUT', 300))
+TURNAROUND_CACHE_TIMEOUT = int(os.getenv('TURNAROUND_CACHE_TIMEOUT', 300))
+
+# History archival (python manage.py archive_history / restore_history)
+ARCHIVE_DIR = Path(os.getenv('ARCHIVE_DIR', BASE_DIR / 'archive'))
+ARCHIVE_HORIZON_DAYS = int(os.getenv('ARCHIVE_HORIZON_DAYS', 365))  # keep at least this much history live
+
+# Store backups (python manage.py backup_store / restore_store)
+BACKUP_DIR = Path(os.getenv('BACKUP_DIR', BASE_DIR / 'backups'))
+
+# Request profiling (see STORE_MANAGER/profiling.py; profiles are listed at /admin/profiles/)
+PROFILE_DIR = Path(os.getenv('PROFILE_DIR', BASE_DIR / 'profiles'))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 100))  # newest profiles kept on disk
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0.0))  # share of all requests profiled, e.g. 0.001
+
 ROOT_URLCONF = 'STORE_MANAGER.urls'
 
 TEMPLATES = [
@@ -70,6 +141,18 @@ DATABASES = {
     }
 }
 
+# Stores (branches): rows without a store belong to the default one. To give stores their own database,
+# list extra SQLite databases as STORE_DATABASES="branch2=/srv/branch2.sqlite3,branch3=/srv/branch3.sqlite3"
+# and set each Store's database field to one of the aliases (migrate every alias with --database).
+DEFAULT_STORE_CODE = os.getenv('DEFAULT_STORE_CODE', 'main')
+STORE_DATABASES = dict(
+    entry.split('=', 1) for entry in os.getenv('STORE_DATABASES', '').split(',') if entry.strip()
+)
+for alias, name in STORE_DATABASES.items():
+    DATABASES[alias.strip()] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': name.strip()}
+if STORE_DATABASES:
+    DATABASE_ROUTERS = ['STORE_MANAGER.routers.StoreRouter']
+
 
 
 # Password validation
@@ -0,0 +1,220 @@
+import asyncio
+import gzip
+import tempfile
+from decimal import Decimal
+from io import BytesIO
+
+import pypdf
+from django.http import HttpResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from APPS.inventory.models import Category, Item, Sale
+from APPS.user_manager.models import CustomUser
+
+from .middleware import CompressionMiddleware, brotli, choose_encoding
+from .pdf import FlowableStream, PDFReport, PlatypusRenderer, XHTML2PDFRenderer, get_renderer, render_pdf_response
+from .profiling import profile_ids
+from .watermarks import check_shared_cache
+
+
+def read_pdf(response):
+    return pypdf.PdfReader(BytesIO(response.content))
+
+
+class PDFTests(SimpleTestCase):
+    """The platypus engine draws large reports page by page, and 'auto' picks it past the row threshold"""
+
+    def report(self, rows):
+        return PDFReport(
+            title='Sales Report', template_name='inventory/report_pdf.html', context={'sales': []},
+            columns=['Item', 'Quantity', 'Profit'], rows=iter(rows), row_count=len(rows),
+            totals=[('Total Profit', 'Ksh 600.00')],
+        )
+
+    def test_platypus_pages(self):
+        rows = [(f'Item {i}', 1, Decimal('1.00')) for i in range(600)]
+        pdf = read_pdf(render_pdf_response(self.report(rows), 'report.pdf', engine='platypus'))
+        self.assertIn('ReportLab', pdf.metadata.producer)
+        self.assertGreater(len(pdf.pages), 1)
+        self.assertIn('Total Profit', pdf.pages[0].extract_text())
+        self.assertIn('Item 599', pdf.pages[-1].extract_text())
+
+    def test_platypus_empty_report(self):
+        pdf = read_pdf(render_pdf_response(self.report([]), 'report.pdf', engine='platypus'))
+        self.assertEqual(len(pdf.pages), 1)
+        self.assertIn('No records found.', pdf.pages[0].extract_text())
+
+    def test_flowables_are_pulled_on_demand(self):
+        pulled = []
+
+        def flowables():
+            for i in range(10):
+                pulled.append(i)
+                yield i
+
+        stream = FlowableStream(flowables(), lookahead=2)
+        self.assertEqual(len(stream), 2)
+        self.assertEqual(pulled, [0, 1])
+        stream.pop(0)
+        self.assertEqual(len(stream), 2)
+        self.assertEqual(pulled, [0, 1, 2])
+
+    @override_settings(PDF_RENDERER='auto', PDF_LARGE_REPORT_ROWS=100)
+    def test_auto_switches_past_the_threshold(self):
+        self.assertIsInstance(get_renderer(self.report([('Item', 1, 1)] * 100)), XHTML2PDFRenderer)
+        self.assertIsInstance(get_renderer(self.report([('Item', 1, 1)] * 101)), PlatypusRenderer)
+        self.assertIsInstance(get_renderer(self.report([]), engine='platypus'), PlatypusRenderer)
+
+
+class PDFDownloadTests(TestCase):
+    """Report downloads render large reports with platypus"""
+
+    def setUp(self):
+        category = Category.objects.create(name='Cables')
+        item = Item.objects.create(name='Cable', category=category, buying_price=Decimal('50.00'),
+                                   selling_price=Decimal('80.00'), quantity=1000)
+        Sale.objects.bulk_create(Sale(item=item, quantity_sold=1, selling_price=Decimal('80.00')) for _ in range(300))
+
+    def test_auto_engine(self):
+        url = reverse('download_report', args=['daily'])
+        with self.settings(PDF_RENDERER='auto', PDF_LARGE_REPORT_ROWS=100):
+            pdf = read_pdf(self.client.get(url))
+        self.assertIn('ReportLab', pdf.metadata.producer)
+        self.assertGreater(len(pdf.pages), 1)
+
+        with self.settings(PDF_RENDERER='auto', PDF_LARGE_REPORT_ROWS=1000):
+            pdf = read_pdf(self.client.get(url))
+        self.assertIn('xhtml2pdf', pdf.metadata.producer)
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    """Conditional requests warn when the watermarks would live in a per-process cache"""
+
+    def test_check(self):
+        with self.settings(CONDITIONAL_REQUESTS=False):
+            self.assertEqual(check_shared_cache(None), [])
+        with self.settings(CONDITIONAL_REQUESTS=True):
+            self.assertEqual([warning.id for warning in check_shared_cache(None)], ['store_manager.W001'])
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost'}}
+        with self.settings(CONDITIONAL_REQUESTS=True, CACHES=redis):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class CompressionTests(SimpleTestCase):
+    """Responses are compressed as the client asks, and gzip sizes are padded against BREACH"""
+
+    body = ('<tr><td>Charger</td><td>Ksh 150.00</td></tr>' * 50).encode()
+
+    def respond(self, response, accept='gzip, deflate, br', view=None):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(view or (lambda request: response))(request)
+
+    def test_negotiation(self):
+        self.assertEqual(choose_encoding('gzip, deflate, br'), 'br')
+        self.assertEqual(choose_encoding('br;q=0.5, gzip'), 'gzip')
+        self.assertEqual(choose_encoding('br;q=0, gzip;q=0.1'), 'gzip')
+        self.assertIsNone(choose_encoding('br;q=0, gzip;q=0'))
+        self.assertIsNone(choose_encoding('identity'))
+        self.assertEqual(choose_encoding('*'), 'br')
+        self.assertEqual(choose_encoding('*;q=0.5, gzip'), 'gzip')
+        self.assertIsNone(choose_encoding('*;q=0'))
+        self.assertEqual(choose_encoding('br, gzip', allow_brotli=False), 'gzip')
+
+    def test_compressed_body(self):
+        for accept, decompress in (('br', brotli.decompress), ('gzip', gzip.decompress)):
+            response = HttpResponse(self.body)
+            response['ETag'] = '"abc"'
+            response = self.respond(response, accept)
+            self.assertEqual(response['Content-Encoding'], accept)
+            self.assertEqual(decompress(response.content), self.body)
+            self.assertEqual(response['Content-Length'], str(len(response.content)))
+            self.assertEqual(response['ETag'], 'W/"abc"')
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+        response = self.respond(HttpResponse(self.body), accept='identity')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_left_alone(self):
+        for response in (
+            HttpResponse(b'<p>Too small to bother</p>'),
+            HttpResponse(self.body, content_type='application/pdf'),
+            HttpResponse(self.body, headers={'Content-Encoding': 'gzip'}),
+        ):
+            encoding, content = response.get('Content-Encoding'), response.content
+            response = self.respond(response)
+            self.assertEqual((response.get('Content-Encoding'), response.content), (encoding, content))
+            self.assertNotIn('Vary', response)
+
+    def test_streams(self):
+        chunks = [self.body[i:i + 500] for i in range(0, len(self.body), 500)]
+        response = self.respond(StreamingHttpResponse(iter(chunks), headers={'Content-Length': len(self.body)}), 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response)
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.body)
+
+        async def stream():
+            for chunk in chunks:
+                yield chunk
+
+        async def read(response):
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        response = self.respond(StreamingHttpResponse(stream()), 'br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(asyncio.run(read(response))), self.body)
+
+    def test_gzip_length_is_random(self):
+        sizes = {len(self.respond(HttpResponse(self.body), 'gzip').content) for _ in range(20)}
+        self.assertGreater(len(sizes), 1)
+        with self.settings(COMPRESSION_MAX_RANDOM_BYTES=0):
+            sizes = {len(self.respond(HttpResponse(self.body), 'gzip').content) for _ in range(5)}
+        self.assertEqual(len(sizes), 1)
+
+    def test_pages_with_csrf_token_are_not_brotli(self):
+        def view(request):
+            return HttpResponse(self.body + get_token(request).encode())
+
+        response = self.respond(None, view=view)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(gzip.decompress(response.content).startswith(self.body))
+
+
+class ProfilingTests(TestCase):
+    """Staff can profile a request on demand and browse the stored profiles"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(PROFILE_DIR=directory.name, PROFILE_KEEP=2)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.staff = CustomUser.objects.create_user(username='admin', password='pw', is_staff=True)
+        self.cashier = CustomUser.objects.create_user(username='cashier', password='pw')
+
+    def test_staff_request_is_profiled(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('item_list'), {'_profile': '1'})
+        profile_id = response['X-Profile-Id']
+        self.assertEqual(profile_ids(), [profile_id])
+
+        response = self.client.get(reverse('profile_detail', args=[profile_id]))
+        self.assertContains(response, '/inventory/items/?_profile=1')
+        self.assertContains(response, 'inventory_item')
+        response = self.client.get(reverse('profile_download', args=[profile_id]))
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="{profile_id}.prof"')
+
+    def test_only_newest_profiles_are_kept(self):
+        self.client.force_login(self.staff)
+        ids = [self.client.get(reverse('dashboard'), HTTP_X_PROFILE='1')['X-Profile-Id'] for _ in range(3)]
+        self.assertEqual(profile_ids(), [ids[2], ids[1]])
+        self.assertContains(self.client.get(reverse('profile_list')), ids[-1])
+
+    def test_other_users_cannot_profile(self):
+        self.client.force_login(self.cashier)
+        response = self.client.get(reverse('item_list'), {'_profile': '1'})
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(profile_ids(), [])
+        self.assertEqual(self.client.get(reverse('profile_list')).status_code, 302)
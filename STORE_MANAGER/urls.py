@@ -17,14 +17,16 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from .views import profile_detail_view, profile_download_view, profile_list_view
+
 urlpatterns = [
+    # Ahead of the admin site, which would otherwise claim these URLs
+    path('admin/profiles/', profile_list_view, name='profile_list'),
+    path('admin/profiles/<str:profile_id>/', profile_detail_view, name='profile_detail'),
+    path('admin/profiles/<str:profile_id>/download/', profile_download_view, name='profile_download'),
     path('admin/', admin.site.urls),
     path('', include('APPS.user_manager.urls')),
     path('inventory/', include('APPS.inventory.urls')),
     path('repairs/', include('APPS.repair_tracker.urls')),
-    # path('report/', include('APPS.report.urls')),
-
-
-
-
+    path('report/', include('APPS.report.urls')),
 ]
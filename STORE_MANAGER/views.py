@@ -0,0 +1,37 @@
+"""Admin pages for the stored request profiles (see profiling.py)"""
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+
+from .profiling import load_summary, profile_ids, profile_path
+
+
+@staff_member_required
+def profile_list_view(request):
+    profiles = [summary for summary in map(load_summary, profile_ids()) if summary is not None]
+    return render(request, 'admin/profiles/profile_list.html', {
+        **admin.site.each_context(request),
+        'title': 'Request profiles',
+        'profiles': profiles,
+    })
+
+
+@staff_member_required
+def profile_detail_view(request, profile_id):
+    summary = load_summary(profile_id)
+    if summary is None:
+        raise Http404("No such profile.")
+    return render(request, 'admin/profiles/profile_detail.html', {
+        **admin.site.each_context(request),
+        'title': f"{summary['method']} {summary['path']}",
+        'profile': summary,
+    })
+
+
+@staff_member_required
+def profile_download_view(request, profile_id):
+    path = profile_path(profile_id)
+    if path is None:
+        raise Http404("No such profile.")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=f'{profile_id}.prof')
@@ -0,0 +1,135 @@
+"""
+"Last change" watermarks for HTTP conditional requests.
+
+Every store has a watermark per domain (sales, items, repairs): the time its
+data last changed, kept in the shared Django cache (CACHES) and moved forward
+by ``touch()`` when a write commits. Report and dashboard views are wrapped in
+``conditional()``, which turns the watermarks they read into ETag and
+Last-Modified headers and answers a browser revalidating an unchanged page
+with 304 Not Modified before the view runs a single query.
+
+Saves go through signals (inventory/signals.py, repair_tracker/signals.py);
+code that writes with update(), bulk_create() or a queryset delete() calls
+``touch()`` itself. A lost watermark (cache flush or eviction) restarts at the
+current time, which only costs one full response per client.
+
+Watermarks must be shared by every worker process, so CONDITIONAL_REQUESTS is
+off by default and a system check warns when it is on with a per-process cache.
+"""
+import hashlib
+import time
+from datetime import datetime
+from functools import wraps
+
+from django.conf import settings
+from django.core import checks
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+DOMAINS = ('sales', 'items', 'repairs')
+
+ALL_STORES = '*'
+
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES['default']['BACKEND']
+    if getattr(settings, 'CONDITIONAL_REQUESTS', False) and backend in PER_PROCESS_CACHES:
+        return [checks.Warning(
+            f'CONDITIONAL_REQUESTS is on, but the default cache ({backend}) is not shared between processes.',
+            hint='With more than one worker, configure a shared CACHES backend (e.g. Redis) or pages may be '
+                 'answered with 304 Not Modified after another worker changed their data.',
+            id='store_manager.W001',
+        )]
+    return []
+
+
+def watermark_key(domain, store_id):
+    return f'watermark:{domain}:{store_id}'
+
+
+def touch(domain, store_id=None, using=None):
+    """Move a store's watermark (every store's without ``store_id``) to now, once the current transaction commits"""
+    key = watermark_key(domain, ALL_STORES if store_id is None else store_id)
+    transaction.on_commit(lambda: cache.set(key, time.time(), None), using=using)
+
+
+def watermark(domains, store_id):
+    """The time (epoch seconds) the store's data in ``domains`` last changed"""
+    keys = [watermark_key(domain, scope) for domain in domains for scope in (store_id, ALL_STORES)]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            # Unknown (first use, or evicted): treat it as changed just now
+            cache.add(key, time.time(), None)
+            values[key] = cache.get(key, time.time())
+    return max(values.values())
+
+
+def validators(request, domains, extra):
+    """(ETag, Last-Modified) of a view's response for this request, or (None, None) if it mustn't be revalidated"""
+    if not hasattr(request, '_watermark_validators'):
+        if len(get_messages(request)):
+            # The page would show messages waiting for this user; a 304 would swallow them
+            request._watermark_validators = (None, None)
+        else:
+            changed = watermark(domains, request.store.pk)
+            # Reports cover periods up to today: a new day changes them even without writes
+            midnight = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+            last_modified = max(datetime.fromtimestamp(changed, timezone.get_current_timezone()), midnight)
+            user = request.user
+            parts = [
+                getattr(settings, 'RELEASE_ID', ''),
+                request.store.pk,
+                user.pk if user.is_authenticated else '',
+                repr(changed),
+                midnight.date().isoformat(),
+                extra,
+            ]
+            etag = hashlib.sha1('|'.join(map(str, parts)).encode()).hexdigest()
+            request._watermark_validators = (etag, last_modified)
+    return request._watermark_validators
+
+
+def conditional(*domains, key=None):
+    """
+    Decorator for views whose output only depends on a store's ``domains``
+    (and on ``key(request, *args, **kwargs)``, e.g. a requested timeframe).
+
+    Responses are marked private (they show the user's store) and must be
+    revalidated on every use, which is cheap: unchanged pages come back as 304.
+    """
+    def extra(request, *args, **kwargs):
+        return key(request, *args, **kwargs) if key else ''
+
+    def etag_func(request, *args, **kwargs):
+        return validators(request, domains, extra(request, *args, **kwargs))[0]
+
+    def last_modified_func(request, *args, **kwargs):
+        return validators(request, domains, extra(request, *args, **kwargs))[1]
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not getattr(settings, 'CONDITIONAL_REQUESTS', False):
+                return view(request, *args, **kwargs)
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                patch_cache_control(response, private=True, no_cache=True)
+                patch_vary_headers(response, ['Cookie'])
+            return response
+
+        return wrapper
+
+    return decorator
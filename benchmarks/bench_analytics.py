@@ -0,0 +1,84 @@
+"""
+Time the top-sellers / ABC analytics against a large sales table.
+
+Usage:
+    python benchmarks/bench_analytics.py [--items 5000] [--sales 1000000] [--days 730]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'STORE_MANAGER.settings')
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+import django
+
+django.setup()
+
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from APPS.inventory.analytics import compute_analytics, get_analytics
+from APPS.inventory.models import Category, Item, Sale
+from APPS.stores.models import get_default_store
+
+
+def seed(items, sales, days):
+    rng = random.Random(1)
+    categories = Category.objects.bulk_create([Category(name=f'Category {i}') for i in range(20)])
+    Item.objects.bulk_create(
+        (Item(name=f'Item {i}', category=categories[i % len(categories)], buying_price=Decimal('100.00'),
+              selling_price=Decimal('150.00'), quantity=rng.randrange(0, 100))
+         for i in range(items)),
+        batch_size=5000,
+    )
+    item_ids = list(Item.objects.values_list('pk', flat=True))
+    # Skewed demand so the ABC classes are realistic
+    weights = [1 / (rank + 1) for rank in range(len(item_ids))]
+    now = timezone.now()
+    chosen = rng.choices(item_ids, weights, k=sales)
+    Sale.objects.bulk_create(
+        (Sale(item_id=chosen[i], quantity_sold=1 + i % 3, selling_price=Decimal('150.00'),
+              sold_at=now - timedelta(seconds=rng.randrange(days * 86400)))
+         for i in range(sales)),
+        batch_size=5000,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--sales', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=730)
+    args = parser.parse_args()
+
+    connection.creation.create_test_db(verbosity=0)
+    start = time.perf_counter()
+    seed(args.items, args.sales, args.days)
+    print(f"seeded {args.items} items and {args.sales} sales in {time.perf_counter() - start:.1f}s")
+
+    store = get_default_store()
+    today = timezone.localdate()
+    for label, days in (('last 7 days', 7), ('last 30 days', 30), ('last year', 365)):
+        start_date = today - timedelta(days=days - 1)
+        start = time.perf_counter()
+        result = compute_analytics(start_date, today, store)
+        cold = time.perf_counter() - start
+        cache.clear()
+        get_analytics(start_date, today, store)
+        start = time.perf_counter()
+        get_analytics(start_date, today, store)
+        cached = time.perf_counter() - start
+        print(f"{label:<14} {len(result['items']):>6} items sold   cold {cold * 1000:8.1f} ms   cached {cached * 1000:6.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Compare backup_store/restore_store with dumpdata/loaddata on a large store: seconds, file size and peak RSS.
+
+Each step runs in its own process against a fresh test database, so peak RSS
+reflects that step alone. The dump steps seed the store first (not timed); the
+load steps load the files the dump steps wrote into an empty store.
+
+Usage:
+    python benchmarks/bench_backup.py [--items 5000] [--sales 500000] [--repairs 20000]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'STORE_MANAGER.settings')
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+STEPS = ['dumpdata', 'backup_store', 'loaddata', 'restore_store']
+DUMP_APPS = ['inventory', 'repair_tracker']
+
+
+def seed(items, sales, repairs):
+    from datetime import timedelta
+    from decimal import Decimal
+
+    from django.utils import timezone
+
+    from APPS.inventory.models import Category, Item, Sale
+    from APPS.repair_tracker.models import Repair, Revenue
+
+    category = Category.objects.create(name='Accessories')
+    item_objs = Item.objects.bulk_create(
+        (Item(name=f'Item {i}', sku=f'{800000000000 + i}', category=category, buying_price=Decimal('100.00'),
+              selling_price=Decimal('150.00'), quantity=1000)
+         for i in range(items)),
+        batch_size=5000,
+    )
+    now = timezone.now()
+    # In chunks, so seeding doesn't raise the peak RSS the dump steps are measured by
+    for chunk in range(0, sales, 5000):
+        Sale.objects.bulk_create(
+            Sale(item=item_objs[i % items], quantity_sold=1 + i % 3, selling_price=Decimal('150.00'),
+                 sold_at=now - timedelta(seconds=i))
+            for i in range(chunk, min(chunk + 5000, sales))
+        )
+    repair_objs = Repair.objects.bulk_create(
+        (Repair(owner_name=f'Owner {i}', owner_phone='0700000000', phone_name='Phone', phone_model='X',
+                issue_description='Screen', charges=Decimal('1500.00'), status='COLLECTED', collected_at=now)
+         for i in range(repairs)),
+        batch_size=5000,
+    )
+    Revenue.objects.bulk_create(
+        (Revenue(repair=repair, amount=repair.charges, collected_at=now) for repair in repair_objs),
+        batch_size=5000,
+    )
+
+
+def run_step(step, directory, items, sales, repairs):
+    import django
+
+    django.setup()
+    from django.core.management import call_command
+    from django.db import connection
+
+    from APPS.stores.models import get_default_store
+
+    connection.creation.create_test_db(verbosity=0)
+    store = get_default_store()
+    json_path = Path(directory) / 'store.json'
+    zip_path = Path(directory) / 'store.zip'
+    if step in ('dumpdata', 'backup_store'):
+        seed(items, sales, repairs)
+
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull:
+        if step == 'dumpdata':
+            call_command('dumpdata', *DUMP_APPS, output=str(json_path), verbosity=0)
+        elif step == 'backup_store':
+            call_command('backup_store', '--store', store.code, '--output', str(zip_path), stdout=devnull)
+        elif step == 'loaddata':
+            call_command('loaddata', str(json_path), verbosity=0)
+        else:
+            call_command('restore_store', str(zip_path), stdout=devnull)
+    elapsed = time.perf_counter() - start
+
+    path = json_path if step in ('dumpdata', 'loaddata') else zip_path
+    return {
+        'step': step,
+        'seconds': elapsed,
+        'file_mb': path.stat().st_size / 1024 / 1024,
+        'baseline_rss_mb': baseline_rss / 1024,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--sales', type=int, default=500000)
+    parser.add_argument('--repairs', type=int, default=20000)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--directory', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_step(args.child, args.directory, args.items, args.sales, args.repairs)))
+        return
+
+    print(f"{args.items} items, {args.sales} sales, {args.repairs} repairs")
+    print(f"{'step':<15}{'seconds':>10}{'file':>10}{'RSS before':>12}{'peak RSS':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for step in STEPS:
+            output = subprocess.run(
+                [sys.executable, __file__, '--child', step, '--directory', directory, '--items', str(args.items),
+                 '--sales', str(args.sales), '--repairs', str(args.repairs)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{result['step']:<15}{result['seconds']:>10.2f}{result['file_mb']:>8.1f}MB"
+                f"{result['baseline_rss_mb']:>10.0f}MB{result['peak_rss_mb']:>8.0f}MB"
+            )
+
+
+if __name__ == '__main__':
+    main()
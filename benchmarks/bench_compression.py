@@ -0,0 +1,98 @@
+"""
+Compare bytes saved against CPU time for the compression middleware.
+
+Usage:
+    python benchmarks/bench_compression.py [--items 500] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'STORE_MANAGER.settings')
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+import django
+
+django.setup()
+
+from django.template.loader import render_to_string
+
+from APPS.inventory.models import Category, Item
+from STORE_MANAGER.middleware import Compressor, brotli, compress_bytes
+
+
+def sample_payloads(item_count):
+    """Build an item list page and a JSON body of the size the shops actually see"""
+    category = Category(id=1, name='Accessories')
+    items = [
+        Item(
+            id=i,
+            name=f'Phone case model {i}',
+            category=category,
+            buying_price=Decimal('150.00'),
+            selling_price=Decimal('250.00'),
+            quantity=i % 40,
+            low_stock_threshold=5,
+        )
+        for i in range(1, item_count + 1)
+    ]
+    html = render_to_string('inventory/item_list.html', {'items': items, 'search_form': None})
+    payload = json.dumps([
+        {'id': item.id, 'name': item.name, 'quantity': item.quantity, 'price': str(item.selling_price)}
+        for item in items
+    ])
+    return {'item_list.html': html.encode(), 'items.json': payload.encode()}
+
+
+def measure(data, encoding, repeat, **levels):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        compressed = compress_bytes(data, encoding, **levels)
+    elapsed = (time.perf_counter() - start) / repeat
+    return len(compressed), elapsed
+
+
+def measure_stream(data, encoding, repeat, chunk_size=8192, **levels):
+    """Same body sent as a streaming response, flushed after every chunk"""
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        compressor = Compressor(encoding, **levels)
+        size = 0
+        for chunk in chunks:
+            size += len(compressor.compress(chunk) + compressor.flush())
+        size += len(compressor.finish())
+    elapsed = (time.perf_counter() - start) / repeat
+    return size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    configs = [('gzip', {'gzip_level': level}) for level in (1, 6, 9)]
+    if brotli is not None:
+        configs += [('br', {'brotli_quality': quality}) for quality in (1, 4, 6, 11)]
+
+    print(f"{'payload':<16}{'mode':<8}{'encoding':<14}{'bytes':>10}{'saved':>8}{'ms':>9}{'MB/s':>9}")
+    for name, data in sample_payloads(args.items).items():
+        print(f"{name:<16}{'-':<8}{'identity':<14}{len(data):>10}{'0%':>8}{0:>9.2f}{'-':>9}")
+        for encoding, levels in configs:
+            label = f"{encoding}-{next(iter(levels.values()))}"
+            for mode, func in (('whole', measure), ('stream', measure_stream)):
+                repeat = max(1, args.repeat // 10) if label == 'br-11' else args.repeat
+                size, elapsed = func(data, encoding, repeat, **levels)
+                saved = 100 - size * 100 / len(data)
+                throughput = len(data) / elapsed / 1e6
+                print(f"{name:<16}{mode:<8}{label:<14}{size:>10}{saved:>7.1f}%{elapsed * 1000:>9.2f}{throughput:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Time the stock forecast.
+
+1. The vectorized math on synthetic arrays at full scale (50k items x 2 years).
+2. A per-item ORM loop (one query per item) on a sample, extrapolated to all items.
+3. The end-to-end refresh_forecasts() job against a seeded test database.
+
+Usage:
+    python benchmarks/bench_forecast.py [--items 50000] [--days 730] [--density 0.2]
+                                        [--db-items 5000] [--db-sales 300000]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'STORE_MANAGER.settings')
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+import django
+
+django.setup()
+
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from APPS.inventory.forecast import compute_forecast, refresh_forecasts
+from APPS.inventory.models import Category, Item, Sale
+from APPS.stores.models import get_default_store
+
+
+def synthetic_sales(items, days, density, rng):
+    """One row per item per day with sales, like the grouped query returns"""
+    rows = int(items * days * density)
+    sale_item_ids = rng.integers(1, items + 1, rows)
+    sale_ages = rng.integers(0, days, rows)
+    sale_units = rng.integers(1, 5, rows)
+    return sale_item_ids, sale_ages, sale_units
+
+
+def seed(items, sales, days, rng):
+    category = Category.objects.create(name='Accessories')
+    Item.objects.bulk_create(
+        (Item(name=f'Item {i}', category=category, buying_price=Decimal('100.00'),
+              selling_price=Decimal('150.00'), quantity=int(rng.integers(0, 200)))
+         for i in range(items)),
+        batch_size=5000,
+    )
+    item_ids = list(Item.objects.values_list('pk', flat=True))
+    now = timezone.now()
+    item_choice = rng.integers(0, len(item_ids), sales)
+    seconds = rng.integers(0, days * 86400, sales)
+    Sale.objects.bulk_create(
+        (Sale(item_id=item_ids[item_choice[i]], quantity_sold=1 + i % 3, selling_price=Decimal('150.00'),
+              sold_at=now - timedelta(seconds=int(seconds[i])))
+         for i in range(sales)),
+        batch_size=5000,
+    )
+
+
+def per_item_loop(items, days):
+    """What the forecast would cost with one aggregate query per item"""
+    since = timezone.now() - timedelta(days=days)
+    for item in items:
+        sold = Sale.objects.filter(item=item, sold_at__gte=since).aggregate(total=Sum('quantity_sold'))['total'] or 0
+        velocity = sold / days
+        if velocity:
+            item.quantity / velocity
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=50000)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--density', type=float, default=0.2, help='share of item-days with at least one sale')
+    parser.add_argument('--db-items', type=int, default=5000)
+    parser.add_argument('--db-sales', type=int, default=300000)
+    args = parser.parse_args()
+    rng = np.random.default_rng(1)
+
+    item_ids = np.arange(1, args.items + 1)
+    quantities = rng.integers(0, 200, args.items)
+    sale_item_ids, sale_ages, sale_units = synthetic_sales(args.items, args.days, args.density, rng)
+    start = time.perf_counter()
+    compute_forecast(item_ids, quantities, sale_item_ids, sale_ages, sale_units, history_days=args.days)
+    print(f"vectorized math: {args.items} items, {len(sale_units)} item-days: {time.perf_counter() - start:.2f}s")
+
+    connection.creation.create_test_db(verbosity=0)
+    seed(args.db_items, args.db_sales, args.days, rng)
+
+    sample = list(Item.objects.all()[:200])
+    start = time.perf_counter()
+    per_item_loop(sample, args.days)
+    per_item = (time.perf_counter() - start) / len(sample)
+    print(f"per-item ORM loop: {per_item * 1000:.2f} ms/item, "
+          f"~{per_item * args.db_items:.1f}s for {args.db_items} items at this sales volume")
+
+    start = time.perf_counter()
+    count = refresh_forecasts(get_default_store())
+    print(f"refresh_forecasts(): {args.db_items} items, {args.db_sales} sales, "
+          f"{count} forecasts stored: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
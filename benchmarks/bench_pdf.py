@@ -0,0 +1,113 @@
+"""
+Compare the PDF engines on a large sales report: rows/second and peak RSS.
+
+Each engine runs in its own process against a freshly seeded test database,
+so peak RSS reflects that engine alone.
+
+Usage:
+    python benchmarks/bench_pdf.py [--rows 5000] [--engines xhtml2pdf platypus]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'STORE_MANAGER.settings')
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+
+def seed(rows):
+    from datetime import timedelta
+    from decimal import Decimal
+
+    from django.utils import timezone
+
+    from APPS.inventory.models import Category, Item, Sale
+
+    category = Category.objects.create(name='Accessories')
+    items = Item.objects.bulk_create([
+        Item(name=f'Item {i}', category=category, buying_price=Decimal('100.00'),
+             selling_price=Decimal('150.00'), quantity=1000)
+        for i in range(200)
+    ])
+    start = timezone.now()
+    Sale.objects.bulk_create(
+        (Sale(item=items[i % len(items)], quantity_sold=1 + i % 3,
+              selling_price=Decimal('150.00'), sold_at=start - timedelta(seconds=i))
+         for i in range(rows)),
+        batch_size=2000,
+    )
+
+
+def run_engine(engine, rows):
+    import django
+
+    django.setup()
+    from django.db import connection
+    from django.http import HttpResponse
+
+    from APPS.inventory.views import generate_report, iter_sale_rows
+    from STORE_MANAGER.pdf import PDFReport, get_renderer
+
+    connection.creation.create_test_db(verbosity=0)
+    seed(rows)
+
+    sales, total_profit = generate_report('daily')
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report = PDFReport(
+        title='Daily Sales Report',
+        template_name='inventory/report_pdf.html',
+        context={'sales': sales, 'total_profit': total_profit, 'timeframe': 'daily'},
+        columns=['Item', 'Quantity', 'Profit', 'Date'],
+        rows=iter_sale_rows(sales),
+        row_count=sales.count(),
+        totals=[('Total Profit', f"Ksh {total_profit}")],
+    )
+    output = HttpResponse(content_type='application/pdf')
+    start = time.perf_counter()
+    get_renderer(report, engine).render(report, output)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'engine': engine,
+        'rows': report.row_count,
+        'seconds': elapsed,
+        'rows_per_second': report.row_count / elapsed,
+        'pdf_bytes': len(output.content),
+        'baseline_rss_mb': baseline_rss / 1024,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--engines', nargs='+', default=['xhtml2pdf', 'platypus'])
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_engine(args.child, args.rows)))
+        return
+
+    print(f"{'engine':<12}{'rows':>8}{'seconds':>10}{'rows/s':>10}{'PDF KB':>9}{'RSS before':>12}{'peak RSS':>10}")
+    for engine in args.engines:
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', engine, '--rows', str(args.rows)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{result['engine']:<12}{result['rows']:>8}{result['seconds']:>10.2f}"
+            f"{result['rows_per_second']:>10.0f}{result['pdf_bytes'] / 1024:>9.0f}"
+            f"{result['baseline_rss_mb']:>10.0f}MB{result['peak_rss_mb']:>8.0f}MB"
+        )
+
+
+if __name__ == '__main__':
+    main()
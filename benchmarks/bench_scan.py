@@ -0,0 +1,96 @@
+"""
+Time barcode scans against a catalogue of 100k items.
+
+Reports the cold path (indexed SKU query), the hot path (in-process cache) and
+a full request through the URLconf and middleware.
+
+Usage:
+    python benchmarks/bench_scan.py [--items 100000] [--scans 5000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'STORE_MANAGER.settings')
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+import django
+
+django.setup()
+
+from decimal import Decimal
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment
+
+from APPS.inventory.models import Category, Item
+from APPS.inventory.sku_cache import lookup_sku, sku_cache
+from APPS.stores.models import default_store_id
+
+
+def seed(count):
+    category = Category.objects.create(name='Accessories')
+    Item.objects.bulk_create(
+        (Item(name=f'Item {i}', sku=f'{600000000000 + i}', category=category,
+              buying_price=Decimal('100.00'), selling_price=Decimal('150.00'), quantity=50)
+         for i in range(count)),
+        batch_size=5000,
+    )
+
+
+def timed(func, skus):
+    samples = []
+    for sku in skus:
+        start = time.perf_counter()
+        func(sku)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--scans', type=int, default=5000)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    seed(args.items)
+
+    rng = random.Random(1)
+    # Tills scan a small set of hot products most of the time
+    hot = [f'{600000000000 + rng.randrange(args.items)}' for _ in range(200)]
+    skus = [rng.choice(hot) for _ in range(args.scans)]
+    client = Client()
+    store_id = default_store_id()
+
+    def cached(sku):
+        return lookup_sku(sku, store_id)
+
+    def uncached(sku):
+        sku_cache.clear()
+        return lookup_sku(sku, store_id)
+
+    def request(sku):
+        response = client.get(f'/inventory/api/scan/{sku}/')
+        assert response.status_code == 200, response.status_code
+        return response
+
+    print(f"{args.items} items, {args.scans} scans")
+    print(f"{'path':<28}{'p50 us':>10}{'p99 us':>10}{'hit rate':>10}")
+    for label, func in (('indexed query (cold)', uncached), ('in-process cache (hot)', cached), ('full request (hot)', request)):
+        sku_cache.hits = sku_cache.misses = 0
+        p50, p99 = timed(func, skus)
+        hit_rate = sku_cache.hits * 100 / (sku_cache.hits + sku_cache.misses)
+        print(f"{label:<28}{p50:>10.1f}{p99:>10.1f}{hit_rate:>9.0f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Measure worker startup: django.setup() plus URLconf import, and peak RSS.
+
+Each run is a fresh interpreter started with `python -X importtime`, which is
+what a gunicorn worker pays on boot. The report lists the slowest top-level
+packages so regressions (e.g. the PDF stack loading eagerly) are easy to spot.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--top 15]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Packages that should only be imported when a PDF is actually rendered
+LAZY_PACKAGES = ('xhtml2pdf', 'reportlab', 'PIL', 'html5lib')
+
+BOOT_SCRIPT = """
+import json, resource, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+end = time.perf_counter()
+print(json.dumps({
+    'setup_ms': (setup_done - start) * 1000,
+    'urlconf_ms': (end - setup_done) * 1000,
+    'total_ms': (end - start) * 1000,
+    'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': sorted(sys.modules),
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """Sum self import time (us) per top-level package"""
+    totals = defaultdict(int)
+    for line in stderr.splitlines():
+        # Lines look like "import time:       123 |        456 |   package.module"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        # Self times don't overlap, so they can be summed per package
+        totals[name.strip().split('.')[0]] += int(self_us)
+    return totals
+
+
+def run_once():
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'STORE_MANAGER.settings')
+    env.setdefault('SECRET_KEY', 'benchmark')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+    stats['packages'] = parse_importtime(result.stderr)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+
+    for key, label in (('setup_ms', 'django.setup()'), ('urlconf_ms', 'URLconf import'), ('total_ms', 'total boot')):
+        values = [run[key] for run in runs]
+        print(f"{label:<18} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms")
+    rss = [run['peak_rss_kb'] for run in runs]
+    print(f"{'peak RSS':<18} median {statistics.median(rss) / 1024:8.1f} MB")
+
+    loaded = sorted({name.split('.')[0] for name in runs[-1]['modules']} & set(LAZY_PACKAGES))
+    print(f"PDF stack loaded at boot: {', '.join(loaded) if loaded else 'no'}")
+
+    print(f"\nSlowest packages (self time, median of {args.runs} runs):")
+    packages = defaultdict(list)
+    for run in runs:
+        for name, micros in run['packages'].items():
+            packages[name].append(micros)
+    ranked = sorted(packages.items(), key=lambda entry: statistics.median(entry[1]), reverse=True)
+    for name, values in ranked[:args.top]:
+        print(f"  {name:<30}{statistics.median(values) / 1000:8.1f} ms")
+
+    return 1 if loaded else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())